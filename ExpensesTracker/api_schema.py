@@ -0,0 +1,181 @@
+import functools
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import namedtuple
+from pathlib import Path
+
+import django
+import drf_yasg
+import rest_framework
+from django.apps import apps
+from django.conf import settings
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import etag, require_GET
+from django.http import HttpResponse
+from drf_yasg import openapi
+from drf_yasg.codecs import OpenAPICodecJson
+from drf_yasg.generators import OpenAPISchemaGenerator
+from drf_yasg.views import get_schema_view
+from rest_framework import permissions
+
+logger = logging.getLogger(__name__)
+
+
+# The OpenAPI document is built once per code version rather than on
+# every docs hit: drf_yasg introspects every view and serializer to
+# produce it. The generate_openapi_schema command (run on deploy) writes
+# it to OPENAPI_SCHEMA_FILE, tagged with the code version; processes load
+# that file on startup and serve its bytes from memory with a strong
+# ETag. A missing or stale file is regenerated by the first process that
+# needs it.
+#
+# The Swagger and ReDoc pages only render their HTML shell (drf_yasg
+# skips introspection for UI renderers) and fetch the document from
+# schema-json (SWAGGER_SETTINGS / REDOC_SETTINGS SPEC_URL).
+
+INFO = openapi.Info(
+    title="Expense Tracker API",
+    default_version="v1",
+    description="API documentation for Expense Tracker Backend",
+    terms_of_service="https://www.google.com/policies/terms/",
+    contact=openapi.Contact(email="support@expensetracker.com"),
+    license=openapi.License(name="BSD License"),
+)
+
+schema_view = get_schema_view(
+    INFO,
+    public=True,
+    permission_classes=[permissions.AllowAny],
+)
+
+VERSION_KEY = "x-code-version"
+
+Schema = namedtuple("Schema", ["version", "body", "etag"])
+
+
+# =========================
+# CODE VERSION
+# =========================
+def _source_dirs():
+    dirs = {Path(settings.BASE_DIR) / "ExpensesTracker"}
+    for app in apps.get_app_configs():
+        path = Path(app.path)
+        if path.is_relative_to(settings.BASE_DIR) and "site-packages" not in path.parts:
+            dirs.add(path)
+    return sorted(dirs)
+
+
+@functools.cache
+def code_version():
+    """
+    CODE_VERSION, or a digest of the project's Python sources and of the
+    library versions the schema depends on.
+    """
+    if settings.CODE_VERSION:
+        return settings.CODE_VERSION
+
+    digest = hashlib.blake2b(digest_size=12)
+    for library in (django, rest_framework, drf_yasg):
+        digest.update(f"{library.__name__}={library.__version__}\n".encode())
+    for directory in _source_dirs():
+        for path in sorted(directory.rglob("*.py")):
+            digest.update(str(path.relative_to(settings.BASE_DIR)).encode())
+            digest.update(path.read_bytes())
+    return f"src-{digest.hexdigest()}"
+
+
+# =========================
+# GENERATION
+# =========================
+def _etag(body):
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def generate():
+    """
+    Introspect the API and return the schema for the current code
+    version.
+    """
+    document = OpenAPISchemaGenerator(INFO).get_schema(request=None, public=True)
+    document[VERSION_KEY] = code_version()
+    body = OpenAPICodecJson(validators=[]).encode(document)
+    return Schema(code_version(), body, _etag(body))
+
+
+def write(schema, path=None):
+    """
+    Store ``schema`` at ``path`` (OPENAPI_SCHEMA_FILE), replacing the
+    file in one step so readers never see half of it.
+    """
+    path = Path(path or settings.OPENAPI_SCHEMA_FILE)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(f".{path.name}.{os.getpid()}")
+    temporary.write_bytes(schema.body)
+    os.replace(temporary, path)
+
+
+def read(path=None):
+    """
+    The schema stored at ``path`` (OPENAPI_SCHEMA_FILE), or None when
+    there is none.
+    """
+    try:
+        body = Path(path or settings.OPENAPI_SCHEMA_FILE).read_bytes()
+        version = json.loads(body).get(VERSION_KEY)
+    except (OSError, ValueError):
+        return None
+    return Schema(version, body, _etag(body))
+
+
+# =========================
+# SERVING
+# =========================
+_lock = threading.Lock()
+_current = None
+
+
+def current_schema():
+    """
+    The schema of the running code: from memory, else from the stored
+    file, else generated (and stored for the other processes).
+    """
+    global _current
+    schema = _current
+    if schema is not None:
+        return schema
+
+    with _lock:
+        if _current is None:
+            schema = read()
+            if schema is None or schema.version != code_version():
+                schema = generate()
+                try:
+                    write(schema)
+                except OSError:
+                    logger.warning("Could not store the OpenAPI schema", exc_info=True)
+            _current = schema
+        return _current
+
+
+def preload():
+    """
+    Load (or build) the schema when a server process starts, so no
+    request waits for it. Failures are logged and left to the first
+    request.
+    """
+    try:
+        current_schema()
+    except Exception:
+        logger.exception("Could not load the OpenAPI schema")
+
+
+@require_GET
+@cache_control(public=True, max_age=settings.OPENAPI_SCHEMA_MAX_AGE)
+# If-None-Match is compared weakly: CompressionMiddleware sends the ETag
+# of compressed bodies as W/"..."
+@etag(lambda request: current_schema().etag)
+def schema_json(request):
+    return HttpResponse(current_schema().body, content_type="application/json")
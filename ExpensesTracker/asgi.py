@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ExpensesTracker.settings')
 
 application = get_asgi_application()
+
+# load the OpenAPI schema before the first docs request
+from .api_schema import preload  # noqa: E402
+
+preload()
@@ -0,0 +1,42 @@
+import statistics
+import time
+
+
+def time_calls(fn, iterations):
+    """
+    Call ``fn`` ``iterations`` times and return the per-call latencies in
+    milliseconds.
+    """
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def percentile(ordered, pct):
+    return ordered[min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))]
+
+
+def summarize(samples):
+    """
+    Reduce latency samples (ms) to the figures the bench commands print.
+    """
+    ordered = sorted(samples)
+    total = sum(ordered)
+    return {
+        "calls": len(ordered),
+        "p50_ms": round(statistics.median(ordered), 3),
+        "p95_ms": round(percentile(ordered, 95), 3),
+        "max_ms": round(ordered[-1], 3),
+        "per_second": round(len(ordered) / (total / 1000), 1) if total else None,
+    }
+
+
+def format_summary(label, summary):
+    return (
+        f"{label:<40} calls={summary['calls']:<7} "
+        f"p50={summary['p50_ms']}ms p95={summary['p95_ms']}ms "
+        f"max={summary['max_ms']}ms rate={summary['per_second']}/s"
+    )
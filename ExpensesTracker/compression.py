@@ -0,0 +1,216 @@
+import hashlib
+import re
+import zlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import patch_vary_headers
+
+
+# Response compression negotiated from Accept-Encoding: zstd and brotli
+# when their packages are installed, gzip always. Bodies below
+# COMPRESSION_MIN_SIZE are sent as they are; streamed bodies are
+# compressed chunk by chunk and flushed after each one, so the client
+# still gets rows as soon as they are read. Event streams are never
+# compressed: the encoder would hold events back.
+#
+# Responses a client or proxy may cache (an ETag, or public / max-age
+# Cache-Control) have their compressed body kept in the Django cache,
+# keyed by a digest of the uncompressed body, and are compressed at the
+# slower CACHED_LEVELS since that happens once.
+
+
+# =========================
+# ENCODERS
+# =========================
+class GzipEncoder:
+    name = "gzip"
+
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def chunk(self, data):
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data=b""):
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+class BrotliEncoder:
+    name = "br"
+
+    def __init__(self, level):
+        import brotli
+
+        self._compressor = brotli.Compressor(quality=level)
+
+    def chunk(self, data):
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self, data=b""):
+        return self._compressor.process(data) + self._compressor.finish()
+
+
+class ZstdEncoder:
+    name = "zstd"
+
+    def __init__(self, level):
+        import zstandard
+
+        self._flush_block = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def chunk(self, data):
+        return self._compressor.compress(data) + self._compressor.flush(self._flush_block)
+
+    def finish(self, data=b""):
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+ENCODERS = {encoder.name: encoder for encoder in (ZstdEncoder, BrotliEncoder, GzipEncoder)}
+
+# per-response levels: fast enough to run on every request
+LEVELS = {"zstd": 3, "br": 4, "gzip": 6}
+# bodies compressed once and served from the cache
+CACHED_LEVELS = {"zstd": 12, "br": 9, "gzip": 9}
+
+
+def _installed(name):
+    try:
+        ENCODERS[name](LEVELS[name])
+    except ImportError:
+        return False
+    return True
+
+
+def available_encodings():
+    """
+    COMPRESSION_ENCODINGS, in order of preference, minus those whose
+    package is not installed.
+    """
+    return [name for name in settings.COMPRESSION_ENCODINGS if name in ENCODERS and _installed(name)]
+
+
+def compress(name, data, level=None):
+    return ENCODERS[name](level or LEVELS[name]).finish(data)
+
+
+# =========================
+# NEGOTIATION
+# =========================
+_CODING = re.compile(r"^\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*$")
+
+
+def negotiate(accept_encoding, supported):
+    """
+    The encoding among ``supported`` (ordered by preference) the
+    Accept-Encoding value rates highest, or None for identity.
+    """
+    weights = {}
+    for item in accept_encoding.split(","):
+        match = _CODING.match(item)
+        if not match:
+            continue
+        try:
+            weights[match[1].lower()] = float(match[2]) if match[2] else 1.0
+        except ValueError:
+            continue
+
+    best, best_weight = None, 0.0
+    for name in supported:
+        weight = weights.get(name, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = name, weight
+    return best
+
+
+# =========================
+# MIDDLEWARE
+# =========================
+def _compressible(content_type):
+    media_type = content_type.split(";")[0].strip().lower()
+    return (
+        media_type in settings.COMPRESSION_CONTENT_TYPES
+        or media_type.endswith(("+json", "+xml"))
+    )
+
+
+def _cacheable(response):
+    cache_control = response.get("Cache-Control", "").lower()
+    if "no-store" in cache_control or "private" in cache_control:
+        return False
+    return response.has_header("ETag") or "public" in cache_control or "max-age" in cache_control
+
+
+class CompressionMiddleware:
+    """
+    Compresses response bodies with the best encoding the client accepts
+    (see the notes at the top of this module).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.encodings = available_encodings()
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        if (
+            not self.encodings
+            or response.has_header("Content-Encoding")
+            or response.status_code in (204, 206, 304)
+            or not _compressible(response.get("Content-Type", ""))
+            or request.path.startswith(tuple(settings.COMPRESSION_SKIP_PATHS))
+        ):
+            return response
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        name = negotiate(request.META.get("HTTP_ACCEPT_ENCODING", ""), self.encodings)
+        if name is None:
+            return response
+
+        if response.streaming:
+            encoder = ENCODERS[name](LEVELS[name])
+            if response.is_async:
+                response.streaming_content = self._compress_async(response.streaming_content, encoder)
+            else:
+                response.streaming_content = self._compress_stream(response.streaming_content, encoder)
+            del response["Content-Length"]
+        else:
+            if _cacheable(response):
+                response.content = self._cached(name, response.content)
+            else:
+                response.content = compress(name, response.content)
+            response["Content-Length"] = str(len(response.content))
+
+        # another representation of the same resource
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        response["Content-Encoding"] = name
+        return response
+
+    def _cached(self, name, body):
+        cache = caches[settings.COMPRESSION_CACHE_ALIAS]
+        key = f"compressed:{name}:{hashlib.blake2b(body, digest_size=20).hexdigest()}"
+        compressed = cache.get(key)
+        if compressed is None:
+            compressed = compress(name, body, CACHED_LEVELS[name])
+            cache.set(key, compressed, timeout=settings.COMPRESSION_CACHE_SECONDS)
+        return compressed
+
+    @staticmethod
+    def _compress_stream(chunks, encoder):
+        for chunk in chunks:
+            if chunk:
+                yield encoder.chunk(chunk)
+        yield encoder.finish()
+
+    @staticmethod
+    async def _compress_async(chunks, encoder):
+        async for chunk in chunks:
+            if chunk:
+                yield encoder.chunk(chunk)
+        yield encoder.finish()
@@ -0,0 +1,30 @@
+from django.db import connections
+
+
+def pool_stats():
+    """
+    Snapshot of every pooled database alias in this worker process.
+
+    ``saturation`` is the share of the pool's maximum size currently
+    checked out; ``avg_wait_ms`` is the mean time a request waited for a
+    connection since the pool opened. Aliases without a pool (SQLite or
+    DB_POOL=False) report ``{"pooled": False}``.
+    """
+    result = {}
+    for alias in connections:
+        pool = getattr(connections[alias], "pool", None)
+        if pool is None:
+            result[alias] = {"pooled": False}
+            continue
+
+        stats = pool.get_stats()
+        in_use = stats.get("pool_size", 0) - stats.get("pool_available", 0)
+        queued = stats.get("requests_queued", 0)
+        result[alias] = {
+            "pooled": True,
+            "in_use": in_use,
+            "saturation": round(in_use / stats["pool_max"], 3) if stats.get("pool_max") else None,
+            "avg_wait_ms": round(stats.get("requests_wait_ms", 0) / queued, 3) if queued else 0,
+            **stats,
+        }
+    return result
@@ -0,0 +1,83 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+
+# True while a read-only view is serving a request that may hit a replica
+_replica_reads = ContextVar("replica_reads", default=False)
+
+
+# =========================
+# READ-YOUR-WRITES PINNING
+# =========================
+def _pin_key(user):
+    return f"db-pin:{user.pk}"
+
+
+def pin_to_primary(user):
+    """
+    Send this user's reads to the primary for REPLICA_PIN_SECONDS, long
+    enough for replicas to catch up with the write that was just made.
+    """
+    if settings.DATABASE_REPLICAS and user.is_authenticated:
+        cache.set(_pin_key(user), True, timeout=settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user):
+    return user.is_authenticated and bool(cache.get(_pin_key(user)))
+
+
+# =========================
+# VIEW MIXIN
+# =========================
+class ReplicaReadMixin:
+    """
+    Lets GET/HEAD/OPTIONS on an APIView read from a replica unless the
+    user wrote recently. Must come before APIView in the bases.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (
+            settings.DATABASE_REPLICAS
+            and request.method in SAFE_METHODS
+            and not is_pinned(request.user)
+        ):
+            self._replica_token = _replica_reads.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, "_replica_token", None)
+        if token is not None:
+            _replica_reads.reset(token)
+            self._replica_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+# =========================
+# ROUTER
+# =========================
+class PrimaryReplicaRouter:
+    """
+    Writes always go to ``default``. Reads go to a random replica only
+    inside a ReplicaReadMixin view; everything else (auth, writes and
+    the reads that validate them) stays on the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get() and settings.DATABASE_REPLICAS:
+            return random.choice(settings.DATABASE_REPLICAS)
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # replicas receive schema changes through replication
+        return db not in settings.DATABASE_REPLICAS
@@ -0,0 +1,234 @@
+import asyncio
+import functools
+import threading
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.module_loading import import_string
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from .sharding import current_shard
+
+
+# Server-Sent Events push for the dashboards: writes publish a compact
+# delta (the buckets and totals they changed) on the user's channel and
+# every stream that user has open forwards it, so clients update what
+# they display instead of polling the reports.
+#
+# Delivery is best effort: nothing is replayed after a reconnect, and a
+# client too slow to keep up gets a single "resync" event instead of its
+# backlog. Either way the client refetches what it displays.
+#
+# The stream is an async view and must be served over ASGI, where an
+# open connection costs a coroutine rather than a worker thread.
+
+_encoder = JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+RESYNC = "event: resync\ndata: {}\n\n"
+
+
+def sse_message(event, data):
+    return f"event: {event}\ndata: {_encoder.encode(data)}\n\n"
+
+
+# =========================
+# BROKERS
+# =========================
+class Broker:
+    """
+    Fans messages (SSE frames, as text) out to the subscribers of a
+    channel. ``publish`` is called from request threads, ``subscribe`` is
+    an async context manager yielding an object whose ``get(timeout)``
+    coroutine returns the next message or raises TimeoutError.
+    """
+
+    def publish(self, channel, message):
+        raise NotImplementedError(".publish() must be overridden")
+
+    def subscribe(self, channel):
+        raise NotImplementedError(".subscribe() must be overridden")
+
+
+class _Subscription:
+    def __init__(self, loop, size):
+        self.loop = loop
+        self.queue = asyncio.Queue(size)
+
+    def deliver(self, message):
+        # the queue belongs to the subscriber's event loop thread
+        try:
+            self.loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:
+            # loop closed, the stream is going away
+            pass
+
+    def _put(self, message):
+        if self.queue.full():
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            message = RESYNC
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class InProcessBroker(Broker):
+    """
+    Subscribers kept in this process: enough for a single ASGI worker.
+    With several workers a write only reaches the streams held by the
+    worker that served it, so use a shared backend there.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.deliver(message)
+
+    @asynccontextmanager
+    async def subscribe(self, channel):
+        subscription = _Subscription(asyncio.get_running_loop(), settings.EVENTS_QUEUE_SIZE)
+        with self._lock:
+            self._subscriptions[channel].add(subscription)
+        try:
+            yield subscription
+        finally:
+            with self._lock:
+                self._subscriptions[channel].discard(subscription)
+                if not self._subscriptions[channel]:
+                    del self._subscriptions[channel]
+
+
+class _RedisSubscription:
+    def __init__(self, pubsub):
+        self.pubsub = pubsub
+
+    async def _next(self):
+        while True:
+            message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=None)
+            if message is not None:
+                return message["data"].decode()
+
+    async def get(self, timeout):
+        return await asyncio.wait_for(self._next(), timeout)
+
+
+class RedisBroker(Broker):
+    """
+    Redis pub/sub on REDIS_URL, shared by every worker and server.
+    """
+
+    prefix = "events:"
+
+    def __init__(self):
+        try:
+            import redis
+        except ImportError as exc:
+            raise ImproperlyConfigured("RedisBroker needs the redis package installed") from exc
+        if not settings.REDIS_URL:
+            raise ImproperlyConfigured("RedisBroker needs REDIS_URL")
+        self.client = redis.Redis.from_url(settings.REDIS_URL)
+
+    def publish(self, channel, message):
+        self.client.publish(self.prefix + channel, message)
+
+    @asynccontextmanager
+    async def subscribe(self, channel):
+        import redis.asyncio
+
+        client = redis.asyncio.Redis.from_url(settings.REDIS_URL)
+        pubsub = client.pubsub()
+        await pubsub.subscribe(self.prefix + channel)
+        try:
+            yield _RedisSubscription(pubsub)
+        finally:
+            await pubsub.aclose()
+            await client.aclose()
+
+
+@functools.cache
+def get_broker():
+    return import_string(settings.EVENTS_BROKER)()
+
+
+# =========================
+# PUBLISHING
+# =========================
+def user_channel(user_id):
+    return f"user:{user_id}"
+
+
+def publish_to_user(user_id, event, data):
+    """
+    Send ``event`` with ``data`` to the user's open streams once the
+    current transaction on the current shard commits. A broker failure is
+    logged, it never fails the write.
+    """
+    message = sse_message(event, data)
+    transaction.on_commit(
+        lambda: get_broker().publish(user_channel(user_id), message),
+        using=current_shard(),
+        robust=True,
+    )
+
+
+# =========================
+# STREAM
+# =========================
+class StreamAuthentication(JWTAuthentication):
+    """
+    JWT from the Authorization header or, since browsers' EventSource
+    cannot send headers, from the ``access_token`` query parameter.
+    """
+
+    def authenticate(self, request):
+        token = request.GET.get("access_token")
+        if not token:
+            return super().authenticate(request)
+        validated = self.get_validated_token(token.encode())
+        return self.get_user(validated), validated
+
+
+async def _events(channel):
+    yield f"retry: {settings.EVENTS_RETRY_MS}\n\n"
+    async with get_broker().subscribe(channel) as subscription:
+        # tells the client it is subscribed, so it can load its snapshot
+        yield sse_message("ready", {})
+        while True:
+            try:
+                yield await subscription.get(settings.EVENTS_KEEPALIVE_SECONDS)
+            except TimeoutError:
+                # keeps proxies from closing an idle connection
+                yield ": keepalive\n\n"
+
+
+@require_GET
+async def event_stream(request):
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({"error": "Event streams are only served over ASGI"}, status=501)
+
+    try:
+        auth = await sync_to_async(StreamAuthentication().authenticate)(request)
+    except AuthenticationFailed:
+        return JsonResponse({"error": "Invalid or expired token"}, status=401)
+    if auth is None:
+        return JsonResponse({"error": "Authentication credentials were not provided"}, status=401)
+
+    response = StreamingHttpResponse(_events(user_channel(auth[0].pk)), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,53 @@
+from rest_framework import serializers
+
+
+# Sparse fieldsets for list endpoints: ``?fields=date,expenses_type,amount``
+# trims the serializer to those fields and the query to the columns
+# behind them, so clients that only chart amounts do not pay for notes.
+
+
+class SparseFieldsMixin:
+    """
+    Serializer mixin: ``fields=`` (names to keep, None for all) drops
+    every other declared field.
+    """
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+def requested_fields(request, serializer_class):
+    """
+    Field names from ``?fields=`` (None when absent), checked against
+    ``serializer_class``.
+    """
+    value = request.query_params.get("fields")
+    if value is None:
+        return None
+
+    names = list(dict.fromkeys(name.strip() for name in value.split(",") if name.strip()))
+    available = serializer_class().fields
+    unknown = [name for name in names if name not in available]
+    if not names or unknown:
+        raise serializers.ValidationError({
+            "fields": f"Unknown field(s): {', '.join(unknown)}" if unknown else "No fields given"
+        })
+    return names
+
+
+def project(queryset, serializer_class, fields, *needed):
+    """
+    ``queryset`` loading only the columns ``fields`` of
+    ``serializer_class`` are read from, plus the ``needed`` ones the view
+    itself uses.
+    """
+    if fields is None:
+        return queryset
+
+    declared = serializer_class().fields
+    columns = {field.name for field in queryset.model._meta.concrete_fields}
+    sources = {declared[name].source for name in fields} | set(needed)
+    return queryset.only(*sorted(sources & columns))
@@ -0,0 +1,238 @@
+import re
+from datetime import date
+
+from django.db import connections, migrations
+
+
+# Full-text search over a single text column.
+#
+# SQLite: an external-content FTS5 table "<table>_fts" indexes the column
+# and triggers keep it in sync with every INSERT, UPDATE and DELETE.
+# PostgreSQL: a GIN expression index over to_tsvector('simple', column),
+# maintained by the database itself. Queries below repeat the indexed
+# expression verbatim so the planner can use it.
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def tsvector_sql(column):
+    return f"to_tsvector('simple', coalesce({column}, ''))"
+
+
+# =========================
+# SCHEMA
+# =========================
+def install_sql(vendor, table, column):
+    if vendor == "sqlite":
+        fts = f"{table}_fts"
+        return [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+            f"{column}, content='{table}', content_rowid='id', tokenize='unicode61')",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column}); END",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column}); END",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {column} ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column}); "
+            f"INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column}); END",
+        ]
+    if vendor == "postgresql":
+        return [
+            f"CREATE INDEX IF NOT EXISTS {table}_{column}_fts_idx "
+            f"ON {table} USING gin ({tsvector_sql(column)})",
+        ]
+    return []
+
+
+def uninstall_sql(vendor, table, column):
+    if vendor == "sqlite":
+        fts = f"{table}_fts"
+        return [
+            f"DROP TRIGGER IF EXISTS {fts}_ai",
+            f"DROP TRIGGER IF EXISTS {fts}_ad",
+            f"DROP TRIGGER IF EXISTS {fts}_au",
+            f"DROP TABLE IF EXISTS {fts}",
+        ]
+    if vendor == "postgresql":
+        return [f"DROP INDEX IF EXISTS {table}_{column}_fts_idx"]
+    return []
+
+
+def install(connection, table, column):
+    """
+    Create the index for ``table.column`` if anything is missing.
+
+    Idempotent. On SQLite, a migration that rebuilds the table (most
+    AlterField operations do) silently drops the triggers, so this also
+    runs after every migrate and re-indexes when it had to recreate them.
+    """
+    with connection.cursor() as cursor:
+        if table not in connection.introspection.table_names(cursor):
+            return
+
+        rebuild = False
+        if connection.vendor == "sqlite":
+            cursor.execute(
+                "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE %s",
+                [f"{table}_fts_a_"],
+            )
+            rebuild = cursor.fetchone()[0] < 3
+
+        for sql in install_sql(connection.vendor, table, column):
+            cursor.execute(sql)
+
+        if rebuild:
+            cursor.execute(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+
+
+def install_operation(table, column):
+    """
+    RunPython operation creating (and on reverse, dropping) the full-text
+    index for ``table.column`` on whichever backend the migration runs.
+    """
+    def forwards(apps, schema_editor):
+        install(schema_editor.connection, table, column)
+
+    def backwards(apps, schema_editor):
+        for sql in uninstall_sql(schema_editor.connection.vendor, table, column):
+            schema_editor.execute(sql)
+
+    return migrations.RunPython(forwards, backwards)
+
+
+# =========================
+# QUERY PARSING
+# =========================
+def terms(query):
+    return _WORD.findall(query or "")[:16]
+
+
+def fts5_match(query, prefix=True):
+    # every term must match; a trailing '*' turns a term into a prefix query
+    star = "*" if prefix else ""
+    return " ".join(f'"{term}"{star}' for term in terms(query))
+
+
+def tsquery(query, prefix=True):
+    suffix = ":*" if prefix else ""
+    return " & ".join(f"{term.lower()}{suffix}" for term in terms(query))
+
+
+# =========================
+# SEARCH
+# =========================
+def search(model, column, query, filters=None, date_range=None,
+           prefix=True, limit=50, offset=0, using="default"):
+    """
+    Ranked search over ``model.column``. Returns ``[(id, rank), ...]``
+    ordered best first; higher rank is better on both backends.
+
+    ``filters`` maps column names to exact values (e.g. ``{"user_id": 3}``)
+    and ``date_range`` is an inclusive ``(start, end)`` on ``date``; both
+    are applied in the same statement as the match.
+    """
+    if not terms(query):
+        return []
+
+    table = model._meta.db_table
+    connection = connections[using]
+    vendor = connection.vendor
+
+    where = []
+    params = []
+
+    if vendor == "sqlite":
+        fts = f"{table}_fts"
+        sql = (
+            f"SELECT t.id, -bm25({fts}) AS rank FROM {fts} "
+            f"JOIN {table} t ON t.id = {fts}.rowid"
+        )
+        where.append(f"{fts} MATCH %s")
+        params.append(fts5_match(query, prefix))
+    elif vendor == "postgresql":
+        vector = tsvector_sql(f"t.{column}")
+        sql = (
+            f"SELECT t.id, ts_rank({vector}, q) AS rank "
+            f"FROM {table} t, to_tsquery('simple', %s) q"
+        )
+        params.append(tsquery(query, prefix))
+        where.append(f"{vector} @@ q")
+    else:
+        raise NotImplementedError(f"full-text search is not supported on {vendor}")
+
+    for name, value in (filters or {}).items():
+        where.append(f"t.{name} = %s")
+        params.append(value)
+
+    if date_range:
+        start, end = date_range
+        if start:
+            where.append("t.date >= %s")
+            params.append(start)
+        if end:
+            where.append("t.date <= %s")
+            params.append(end)
+
+    sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY rank DESC, t.id DESC LIMIT %s OFFSET %s"
+    params += [limit, offset]
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [(row[0], float(row[1])) for row in cursor.fetchall()]
+
+
+def search_params(params, max_limit=100):
+    """
+    ``(limit, offset, date_range)`` from a search request's query string.
+    Raises ValueError with a message fit for a 400 response.
+    """
+    try:
+        limit = min(int(params.get("limit", 50)), max_limit)
+        offset = int(params.get("offset", 0))
+    except ValueError:
+        raise ValueError("limit and offset must be integers")
+    if limit < 1 or offset < 0:
+        raise ValueError("limit must be at least 1 and offset at least 0")
+
+    try:
+        date_range = tuple(
+            date.fromisoformat(params[name]) if params.get(name) else None
+            for name in ("start_date", "end_date")
+        )
+    except ValueError:
+        raise ValueError("Invalid date format (YYYY-MM-DD)")
+    return limit, offset, date_range
+
+
+def search_all(model, column, query, databases, limit=50, offset=0, **kwargs):
+    """
+    search() over several databases (shards), merged best first. Each
+    one returns its first ``offset + limit`` hits; ranks are computed per
+    database, so ties between them are approximate.
+    """
+    if len(databases) == 1:
+        return search(model, column, query, limit=limit, offset=offset, using=databases[0], **kwargs)
+    hits = [
+        hit
+        for using in databases
+        for hit in search(model, column, query, limit=offset + limit, offset=0, using=using, **kwargs)
+    ]
+    hits.sort(key=lambda hit: (hit[1], hit[0]), reverse=True)
+    return hits[offset:offset + limit]
+
+
+def ranked_objects(queryset, hits):
+    """
+    Load the rows for ``hits`` from ``queryset`` and return them in rank
+    order with a ``rank`` attribute set.
+    """
+    ranks = dict(hits)
+    objects = queryset.in_bulk([pk for pk, _ in hits])
+    result = []
+    for pk, _ in hits:
+        obj = objects.get(pk)
+        if obj is not None:
+            obj.rank = ranks[pk]
+            result.append(obj)
+    return result
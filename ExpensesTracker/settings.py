@@ -32,6 +32,10 @@ INSTALLED_APPS = [
     'rest_framework_simplejwt.token_blacklist',
     'expenses',
     'lendandreturn',
+    'analytics',
+    # legacy global ledger, served from the expenses tables; its own
+    # table is only read by import_home_expenses
+    'home',
 ]
 
 REST_FRAMEWORK = {
@@ -41,10 +45,29 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
     ),
+    # every view spends its throttle_cost from the user's budget
+    "DEFAULT_THROTTLE_CLASSES": (
+        "ExpensesTracker.throttling.UserCostThrottle",
+    ),
+    # token buckets, keyed "<view throttle_scope>_<ip|identifier>", plus
+    # the per-user budget: CRUD calls cost 1, full-history reads and
+    # exports up to 50 (a view's throttle_cost)
+    "DEFAULT_THROTTLE_RATES": {
+        "user_cost": config("THROTTLE_USER_COST", default="600/min"),
+        "login_ip": config("THROTTLE_LOGIN_IP", default="30/min"),
+        "login_identifier": config("THROTTLE_LOGIN_IDENTIFIER", default="5/min"),
+        "otp_ip": config("THROTTLE_OTP_IP", default="10/min"),
+        "otp_identifier": config("THROTTLE_OTP_IDENTIFIER", default="5/min"),
+    },
+    # proxies in front of the app, so throttles key on the real client IP
+    "NUM_PROXIES": config("NUM_PROXIES", default=None, cast=lambda v: v and int(v)),
 }
 
+THROTTLE_CACHE_ALIAS = config('THROTTLE_CACHE_ALIAS', default='default')
+
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware', 
+    'ExpensesTracker.compression.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -52,6 +75,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'ExpensesTracker.throttling.RateLimitHeadersMiddleware',
 ]
 
 ROOT_URLCONF = 'ExpensesTracker.urls'
@@ -77,14 +101,154 @@ WSGI_APPLICATION = 'ExpensesTracker.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Connection pooling (PostgreSQL): psycopg 3 pool per worker process.
+# Connections are checked before being handed out and recycled after
+# DB_POOL_MAX_LIFETIME seconds. SQLite, or DB_POOL=False, falls back to
+# persistent per-thread connections with health checks.
+DB_POOL = config('DB_POOL', default=True, cast=bool)
+DB_POOL_MIN_SIZE = config('DB_POOL_MIN_SIZE', default=2, cast=int)
+DB_POOL_MAX_SIZE = config('DB_POOL_MAX_SIZE', default=10, cast=int)
+DB_POOL_MAX_LIFETIME = config('DB_POOL_MAX_LIFETIME', default=1800, cast=float)
+DB_POOL_MAX_IDLE = config('DB_POOL_MAX_IDLE', default=300, cast=float)
+DB_POOL_TIMEOUT = config('DB_POOL_TIMEOUT', default=10, cast=float)
+DB_CONN_MAX_AGE = config('DB_CONN_MAX_AGE', default=300, cast=int)
+# required behind transaction-mode PgBouncer (e.g. the Supabase pooler on 6543)
+DB_DISABLE_SERVER_SIDE_CURSORS = config('DB_DISABLE_SERVER_SIDE_CURSORS', default=False, cast=bool)
+
+
+def database_config(url, name):
+    db = dj_database_url.parse(url, conn_max_age=DB_CONN_MAX_AGE, conn_health_checks=True)
+    if db['ENGINE'] != 'django.db.backends.postgresql':
+        return db
+    db['DISABLE_SERVER_SIDE_CURSORS'] = DB_DISABLE_SERVER_SIDE_CURSORS
+    if DB_POOL:
+        db['CONN_MAX_AGE'] = 0
+        db.setdefault('OPTIONS', {})['pool'] = {
+            'name': name,
+            'min_size': DB_POOL_MIN_SIZE,
+            'max_size': DB_POOL_MAX_SIZE,
+            'max_lifetime': DB_POOL_MAX_LIFETIME,
+            'max_idle': DB_POOL_MAX_IDLE,
+            'timeout': DB_POOL_TIMEOUT,
+        }
+    return db
+
+
 DATABASES = {
-    'default': dj_database_url.config(
-        default=config('DATABASE_URL', default='sqlite:///db.sqlite3'),
-        conn_max_age=300,
-        conn_health_checks=False,
+    'default': database_config(
+        config('DATABASE_URL', default='sqlite:///db.sqlite3'), 'default'
     )
 }
 
+# Read replicas: comma separated URLs, exposed as replica_0, replica_1, ...
+# For a local two-database setup point this at a copy of the primary, e.g.
+# DATABASE_REPLICA_URLS=sqlite:///replica.sqlite3
+DATABASE_REPLICA_URLS = config('DATABASE_REPLICA_URLS', default='')
+DATABASE_REPLICAS = []
+
+for index, url in enumerate(u for u in DATABASE_REPLICA_URLS.split(',') if u):
+    alias = f'replica_{index}'
+    DATABASES[alias] = database_config(url, alias)
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    DATABASE_REPLICAS.append(alias)
+
+# Shards for per-user rows (expenses, lend/return, anomalies): comma
+# separated URLs, exposed as shard_1, shard_2, ... after ``default``, which
+# is shard 0 and keeps the global tables. Locally, e.g.
+# DATABASE_SHARD_URLS=sqlite:///shard_1.sqlite3,sqlite:///shard_2.sqlite3
+# Adding a shard moves users: run reshard_users afterwards.
+# The tests add in-memory shards with ExpensesTracker.settings_test.
+DATABASE_SHARD_URLS = config('DATABASE_SHARD_URLS', default='')
+DATABASE_SHARDS = ['default']
+
+for index, url in enumerate((u for u in DATABASE_SHARD_URLS.split(',') if u), start=1):
+    alias = f'shard_{index}'
+    DATABASES[alias] = database_config(url, alias)
+    DATABASE_SHARDS.append(alias)
+
+DATABASE_ROUTERS = [
+    'ExpensesTracker.sharding.UserShardRouter',
+    'ExpensesTracker.db_routing.PrimaryReplicaRouter',
+]
+
+# seconds a user's reads stay on the primary after they write
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=5, cast=int)
+
+# streamed JSON responses: rows fetched per server-side cursor round trip,
+# and characters buffered per chunk written to the client
+STREAMING_CHUNK_SIZE = config('STREAMING_CHUNK_SIZE', default=2000, cast=int)
+STREAMING_BUFFER_SIZE = config('STREAMING_BUFFER_SIZE', default=8192, cast=int)
+
+# Server-Sent Events push (ExpensesTracker.events). The in-process broker
+# only reaches streams held by the same worker; use
+# ExpensesTracker.events.RedisBroker when running several. Messages queued
+# per stream before a slow client is told to resync, seconds between
+# keepalive comments, and the reconnect delay sent to clients.
+EVENTS_BROKER = config('EVENTS_BROKER', default='ExpensesTracker.events.InProcessBroker')
+EVENTS_QUEUE_SIZE = config('EVENTS_QUEUE_SIZE', default=100, cast=int)
+EVENTS_KEEPALIVE_SECONDS = config('EVENTS_KEEPALIVE_SECONDS', default=15, cast=int)
+EVENTS_RETRY_MS = config('EVENTS_RETRY_MS', default=3000, cast=int)
+
+# changes feed (expenses.sync): changes per page, and days delete
+# tombstones are kept before compact_sync_tombstones drops them; clients
+# that last synced before that have to start over
+SYNC_PAGE_SIZE = config('SYNC_PAGE_SIZE', default=500, cast=int)
+SYNC_TOMBSTONE_DAYS = config('SYNC_TOMBSTONE_DAYS', default=90, cast=int)
+
+# response compression (ExpensesTracker.compression): encodings offered in
+# order of preference (zstd and br need the zstandard / brotli packages),
+# the smallest body worth compressing, and the media types compressed.
+# Token-issuing endpoints are left alone, so no secret ends up in a
+# compressed body next to reflected input (BREACH).
+COMPRESSION_ENCODINGS = [
+    name.strip() for name in config('COMPRESSION_ENCODINGS', default='zstd,br,gzip').split(',') if name.strip()
+]
+COMPRESSION_MIN_SIZE = config('COMPRESSION_MIN_SIZE', default=1024, cast=int)
+COMPRESSION_CONTENT_TYPES = {
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'text/csv',
+    'text/css',
+    'text/html',
+    'text/javascript',
+    'text/plain',
+}
+COMPRESSION_SKIP_PATHS = ['/auth/']
+# compressed bodies of cacheable responses (ETag, public or max-age)
+COMPRESSION_CACHE_ALIAS = config('COMPRESSION_CACHE_ALIAS', default='default')
+COMPRESSION_CACHE_SECONDS = config('COMPRESSION_CACHE_SECONDS', default=3600, cast=int)
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+REDIS_URL = config('REDIS_URL', default='')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    } if REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
+# Password hashing
+# https://docs.djangoproject.com/en/5.2/topics/auth/passwords/
+# Stored hashes follow PASSWORD_HASH_ITERATIONS up or down on the next login.
+
+PASSWORD_HASH_ITERATIONS = config('PASSWORD_HASH_ITERATIONS', default=1_000_000, cast=int)
+
+PASSWORD_HASHERS = [
+    'login.hashers.TunablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -140,6 +304,59 @@ CORS_ALLOW_ALL_ORIGINS = True
 EMAIL_HOST_USER = config('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD')
 
+# Currency of FX rates, budgets and reports unless ?currency= asks for
+# another one; also the default currency of new amounts.
+BASE_CURRENCY = config('BASE_CURRENCY', default='INR')
+
+# most occurrences of one recurring rule materialized per scheduler batch
+RECURRING_MAX_CATCHUP = config('RECURRING_MAX_CATCHUP', default=366, cast=int)
+
+# expenses dated before the start of the month this many days ago are moved
+# to the archive table by `archive_expenses`
+EXPENSES_ARCHIVE_AFTER_DAYS = config('EXPENSES_ARCHIVE_AFTER_DAYS', default=1095, cast=int)
+# how long reports cache the last archived day; `archive_expenses` clears it
+# in the shared cache, but without REDIS_URL each process keeps its own copy
+# and may leave just-archived months out of reports for this long
+EXPENSES_ARCHIVE_CACHE_SECONDS = config('EXPENSES_ARCHIVE_CACHE_SECONDS', default=60, cast=int)
+
+# PostgreSQL range partitions of the expenses table: one per 'year' or
+# 'month', kept created this many days ahead by `ensure_expense_partitions`
+EXPENSES_PARTITION_INTERVAL = config('EXPENSES_PARTITION_INTERVAL', default='year')
+EXPENSES_PARTITION_AHEAD_DAYS = config('EXPENSES_PARTITION_AHEAD_DAYS', default=400, cast=int)
+
+# Columnar (Iceberg/Parquet) analytics warehouse fed by `offload_analytics`.
+# The catalog defaults to a SQLite file next to the data files.
+ANALYTICS_WAREHOUSE_DIR = config('ANALYTICS_WAREHOUSE_DIR', default=str(BASE_DIR / 'warehouse'))
+ANALYTICS_CATALOG_URI = config(
+    'ANALYTICS_CATALOG_URI',
+    default=f"sqlite:///{Path(ANALYTICS_WAREHOUSE_DIR) / 'catalog.sqlite3'}",
+)
+ANALYTICS_NAMESPACE = config('ANALYTICS_NAMESPACE', default='expenses_tracker')
+# rows younger than this are left for the next run, so transactions that
+# commit late with an older created_at are not skipped by the watermark
+ANALYTICS_OFFLOAD_LAG_SECONDS = config('ANALYTICS_OFFLOAD_LAG_SECONDS', default=300, cast=int)
+ANALYTICS_OFFLOAD_BATCH = config('ANALYTICS_OFFLOAD_BATCH', default=50000, cast=int)
+# widest start_date..end_date window accepted by the analytics endpoints
+ANALYTICS_MAX_RANGE_DAYS = config('ANALYTICS_MAX_RANGE_DAYS', default=366, cast=int)
+# spending anomalies: a day is flagged when it is above both thresholds
+# against the preceding window and the series had enough active days
+ANOMALY_WINDOW_DAYS = config('ANOMALY_WINDOW_DAYS', default=28, cast=int)
+ANOMALY_ROBUST_Z = config('ANOMALY_ROBUST_Z', default=3.5, cast=float)
+ANOMALY_Z = config('ANOMALY_Z', default=2.0, cast=float)
+ANOMALY_MIN_ACTIVE_DAYS = config('ANOMALY_MIN_ACTIVE_DAYS', default=4, cast=int)
+# spending forecasts: days of history fitted, ridge penalty, and how long
+# fitted parameters stay cached (they are also dropped on every write)
+FORECAST_HISTORY_DAYS = config('FORECAST_HISTORY_DAYS', default=730, cast=int)
+FORECAST_RIDGE = config('FORECAST_RIDGE', default=0.1, cast=float)
+FORECAST_CACHE_SECONDS = config('FORECAST_CACHE_SECONDS', default=86400, cast=int)
+# month partitions with more data files than this are rewritten by --compact
+ANALYTICS_COMPACT_MIN_FILES = config('ANALYTICS_COMPACT_MIN_FILES', default=8, cast=int)
+
+# OTP storage: 'login.otp_store.DatabaseOTPStore' or 'login.otp_store.CacheOTPStore'
+OTP_STORE = config('OTP_STORE', default='login.otp_store.DatabaseOTPStore')
+OTP_CACHE_ALIAS = config('OTP_CACHE_ALIAS', default='default')
+OTP_TTL_SECONDS = config('OTP_TTL_SECONDS', default=300, cast=int)
+
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_PORT = 587
@@ -158,7 +375,18 @@ SWAGGER_SETTINGS = {
         }
     },
     "USE_SESSION_AUTH": False,
+    # the UI fetches the pregenerated schema (ExpensesTracker.api_schema)
+    "SPEC_URL": "schema-json",
 }
+REDOC_SETTINGS = {
+    "SPEC_URL": "schema-json",
+}
+# deploy identifier (e.g. the git commit); the stored OpenAPI schema is
+# regenerated when it changes. Empty derives one from the source files
+CODE_VERSION = config('CODE_VERSION', default=config('RENDER_GIT_COMMIT', default=''))
+OPENAPI_SCHEMA_FILE = config('OPENAPI_SCHEMA_FILE', default=str(BASE_DIR / 'openapi.json'))
+# browsers and proxies revalidate the schema (ETag) after this long
+OPENAPI_SCHEMA_MAX_AGE = config('OPENAPI_SCHEMA_MAX_AGE', default=300, cast=int)
 
 ALLOWED_HOSTS = config(
     "ALLOWED_HOSTS",
@@ -177,6 +405,15 @@ CSRF_TRUSTED_ORIGINS = config(
     default="http://localhost:5173,https://expense-tracker-five-dun.vercel.app,https://expenses-tracker-be-f63s.onrender.com"
 ).split(",")
 
+# readable by browser clients, to pace requests against their budget
+CORS_EXPOSE_HEADERS = [
+    "ratelimit-limit",
+    "ratelimit-remaining",
+    "ratelimit-reset",
+    "ratelimit-policy",
+    "retry-after",
+]
+
 CORS_ALLOW_HEADERS = [
     "authorization",
     "content-type",
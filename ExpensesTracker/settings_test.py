@@ -0,0 +1,11 @@
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASE_SHARDS, DATABASES, database_config
+
+# `manage.py test --settings=ExpensesTracker.settings_test`: unless
+# DATABASE_SHARD_URLS names shards, two in-memory SQLite shards are added
+# so the sharding tests cross databases. (Under the plain settings the
+# tests that need several shards are skipped.)
+if len(DATABASE_SHARDS) == 1:
+    for alias in ("shard_1", "shard_2"):
+        DATABASES[alias] = database_config("sqlite://:memory:", alias)
+        DATABASE_SHARDS.append(alias)
@@ -0,0 +1,482 @@
+import heapq
+from contextlib import contextmanager
+from contextvars import ContextVar
+from itertools import islice, takewhile
+
+import mmh3
+from django.apps import apps
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Count, Sum
+
+
+# Per-user rows live on one of settings.DATABASE_SHARDS, picked by a jump
+# consistent hash of mmh3(user id): growing from N to N + 1 shards moves
+# only 1/(N + 1) of the users. ``default`` is shard 0 and also holds the
+# global tables (users, auth, admin). FX rates are copied to every shard,
+# since conversions run inside each shard's queries.
+#
+# Queries pick their shard from a hint (an instance already bound to a
+# shard, or the user it belongs to) or else from the shard of the current
+# request / job, set with UserShardMixin or on_shard(). Each shard hands
+# out ids from its own block, so rows keep their ids when they move.
+
+# models holding per-user rows, parents first, with the path to their user
+SHARDED_MODELS = {
+    "expenses.expenses": "user_id",
+    "expenses.archivedexpense": "user_id",
+    "expenses.expenserollup": "user_id",
+    "expenses.budget": "user_id",
+    "expenses.budgetspend": "budget__user_id",
+    "expenses.budgetalert": "user_id",
+    "expenses.recurringexpense": "user_id",
+    "expenses.synccounter": "user_id",
+    "expenses.synctombstone": "user_id",
+    "lendandreturn.counterparty": "user_id",
+    "lendandreturn.counterpartyalias": "user_id",
+    "lendandreturn.lendreturn": "user_id",
+    "analytics.spendinganomaly": "user_id",
+}
+# global tables copied to every shard
+REPLICATED_MODELS = {"expenses.fxrate"}
+
+SHARD_ID_BITS = 40
+
+_current_shard = ContextVar("current_shard", default=None)
+
+
+# =========================
+# PLACEMENT
+# =========================
+def _jump_hash(key, buckets):
+    # Lamping & Veach, "A Fast, Minimal Memory, Consistent Hash Algorithm"
+    bucket, candidate = -1, 0
+    while candidate < buckets:
+        bucket = candidate
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        candidate = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+def shard_for(user_id):
+    shards = settings.DATABASE_SHARDS
+    if len(shards) == 1:
+        return shards[0]
+    key = mmh3.hash64(str(user_id), signed=False)[0]
+    return shards[_jump_hash(key, len(shards))]
+
+
+def is_sharded(model):
+    return model._meta.label_lower in SHARDED_MODELS
+
+
+def current_shard():
+    return _current_shard.get() or "default"
+
+
+@contextmanager
+def on_shard(alias):
+    """
+    Route unhinted per-user queries to ``alias`` inside the block (jobs
+    that walk every shard, writes on behalf of another user).
+    """
+    token = _current_shard.set(alias)
+    try:
+        yield alias
+    finally:
+        _current_shard.reset(token)
+
+
+def atomic(using=None):
+    """
+    transaction.atomic() on ``using`` or on the current shard.
+    """
+    return transaction.atomic(using=using or current_shard())
+
+
+# =========================
+# VIEW MIXIN
+# =========================
+class UserShardMixin:
+    """
+    Routes an APIView's per-user queries to the requesting user's shard.
+    Must come before APIView (and ReplicaReadMixin) in the bases.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.user.is_authenticated:
+            self._shard_token = _current_shard.set(shard_for(request.user.pk))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, "_shard_token", None)
+        if token is not None:
+            _current_shard.reset(token)
+            self._shard_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+def user_queryset(request, model):
+    """
+    ``model`` rows visible to the request: the user's own on their shard,
+    or for staff every row of every shard.
+    """
+    if request.user.is_staff or request.user.is_superuser:
+        if len(settings.DATABASE_SHARDS) == 1:
+            return model.objects.all()
+        return ScatterQuerySet.of(model.objects.all())
+    queryset = model.objects.filter(user=request.user)
+    alias = shard_for(request.user.pk)
+    # shard 0 is left to the replica router
+    return queryset if alias == "default" else queryset.using(alias)
+
+
+def read_databases(request, model):
+    """
+    Databases a raw-SQL read of ``model`` for the request must visit:
+    every shard for staff, otherwise wherever the router sends it.
+    """
+    if (request.user.is_staff or request.user.is_superuser) and len(settings.DATABASE_SHARDS) > 1:
+        return list(settings.DATABASE_SHARDS)
+    return [router.db_for_read(model)]
+
+
+# =========================
+# ROUTER
+# =========================
+class UserShardRouter:
+    """
+    Sends per-user models to their shard and lets every other model (and
+    shard 0) fall through to the next router.
+    """
+
+    def _shard(self, model, hints):
+        label = model._meta.label_lower
+        if label in REPLICATED_MODELS:
+            return _current_shard.get()
+        if label not in SHARDED_MODELS:
+            return None
+
+        instance = hints.get("instance")
+        if instance is not None:
+            if is_sharded(type(instance)):
+                # (rows read from a replica of shard 0 carry its alias)
+                if instance._state.db in settings.DATABASE_SHARDS:
+                    return instance._state.db
+                if getattr(instance, "user_id", None) is not None:
+                    return shard_for(instance.user_id)
+            elif instance._meta.label == settings.AUTH_USER_MODEL and instance.pk:
+                # user.expenses.all() and friends
+                return shard_for(instance.pk)
+        return _current_shard.get()
+
+    def db_for_read(self, model, **hints):
+        alias = self._shard(model, hints)
+        # shard 0 reads may still go to a replica of the primary
+        return None if alias == "default" else alias
+
+    def db_for_write(self, model, **hints):
+        return self._shard(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # rows point at users (and FX rates) kept on another database
+        if is_sharded(type(obj1)) or is_sharded(type(obj2)):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # shards 1.. only hold the per-user tables and their reference data
+        if db == "default" or db not in settings.DATABASE_SHARDS:
+            return None
+        if model_name is None:
+            # RunPython / RunSQL: only the apps that have tables there
+            return app_label in {label.split(".")[0] for label in SHARDED_MODELS}
+        return f"{app_label}.{model_name}" in SHARDED_MODELS.keys() | REPLICATED_MODELS
+
+
+# =========================
+# ID BLOCKS
+# =========================
+def reserve_id_block(sender, using, **kwargs):
+    """
+    post_migrate: start the id sequences of shard N's per-user tables at
+    N << SHARD_ID_BITS, so ids never collide between shards.
+    """
+    if using not in settings.DATABASE_SHARDS:
+        return
+    offset = settings.DATABASE_SHARDS.index(using) << SHARD_ID_BITS
+    if not offset:
+        return
+
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        for model in sender.get_models():
+            if not is_sharded(model) or not model._meta.pk.get_internal_type().endswith("AutoField"):
+                continue
+            table = model._meta.db_table
+            if connection.vendor == "sqlite":
+                cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = %s", [table])
+                row = cursor.fetchone()
+                if row is None:
+                    cursor.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)", [table, offset])
+                elif row[0] < offset:
+                    cursor.execute("UPDATE sqlite_sequence SET seq = %s WHERE name = %s", [offset, table])
+            elif connection.vendor == "postgresql":
+                cursor.execute("SELECT pg_get_serial_sequence(%s, %s)", [table, model._meta.pk.column])
+                sequence = cursor.fetchone()[0]
+                cursor.execute(f"SELECT last_value FROM {sequence}")
+                if cursor.fetchone()[0] < offset:
+                    cursor.execute("SELECT setval(%s, %s)", [sequence, offset])
+
+
+# =========================
+# RESHARDING
+# =========================
+def misplaced_users(alias):
+    """
+    ``{target shard: [user ids]}`` of the users with rows on ``alias``
+    that shard_for() now places elsewhere.
+    """
+    user_ids = set()
+    for label, path in SHARDED_MODELS.items():
+        model = apps.get_model(label)
+        user_ids.update(model.objects.using(alias).values_list(path, flat=True).distinct().order_by())
+
+    moves = {}
+    for user_id in sorted(user_ids):
+        target = shard_for(user_id)
+        if target != alias:
+            moves.setdefault(target, []).append(user_id)
+    return moves
+
+
+def move_users(user_ids, source, target, batch_size=2000):
+    """
+    Copy every per-user row of ``user_ids`` from ``source`` to ``target``
+    with its id, then delete it from ``source``. The target commits
+    first, and copies skip rows already there, so an interrupted move is
+    finished by running it again. Returns the number of rows moved.
+
+    Jump hashing only moves users onto shards added after theirs, so
+    rows always arrive from a lower id block and SQLite's AUTOINCREMENT
+    counter on the target stays inside its own block.
+    """
+    moved = 0
+    with transaction.atomic(using=source), transaction.atomic(using=target):
+        for label, path in SHARDED_MODELS.items():
+            model = apps.get_model(label)
+            rows = (
+                model.objects.using(source)
+                .filter(**{f"{path}__in": user_ids})
+                .order_by("pk")
+                .iterator(chunk_size=batch_size)
+            )
+            while chunk := list(islice(rows, batch_size)):
+                model.objects.using(target).bulk_create(chunk, ignore_conflicts=True)
+                moved += len(chunk)
+
+        for label, path in reversed(SHARDED_MODELS.items()):
+            model = apps.get_model(label)
+            model.objects.using(source).filter(**{f"{path}__in": user_ids}).delete()
+    return moved
+
+
+# =========================
+# USER DELETION
+# =========================
+def delete_user_rows(sender, instance, **kwargs):
+    """
+    pre_delete of a user: the CASCADE of the user foreign keys only
+    reaches the default database, so clear the user's shard first.
+    """
+    alias = shard_for(instance.pk)
+    if alias == "default":
+        return
+    with on_shard(alias), atomic():
+        for label, path in reversed(SHARDED_MODELS.items()):
+            model = apps.get_model(label)
+            model.objects.using(alias).filter(**{path: instance.pk}).delete()
+
+
+# =========================
+# SCATTER-GATHER
+# =========================
+def _is_additive(expression):
+    return isinstance(expression, (Sum, Count)) and not getattr(expression, "distinct", False)
+
+
+def add_totals(totals):
+    """
+    Key-wise sum of aggregate() results (None counts as nothing).
+    """
+    result = {}
+    for row in totals:
+        for key, value in row.items():
+            if value is not None:
+                result[key] = value if result.get(key) is None else result[key] + value
+            else:
+                result.setdefault(key, None)
+    return result
+
+
+class ScatterQuerySet:
+    """
+    The same queryset on every shard, for staff-wide reads. Chained
+    calls apply to each shard; evaluating runs one query per shard and
+    gathers the results: ordered rows are merged on the ordering, rows
+    grouped with Sum / Count are added up per group, aggregate() adds
+    the shard totals. Other aggregates cannot be combined and raise.
+    """
+
+    _CHAINED = {
+        "filter", "exclude", "annotate", "alias", "values", "values_list", "order_by",
+        "select_related", "prefetch_related", "only", "defer", "distinct",
+    }
+
+    def __init__(self, querysets):
+        self.querysets = list(querysets)
+
+    @classmethod
+    def of(cls, queryset):
+        return cls(queryset.using(alias) for alias in settings.DATABASE_SHARDS)
+
+    def __getattr__(self, name):
+        if name not in self._CHAINED:
+            raise AttributeError(name)
+
+        def chained(*args, **kwargs):
+            return ScatterQuerySet(getattr(qs, name)(*args, **kwargs) for qs in self.querysets)
+        return chained
+
+    def union(self, *others, all=False):
+        return ScatterQuerySet(
+            qs.union(*(other.querysets[index] for other in others), all=all)
+            for index, qs in enumerate(self.querysets)
+        )
+
+    @property
+    def model(self):
+        return self.querysets[0].model
+
+    @property
+    def db(self):
+        # already bound to every shard (see streaming.stream_rows)
+        return None
+
+    def using(self, alias):
+        return self if alias is None else self.querysets[0].using(alias)
+
+    # ---------- gathering ----------
+    def _row_key(self, fields):
+        names = self.querysets[0]._fields
+        query = self.querysets[0].query
+        if self.querysets[0]._iterable_class.__name__ == "ValuesListIterable":
+            positions = [list(names or []).index(name) for name in fields]
+            return lambda row: tuple(row[i] for i in positions)
+        if names is not None or query.combinator:
+            return lambda row: tuple(row[name] for name in fields)
+        return lambda row: tuple(getattr(row, name) for name in fields)
+
+    def _selected(self):
+        queryset = self.querysets[0]
+        if queryset._fields:
+            return set(queryset._fields)
+        query = queryset.query
+        names = set(query.annotation_select) | set(query.extra_select)
+        for field in queryset.model._meta.concrete_fields:
+            # values() rows are keyed by attname, instances have both
+            names.add(field.attname)
+            if queryset._fields is None:
+                names.add(field.name)
+        return names
+
+    def _ordering(self):
+        """
+        The leading ordering fields the rows carry. Every shard's rows
+        are sorted on the whole ordering, so also on any prefix of it;
+        ordering on a field left out of values() sorts by that prefix.
+        """
+        ordering = [str(name) for name in self.querysets[0].query.order_by]
+        selected = self._selected()
+        return list(takewhile(lambda name: name.lstrip("-") in selected, ordering))
+
+    def _gather(self, results):
+        query = self.querysets[0].query
+        aggregates = {
+            name: expression for name, expression in query.annotation_select.items()
+            if expression.contains_aggregate
+        }
+        ordering = self._ordering()
+
+        if aggregates and self.querysets[0]._fields is not None:
+            return iter(self._regroup(results, aggregates, ordering))
+
+        if not ordering:
+            return (row for rows in results for row in rows)
+        descending = {name.startswith("-") for name in ordering}
+        key = self._row_key([name.lstrip("-") for name in ordering])
+        if len(descending) == 1:
+            return heapq.merge(*results, key=key, reverse=descending.pop())
+        rows = [row for rows in results for row in rows]
+        for name in reversed(ordering):
+            single = self._row_key([name.lstrip("-")])
+            rows.sort(key=single, reverse=name.startswith("-"))
+        return iter(rows)
+
+    def _regroup(self, results, aggregates, ordering):
+        for name, expression in aggregates.items():
+            if not _is_additive(expression):
+                raise NotImplementedError(f"{name}: only Sum and Count can be combined across shards")
+
+        groups = {}
+        for rows in results:
+            for row in rows:
+                key = tuple((name, value) for name, value in row.items() if name not in aggregates)
+                groups[key] = add_totals([groups.get(key, {}), {name: row[name] for name in aggregates}])
+        rows = [dict(key, **totals) for key, totals in groups.items()]
+        for name in reversed(ordering):
+            rows.sort(key=lambda row, field=name.lstrip("-"): row[field], reverse=name.startswith("-"))
+        return rows
+
+    def __iter__(self):
+        return self._gather([list(qs) for qs in self.querysets])
+
+    def iterator(self, chunk_size=None):
+        return self._gather([qs.iterator(chunk_size=chunk_size) for qs in self.querysets])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            stop = index.stop
+            querysets = self.querysets if stop is None else [qs[:stop] for qs in self.querysets]
+            return list(islice(self._gather([list(qs) for qs in querysets]), index.start, stop, index.step))
+        return list(islice(iter(self), index, index + 1))[0]
+
+    # ---------- terminal ----------
+    def aggregate(self, **kwargs):
+        for name, expression in kwargs.items():
+            if not _is_additive(expression):
+                raise NotImplementedError(f"{name}: only Sum and Count can be combined across shards")
+        return add_totals(qs.aggregate(**kwargs) for qs in self.querysets)
+
+    def count(self):
+        return sum(qs.count() for qs in self.querysets)
+
+    def exists(self):
+        return any(qs.exists() for qs in self.querysets)
+
+    def get(self, *args, **kwargs):
+        found = [obj for qs in self.querysets for obj in qs.filter(*args, **kwargs)[:2]]
+        if not found:
+            raise self.model.DoesNotExist(f"{self.model._meta.object_name} matching query does not exist.")
+        if len(found) > 1:
+            raise self.model.MultipleObjectsReturned(f"get() returned more than one {self.model._meta.object_name}")
+        return found[0]
+
+    def first(self):
+        return next(iter(self[:1]), None)
+
+    def in_bulk(self, id_list=None):
+        result = {}
+        for qs in self.querysets:
+            result.update(qs.in_bulk(id_list))
+        return result
@@ -0,0 +1,48 @@
+import json
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+
+# JSON arrays written one element at a time, for endpoints whose rows come
+# from QuerySet.iterator(): memory stays flat however long the history and
+# the first bytes leave before the last row is read. Elements are encoded
+# like DRF's JSONRenderer does (compact, unicode, dates and decimals).
+
+_encoder = JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+def json_array(objects, buffer_size=8192):
+    """
+    Yield the JSON text of the array of ``objects`` in chunks of about
+    ``buffer_size`` characters.
+    """
+    buffer = ["["]
+    size = 1
+    for index, obj in enumerate(objects):
+        text = _encoder.encode(obj)
+        buffer.append("," + text if index else text)
+        size += len(text) + 1
+        if size >= buffer_size:
+            yield "".join(buffer)
+            buffer, size = [], 0
+    buffer.append("]")
+    yield "".join(buffer)
+
+
+def streaming_json_response(objects, status=200):
+    return StreamingHttpResponse(
+        json_array(objects, settings.STREAMING_BUFFER_SIZE),
+        status=status,
+        content_type="application/json",
+    )
+
+
+def stream_rows(queryset):
+    """
+    Iterate ``queryset`` with a server-side cursor. The database is
+    chosen now: the body is produced after the view has returned, when a
+    ReplicaReadMixin view no longer routes reads to a replica.
+    """
+    return queryset.using(queryset.db).iterator(chunk_size=settings.STREAMING_CHUNK_SIZE)
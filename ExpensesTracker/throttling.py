@@ -0,0 +1,201 @@
+import math
+import time
+from collections.abc import Mapping
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+
+# =========================
+# TOKEN BUCKET
+# =========================
+class TokenBucket:
+    """
+    Token bucket stored in a Django cache.
+
+    ``capacity`` tokens refill continuously over ``period`` seconds. Each
+    bucket is a single ``(tokens, timestamp)`` cache entry that is only
+    touched by the requests hitting it, so an idle key costs nothing and
+    expires on its own. The read-modify-write is not atomic across
+    processes; under a race a few extra requests may slip through, which
+    is acceptable for throttling.
+    """
+
+    def __init__(self, capacity, period, cache_alias=None):
+        self.capacity = capacity
+        self.period = period
+        self.refill_rate = capacity / period
+        self.cache = caches[cache_alias or settings.THROTTLE_CACHE_ALIAS]
+
+    def consume(self, key, cost=1):
+        """
+        Try to take ``cost`` tokens. Returns ``(allowed, remaining, wait)``
+        where ``wait`` is the number of seconds until the request would fit.
+        """
+        now = time.time()
+        tokens, stamp = self.cache.get(key) or (self.capacity, now)
+
+        tokens = min(self.capacity, tokens + (now - stamp) * self.refill_rate)
+
+        if tokens >= cost:
+            tokens -= cost
+            allowed = True
+            wait = 0
+        else:
+            allowed = False
+            wait = (cost - tokens) / self.refill_rate
+
+        self.cache.set(key, (tokens, now), timeout=int(self.period) + 1)
+        return allowed, int(tokens), wait
+
+
+# =========================
+# DRF THROTTLES
+# =========================
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Base class for token-bucket throttles. Rates use the DRF
+    ``DEFAULT_THROTTLE_RATES`` format ("10/min") and are looked up as
+    ``<view.throttle_scope>_<kind>``, so one throttle class can protect
+    several views with independent buckets.
+    """
+
+    kind = None
+    bucket = remaining = None
+
+    def get_rate(self, view):
+        scope = getattr(view, "throttle_scope", None)
+        if not scope:
+            return None
+        return api_settings.DEFAULT_THROTTLE_RATES.get(f"{scope}_{self.kind}")
+
+    def get_cache_key(self, request, view):
+        raise NotImplementedError(".get_cache_key() must be overridden")
+
+    def get_bucket_key(self, view, key):
+        return f"throttle:{view.throttle_scope}:{self.kind}:{key}"
+
+    def get_cost(self, request, view):
+        return 1
+
+    def allow_request(self, request, view):
+        self.wait_seconds = None
+
+        rate = self.get_rate(view)
+        key = self.get_cache_key(request, view)
+        if rate is None or key is None:
+            return True
+
+        capacity, period = self.parse_rate(rate)
+        self.bucket = TokenBucket(capacity, period)
+        # a cost above the capacity could never be paid
+        cost = min(self.get_cost(request, view), capacity)
+        allowed, self.remaining, wait = self.bucket.consume(self.get_bucket_key(view, key), cost)
+        if not allowed:
+            self.wait_seconds = wait
+        return allowed
+
+    def parse_rate(self, rate):
+        num, period = rate.split("/")
+        duration = {"s": 1, "m": 60, "h": 3600, "d": 86400}[period[0]]
+        return int(num), duration
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class IPTokenBucketThrottle(TokenBucketThrottle):
+    kind = "ip"
+
+    def get_cache_key(self, request, view):
+        return self.get_ident(request)
+
+
+class IdentifierTokenBucketThrottle(TokenBucketThrottle):
+    """
+    Buckets on the login identifier (email or phone) in the request body,
+    so a distributed attack on one account is limited regardless of how
+    many addresses it comes from.
+    """
+
+    kind = "identifier"
+
+    def get_cache_key(self, request, view):
+        # any JSON value parses; the view rejects non-object bodies with 400
+        if not isinstance(request.data, Mapping):
+            return None
+        identifier = request.data.get("identifier")
+        if not identifier:
+            return None
+        return str(identifier).strip().lower()
+
+
+# =========================
+# COST-WEIGHTED USER BUDGET
+# =========================
+class UserCostThrottle(TokenBucketThrottle):
+    """
+    One bucket per user (per client IP when anonymous) shared by every
+    view: a request spends its view's ``throttle_cost`` tokens (1 unless
+    declared, or a ``{method: cost}`` dict for views whose reads cost
+    more than their writes), so a handful of full-history reads uses up
+    what hundreds of CRUD calls would. The budget is the ``user_cost`` rate. The
+    bucket's state is left on the request for RateLimitHeadersMiddleware.
+    """
+
+    kind = "cost"
+
+    def get_rate(self, view):
+        return api_settings.DEFAULT_THROTTLE_RATES.get("user_cost")
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return f"user:{request.user.pk}"
+        return f"ip:{self.get_ident(request)}"
+
+    def get_bucket_key(self, view, key):
+        return f"throttle:{self.kind}:{key}"
+
+    def get_cost(self, request, view):
+        cost = getattr(view, "throttle_cost", 1)
+        if isinstance(cost, Mapping):
+            method = "GET" if request.method == "HEAD" else request.method
+            return cost.get(method, 1)
+        return cost
+
+    def allow_request(self, request, view):
+        allowed = super().allow_request(request, view)
+        if self.bucket is not None:
+            bucket = self.bucket
+            # set on the Django request, which the middleware sees
+            request._request.rate_limit = {
+                "limit": bucket.capacity,
+                "remaining": self.remaining,
+                "reset": math.ceil((bucket.capacity - self.remaining) / bucket.refill_rate),
+                "window": bucket.period,
+            }
+        return allowed
+
+
+class RateLimitHeadersMiddleware:
+    """
+    Reports the UserCostThrottle budget on every throttled response with
+    the RateLimit-Limit / -Remaining / -Reset / -Policy headers (IETF
+    httpapi ratelimit-headers draft), so clients can slow down before
+    they get a 429.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        state = getattr(request, "rate_limit", None)
+        if state:
+            response["RateLimit-Limit"] = str(state["limit"])
+            response["RateLimit-Remaining"] = str(state["remaining"])
+            response["RateLimit-Reset"] = str(state["reset"])
+            response["RateLimit-Policy"] = f"{state['limit']};w={state['window']}"
+        return response
@@ -16,39 +16,32 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from rest_framework import permissions
+from drf_yasg.renderers import ReDocRenderer, SwaggerUIRenderer
 
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
-
-schema_view = get_schema_view(
-    openapi.Info(
-        title="Expense Tracker API",
-        default_version="v1",
-        description="API documentation for Expense Tracker Backend",
-        terms_of_service="https://www.google.com/policies/terms/",
-        contact=openapi.Contact(email="support@expensetracker.com"),
-        license=openapi.License(name="BSD License"),
-    ),
-    public=True,
-    permission_classes=[permissions.AllowAny],
-)
+from .api_schema import schema_json, schema_view
+from .events import event_stream
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('auth/', include('login.urls')),
     path('expenses/', include('expenses.urls')),
     path('lendandreturn/', include('lendandreturn.urls')),
+    path('analytics/', include('analytics.urls')),
+    path('home/', include('home.urls')),
+    path('events/', event_stream, name='event-stream'),
 
     # 📄 Swagger URLs
+    # pregenerated once per code version (see api_schema); the pages
+    # below only render their shell and fetch it
+    path("swagger.json", schema_json, name="schema-json"),
     path(
         "swagger/",
-        schema_view.with_ui("swagger", cache_timeout=0),
+        schema_view.as_cached_view(cache_timeout=0, renderer_classes=[SwaggerUIRenderer]),
         name="schema-swagger-ui",
     ),
     path(
         "redoc/",
-        schema_view.with_ui("redoc", cache_timeout=0),
+        schema_view.as_cached_view(cache_timeout=0, renderer_classes=[ReDocRenderer]),
         name="schema-redoc",
     ),
 ]
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ExpensesTracker.settings')
 
 application = get_wsgi_application()
+
+# load the OpenAPI schema before the first docs request
+from .api_schema import preload  # noqa: E402
+
+preload()
@@ -0,0 +1,143 @@
+import warnings
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from numpy.lib.stride_tricks import sliding_window_view
+
+from ExpensesTracker import sharding
+from expenses.models import expenses
+
+from .models import SpendingAnomaly
+from .series import daily_matrix, user_totals
+
+
+# A day is anomalous for a series (one user's category, or the user's
+# total) when its spend is far above the preceding window on both a
+# robust scale (median / MAD, Iglewicz-Hoaglin modified z-score) and the
+# classic mean / std z-score. All series of a batch of users are scored
+# at once on a (series, day, window) view of the daily matrix.
+
+MAD_SCALE = 1.4826       # MAD -> standard deviation for normal data
+MEAN_AD_SCALE = 1.2533   # mean absolute deviation -> standard deviation
+
+
+def score(matrix, window):
+    """
+    Score every column of ``matrix`` after the first ``window`` against
+    the ``window`` days before it. Returns a dict of (series, day) arrays.
+    """
+    history = sliding_window_view(matrix, window, axis=1)[:, :-1]
+    current = matrix[:, window:]
+    active_days = (history > 0).sum(axis=-1)
+
+    # a category spent on fewer than half the days has a median of zero,
+    # so any ordinary purchase would stand out; judge those against
+    # their spending days only
+    sparse = active_days * 2 < window
+    reference = np.where(sparse[..., None] & (history <= 0), np.nan, history)
+
+    with warnings.catch_warnings():
+        # all-NaN windows (no spend at all) are never flagged anyway
+        warnings.simplefilter("ignore", RuntimeWarning)
+        median = np.nanmedian(reference, axis=-1)
+        deviation = np.abs(reference - median[..., None])
+        # falls back to the mean absolute deviation when the MAD is 0
+        spread = MAD_SCALE * np.nanmedian(deviation, axis=-1)
+        spread = np.where(spread > 0, spread, MEAN_AD_SCALE * np.nanmean(deviation, axis=-1))
+
+        mean = np.nanmean(reference, axis=-1)
+        std = np.nanstd(reference, axis=-1, ddof=1)
+
+        robust = np.where(spread > 0, (current - median) / spread, 0.0)
+        z = np.where(std > 0, (current - mean) / std, 0.0)
+
+    return {
+        "current": current,
+        "median": median,
+        "robust": robust,
+        "z": z,
+        "active_days": active_days,
+    }
+
+
+def flagged(scores):
+    return (
+        (scores["current"] > scores["median"])
+        & (scores["robust"] >= settings.ANOMALY_ROBUST_Z)
+        & (scores["z"] >= settings.ANOMALY_Z)
+        & (scores["active_days"] >= settings.ANOMALY_MIN_ACTIVE_DAYS)
+    )
+
+
+def _money(value):
+    return Decimal(str(round(float(value), 2)))
+
+
+def detect(user_ids, end, days=1):
+    """
+    Anomalies of ``user_ids`` on the ``days`` days ending at ``end``, as
+    unsaved SpendingAnomaly objects.
+    """
+    window = settings.ANOMALY_WINDOW_DAYS
+    first = end - timedelta(days=days - 1)
+    keys, matrix = daily_matrix(user_ids, first - timedelta(days=window), end)
+    totals_users, totals = user_totals(keys, matrix)
+
+    series = [(user_id, expenses_type) for user_id, expenses_type in keys]
+    series += [(user_id, None) for user_id in totals_users]
+    if not series:
+        return []
+
+    scores = score(np.vstack([matrix, totals]), window)
+    rows, cols = np.nonzero(flagged(scores))
+
+    return [
+        SpendingAnomaly(
+            user_id=series[row][0],
+            expenses_type=series[row][1],
+            date=first + timedelta(days=int(col)),
+            amount=_money(scores["current"][row, col]),
+            baseline=_money(scores["median"][row, col]),
+            robust_zscore=round(float(scores["robust"][row, col]), 3),
+            zscore=round(float(scores["z"][row, col]), 3),
+        )
+        for row, col in zip(rows, cols)
+    ]
+
+
+def active_user_ids(start, end):
+    # only users who spent something in the range can have an anomaly
+    return (
+        expenses.objects.filter(date__range=[start, end])
+        .values_list("user_id", flat=True)
+        .distinct()
+        .order_by("user_id")
+    )
+
+
+def stored_user_ids(start, end):
+    # users whose stored anomalies in the range may no longer hold (their
+    # spend was edited or deleted since)
+    return (
+        SpendingAnomaly.objects.filter(date__range=[start, end])
+        .values_list("user_id", flat=True)
+        .distinct()
+        .order_by("user_id")
+    )
+
+
+def refresh(user_ids, end, days=1):
+    """
+    Recompute and replace the stored anomalies of ``user_ids`` for the
+    ``days`` days ending at ``end``. Safe to re-run.
+    """
+    found = detect(user_ids, end, days)
+    with sharding.atomic():
+        SpendingAnomaly.objects.filter(
+            user_id__in=list(user_ids),
+            date__range=[end - timedelta(days=days - 1), end],
+        ).delete()
+        SpendingAnomaly.objects.bulk_create(found, batch_size=1000)
+    return len(found)
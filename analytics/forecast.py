@@ -0,0 +1,157 @@
+from datetime import date, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q, Sum
+
+from expenses.currency import converted_amount
+from expenses.models import expenses
+
+from .series import daily_matrix
+
+
+# Month-end / year-end projections per category. Each category's daily
+# spend is modelled as trend + day-of-week + day-of-month + month-of-year
+# effects, fitted for all categories of a user in one ridge regression.
+# Fitted coefficients are cached per user for the day and dropped
+# whenever one of the user's expenses is written.
+
+
+def _cache_key(user_id):
+    return f"forecast-params:{user_id}"
+
+
+def invalidate_forecast(*user_ids):
+    cache.delete_many([_cache_key(user_id) for user_id in user_ids])
+
+
+# =========================
+# MODEL
+# =========================
+def _one_hot(values, size):
+    # every level is kept: the ridge penalty shrinks each effect towards
+    # the (unpenalized) intercept, i.e. the average day
+    return np.eye(size)[values]
+
+
+def design(start, end, origin):
+    """
+    Feature matrix for the days ``start``..``end``: intercept, linear
+    trend (in years since ``origin``), weekday, day of month and month.
+    """
+    days = np.arange(np.datetime64(start), np.datetime64(end) + 1, dtype="datetime64[D]")
+    months = days.astype("datetime64[M]")
+    ordinal = days.astype(np.int64)
+
+    return np.column_stack([
+        np.ones(len(days)),
+        (ordinal - np.datetime64(origin).astype(np.int64)) / 365.25,
+        _one_hot((ordinal + 3) % 7, 7),                      # 1970-01-01 was a Thursday
+        _one_hot((days - months).astype(np.int64), 31),
+        _one_hot(months.astype(np.int64) % 12, 12),
+    ])
+
+
+def fit(user_id, today):
+    """
+    Fit every category of ``user_id`` on its daily history up to
+    yesterday. Returns the parameters to cache.
+    """
+    end = today - timedelta(days=1)
+    keys, matrix = daily_matrix([user_id], today - timedelta(days=settings.FORECAST_HISTORY_DAYS), end)
+    params = {"fitted_on": today, "categories": [], "origin": end, "coef": None}
+    if not keys:
+        return params
+
+    # days before the user's first expense are not zero spend
+    first = int(np.argmax(matrix.any(axis=0)))
+    origin = end - timedelta(days=matrix.shape[1] - 1 - first)
+    series = matrix[:, first:]
+
+    X = design(origin, end, origin)
+    penalty = settings.FORECAST_RIDGE * np.eye(X.shape[1])
+    penalty[0, 0] = 0  # the intercept is not shrunk
+    coef = np.linalg.solve(X.T @ X + penalty, X.T @ series.T)
+
+    params.update(
+        categories=[expenses_type for _, expenses_type in keys],
+        origin=origin,
+        coef=coef,
+    )
+    return params
+
+
+def get_params(user_id, today):
+    params = cache.get(_cache_key(user_id))
+    cached = params is not None and params["fitted_on"] == today
+    if not cached:
+        params = fit(user_id, today)
+        cache.set(_cache_key(user_id), params, timeout=settings.FORECAST_CACHE_SECONDS)
+    return params, cached
+
+
+def predict(params, start, end):
+    """
+    Predicted spend per category over ``start``..``end`` (inclusive).
+    """
+    if params["coef"] is None or end < start:
+        return {}
+    daily = design(start, end, params["origin"]) @ params["coef"]
+    totals = np.clip(daily, 0, None).sum(axis=0)
+    return dict(zip(params["categories"], totals.tolist()))
+
+
+# =========================
+# FORECAST
+# =========================
+def forecast(user_id, today=None):
+    """
+    Realized spend so far plus predicted spend for the rest of the
+    current month and year, per category, in the base currency.
+    """
+    today = today or date.today()
+    params, cached = get_params(user_id, today)
+
+    month_start = today.replace(day=1)
+    month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    year_start = date(today.year, 1, 1)
+    year_end = date(today.year, 12, 31)
+
+    amount = converted_amount(settings.BASE_CURRENCY)
+    realized = {
+        row["expenses_type"]: row
+        for row in expenses.objects.filter(
+            user_id=user_id, date__range=[year_start, today]
+        ).values("expenses_type").annotate(
+            month=Sum(amount, filter=Q(date__gte=month_start)),
+            year=Sum(amount),
+        ).order_by()
+    }
+
+    tomorrow = today + timedelta(days=1)
+    periods = {
+        "month": (month_start, month_end, predict(params, tomorrow, month_end)),
+        "year": (year_start, year_end, predict(params, tomorrow, year_end)),
+    }
+
+    categories = sorted(set(params["categories"]) | set(realized))
+    result = {"as_of": today, "fitted_on": params["fitted_on"], "cached": cached}
+    for period, (start, end, predicted) in periods.items():
+        rows = []
+        for expenses_type in categories:
+            spent = float((realized.get(expenses_type) or {}).get(period) or 0)
+            remaining = round(predicted.get(expenses_type, 0.0), 2)
+            rows.append({
+                "expenses_type": expenses_type,
+                "realized": spent,
+                "forecast_remaining": remaining,
+                "projected": round(spent + remaining, 2),
+            })
+        result[period] = {
+            "start": start,
+            "end": end,
+            "categories": rows,
+            "projected_total": round(sum(row["projected"] for row in rows), 2),
+        }
+    return result
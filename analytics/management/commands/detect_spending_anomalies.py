@@ -0,0 +1,39 @@
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ExpensesTracker.sharding import on_shard
+
+from analytics.anomalies import active_user_ids, refresh, stored_user_ids
+
+
+class Command(BaseCommand):
+    help = (
+        "Flag days with unusually high spending per user and category, "
+        "scoring users in vectorized batches. Schedule nightly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", type=date.fromisoformat, default=None,
+                            help="last day to score (default: yesterday)")
+        parser.add_argument("--days", type=int, default=1, help="number of days to score")
+        parser.add_argument("--batch", type=int, default=500, help="users per batch")
+
+    def handle(self, *args, **options):
+        end = options["date"] or date.today() - timedelta(days=1)
+        days = max(options["days"], 1)
+        start = end - timedelta(days=days - 1)
+
+        scored = flagged = 0
+        for alias in settings.DATABASE_SHARDS:
+            with on_shard(alias):
+                # refreshing a user with no spend left only clears the window
+                user_ids = sorted({*active_user_ids(start, end), *stored_user_ids(start, end)})
+                for i in range(0, len(user_ids), options["batch"]):
+                    flagged += refresh(user_ids[i:i + options["batch"]], end, days)
+            scored += len(user_ids)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Scored {scored} user(s) for {start}..{end}, flagged {flagged} anomaly(ies)"
+        ))
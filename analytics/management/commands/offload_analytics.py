@@ -0,0 +1,41 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from analytics.offload import DATASETS, compact, expire_snapshots, offload
+
+
+class Command(BaseCommand):
+    help = (
+        "Append newly created expenses and lend/return rows to the columnar "
+        "analytics warehouse. Schedule periodically (e.g. hourly); run with "
+        "--compact nightly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dataset", action="append", choices=sorted(DATASETS),
+                            help="dataset to process (repeatable, default: all)")
+        parser.add_argument("--batch", type=int, default=None, help="rows per Iceberg commit")
+        parser.add_argument("--compact", action="store_true",
+                            help="also rewrite month partitions with many small files")
+        parser.add_argument("--min-files", type=int, default=None,
+                            help="compact partitions with at least this many files")
+        parser.add_argument("--expire-snapshots-days", type=int, default=None,
+                            help="also drop snapshots older than this many days")
+
+    def handle(self, *args, **options):
+        for dataset in options["dataset"] or sorted(DATASETS):
+            exported = offload(dataset, options["batch"])
+            self.stdout.write(f"{dataset}: exported {exported} row(s)")
+
+            if options["compact"]:
+                for month, files in compact(dataset, options["min_files"]):
+                    self.stdout.write(f"{dataset}: compacted {month:%Y-%m} ({files} files)")
+
+            if options["expire_snapshots_days"] is not None:
+                older_than = timezone.now() - timedelta(days=options["expire_snapshots_days"])
+                expired = expire_snapshots(dataset, older_than)
+                self.stdout.write(f"{dataset}: expired {expired} snapshot(s)")
+
+        self.stdout.write(self.style.SUCCESS("Analytics offload finished"))
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpendingAnomaly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('expenses_type', models.CharField(blank=True, max_length=20, null=True)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('baseline', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('robust_zscore', models.FloatField()),
+                ('zscore', models.FloatField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='spending_anomalies', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-date'], name='analytics_anomaly_user_idx')],
+            },
+        ),
+    ]
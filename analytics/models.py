@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.db import models
+
+
+class OffloadWatermark(models.Model):
+    """
+    How far each dataset has been copied to the columnar warehouse: the
+    (created_at, id) of the last exported row. Rows are exported in that
+    order, so the next run resumes with a single keyset range scan.
+    """
+
+    dataset = models.CharField(max_length=50, unique=True)
+    last_created_at = models.DateTimeField(null=True, blank=True)
+    last_id = models.BigIntegerField(default=0)
+    rows_exported = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.dataset} @ {self.last_created_at} #{self.last_id}"
+
+
+class SpendingAnomaly(models.Model):
+    """
+    A day on which a user's spend in one category (or in total, when
+    expenses_type is null) was far above its recent baseline. Written by
+    the detect_spending_anomalies job, read by the dashboard.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        # users exist on the default database only (see ExpensesTracker.sharding)
+        db_constraint=False,
+        related_name="spending_anomalies"
+    )
+    date = models.DateField()
+    expenses_type = models.CharField(max_length=20, null=True, blank=True)
+    amount = models.DecimalField(max_digits=14, decimal_places=2)
+    # rolling median of the preceding window
+    baseline = models.DecimalField(max_digits=14, decimal_places=2)
+    robust_zscore = models.FloatField()
+    zscore = models.FloatField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "-date"], name="analytics_anomaly_user_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.date} {self.expenses_type or 'total'} {self.amount}"
@@ -0,0 +1,286 @@
+import os
+from collections import Counter
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Q
+from django.utils import timezone
+
+from expenses.models import expenses
+from lendandreturn.models import LendReturn
+
+from .models import OffloadWatermark
+
+
+# Append-only copy of the transactional tables into a local Iceberg
+# warehouse (Parquet data files, month partitions on ``date``). Rows are
+# picked up by a (created_at, id) watermark, so every run only reads what
+# was inserted since the last one. Edits and deletes of already exported
+# rows are not propagated.
+#
+# pyiceberg/pyarrow are only needed by the offload job and by readers of
+# the warehouse, so they are imported lazily.
+
+DATASETS = {
+    "expenses": (expenses, [
+        ("id", "long"),
+        ("user_id", "long"),
+        ("date", "date"),
+        ("expenses_type", "string"),
+        ("amount", "decimal"),
+        ("note", "string"),
+        ("created_at", "timestamp"),
+        ("currency", "string"),
+    ]),
+    "lend_returns": (LendReturn, [
+        ("id", "long"),
+        ("user_id", "long"),
+        ("counterparty_id", "long"),
+        ("person_name", "string"),
+        ("transaction_type", "string"),
+        ("amount", "decimal"),
+        ("date", "date"),
+        ("note", "string"),
+        ("created_at", "timestamp"),
+        ("currency", "string"),
+    ]),
+}
+
+PARTITION_NAME = "date_month"
+
+
+def _require():
+    try:
+        import pyarrow  # noqa: F401
+        import pyiceberg  # noqa: F401
+    except ImportError as exc:
+        raise ImproperlyConfigured(
+            "The analytics warehouse needs pyiceberg and pyarrow installed"
+        ) from exc
+
+
+# =========================
+# SCHEMA
+# =========================
+def arrow_schema(columns):
+    import pyarrow as pa
+
+    types = {
+        "long": pa.int64(),
+        "string": pa.string(),
+        "date": pa.date32(),
+        "decimal": pa.decimal128(10, 2),
+        "timestamp": pa.timestamp("us", tz="UTC"),
+    }
+    return pa.schema([pa.field(name, types[kind]) for name, kind in columns])
+
+
+def iceberg_schema(columns):
+    from pyiceberg.schema import Schema
+    from pyiceberg.types import (
+        DateType, DecimalType, LongType, NestedField, StringType, TimestamptzType,
+    )
+
+    types = {
+        "long": LongType(),
+        "string": StringType(),
+        "date": DateType(),
+        "decimal": DecimalType(10, 2),
+        "timestamp": TimestamptzType(),
+    }
+    return Schema(*[
+        NestedField(field_id, name, types[kind], required=False)
+        for field_id, (name, kind) in enumerate(columns, start=1)
+    ])
+
+
+def month_partition_spec(schema):
+    from pyiceberg.partitioning import PartitionField, PartitionSpec
+    from pyiceberg.transforms import MonthTransform
+
+    return PartitionSpec(PartitionField(
+        source_id=schema.find_field("date").field_id,
+        field_id=1000,
+        transform=MonthTransform(),
+        name=PARTITION_NAME,
+    ))
+
+
+# =========================
+# CATALOG
+# =========================
+def get_catalog():
+    _require()
+    from pyiceberg.catalog.sql import SqlCatalog
+
+    os.makedirs(settings.ANALYTICS_WAREHOUSE_DIR, exist_ok=True)
+    return SqlCatalog(
+        "analytics",
+        uri=settings.ANALYTICS_CATALOG_URI,
+        warehouse=f"file://{os.path.abspath(settings.ANALYTICS_WAREHOUSE_DIR)}",
+    )
+
+
+def get_table(dataset, catalog=None):
+    catalog = catalog or get_catalog()
+    _, columns = DATASETS[dataset]
+    schema = iceberg_schema(columns)
+
+    catalog.create_namespace_if_not_exists(settings.ANALYTICS_NAMESPACE)
+    table = catalog.create_table_if_not_exists(
+        (settings.ANALYTICS_NAMESPACE, dataset),
+        schema=schema,
+        partition_spec=month_partition_spec(schema),
+    )
+
+    # columns added to DATASETS later (new columns go last) are added to
+    # existing tables; older data files read them as null
+    missing = set(schema.column_names) - set(table.schema().column_names)
+    if missing:
+        with table.update_schema() as update:
+            update.union_by_name(schema)
+    return table
+
+
+def read(dataset, row_filter=None, columns=None):
+    """
+    Read ``dataset`` from the warehouse as a pyarrow Table. ``row_filter``
+    is a pyiceberg expression or string (e.g. ``"user_id = 3"``); filters
+    on ``date`` skip whole month partitions.
+    """
+    table = get_table(dataset)
+    kwargs = {}
+    if row_filter is not None:
+        kwargs["row_filter"] = row_filter
+    if columns:
+        kwargs["selected_fields"] = tuple(columns)
+    return table.scan(**kwargs).to_arrow()
+
+
+# =========================
+# OFFLOAD
+# =========================
+def _to_arrow(columns, rows):
+    import pyarrow as pa
+
+    schema = arrow_schema(columns)
+    return pa.table(
+        [pa.array([row[i] for row in rows], type=field.type) for i, field in enumerate(schema)],
+        schema=schema,
+    )
+
+
+def offload(dataset, batch_size=None):
+    """
+    Append rows of ``dataset`` created since the watermark to the
+    warehouse, ``batch_size`` rows per Iceberg commit. Returns the number
+    of rows exported.
+
+    The watermark is saved after each append. A crash in between exports
+    that batch again on the next run; compaction drops the duplicates.
+    """
+    model, columns = DATASETS[dataset]
+    names = [name for name, _ in columns]
+    created_index = names.index("created_at")
+    batch_size = batch_size or settings.ANALYTICS_OFFLOAD_BATCH
+
+    table = get_table(dataset)
+    cutoff = timezone.now() - timedelta(seconds=settings.ANALYTICS_OFFLOAD_LAG_SECONDS)
+
+    exported = 0
+    for alias in settings.DATABASE_SHARDS:
+        # one watermark per shard: each has its own (created_at, id) order
+        key = dataset if alias == "default" else f"{dataset}@{alias}"
+        watermark, _ = OffloadWatermark.objects.get_or_create(dataset=key)
+
+        while True:
+            queryset = model.objects.using(alias).filter(created_at__lt=cutoff)
+            if watermark.last_created_at:
+                queryset = queryset.filter(
+                    Q(created_at__gt=watermark.last_created_at)
+                    | Q(created_at=watermark.last_created_at, id__gt=watermark.last_id)
+                )
+            rows = list(queryset.order_by("created_at", "id").values_list(*names)[:batch_size])
+            if not rows:
+                break
+
+            table.append(_to_arrow(columns, rows))
+
+            watermark.last_created_at = rows[-1][created_index]
+            watermark.last_id = rows[-1][0]
+            watermark.rows_exported += len(rows)
+            watermark.save()
+            exported += len(rows)
+
+    return exported
+
+
+# =========================
+# MAINTENANCE
+# =========================
+def _month_start(months_since_epoch):
+    return date(1970 + months_since_epoch // 12, months_since_epoch % 12 + 1, 1)
+
+
+def _dedupe(data):
+    # keep the last copy of every id (re-exported batches after a crash)
+    positions = {}
+    for position, row_id in enumerate(data.column("id").to_pylist()):
+        positions[row_id] = position
+    if len(positions) < data.num_rows:
+        data = data.take(sorted(positions.values()))
+    return data
+
+
+def compact(dataset, min_files=None):
+    """
+    Rewrite every month partition of ``dataset`` that has accumulated at
+    least ``min_files`` data files (one per offload batch) into a single
+    file, de-duplicated and clustered by user and date. Returns
+    ``[(month_start, files_before), ...]``.
+    """
+    from pyiceberg.expressions import And, GreaterThanOrEqual, LessThan
+
+    min_files = min_files or settings.ANALYTICS_COMPACT_MIN_FILES
+    table = get_table(dataset)
+
+    counts = Counter(
+        partition[PARTITION_NAME]
+        for partition in table.inspect.files().column("partition").to_pylist()
+    )
+
+    compacted = []
+    for month, files in sorted(counts.items()):
+        if month is None or files < min_files:
+            continue
+        start = _month_start(month)
+        end = _month_start(month + 1)
+        month_filter = And(
+            GreaterThanOrEqual("date", start.isoformat()),
+            LessThan("date", end.isoformat()),
+        )
+        data = _dedupe(table.scan(row_filter=month_filter).to_arrow())
+        data = data.sort_by([("user_id", "ascending"), ("date", "ascending"), ("id", "ascending")])
+        table.overwrite(data, overwrite_filter=month_filter)
+        compacted.append((start, files))
+
+    return compacted
+
+
+def expire_snapshots(dataset, older_than):
+    """
+    Drop snapshots older than ``older_than`` (a datetime) from the table
+    metadata; the current snapshot is always kept.
+    """
+    table = get_table(dataset)
+    current = table.current_snapshot()
+    expired = [
+        snapshot.snapshot_id
+        for snapshot in table.snapshots()
+        if snapshot.timestamp_ms < older_than.timestamp() * 1000
+        and (current is None or snapshot.snapshot_id != current.snapshot_id)
+    ]
+    if expired:
+        table.maintenance.expire_snapshots().by_ids(expired).commit()
+    return len(expired)
@@ -0,0 +1,50 @@
+import numpy as np
+from django.conf import settings
+from django.db.models import Sum
+
+from expenses.currency import converted_amount
+from expenses.models import expenses
+
+
+# Daily spend as dense NumPy matrices: one row per (user, category)
+# series, one column per day. Built from a single grouped query per batch
+# of users so the statistics on top of it are plain array operations.
+
+
+def daily_matrix(user_ids, start, end):
+    """
+    Daily per-category spend of ``user_ids`` from ``start`` to ``end``
+    (inclusive), in the base currency. Returns ``(keys, matrix)`` where
+    ``keys[i]`` is the ``(user_id, expenses_type)`` of row ``i`` and
+    ``matrix`` has one column per day, zero on days without spend.
+    """
+    rows = list(
+        expenses.objects.filter(user_id__in=list(user_ids), date__range=[start, end])
+        .values("user_id", "expenses_type", "date")
+        .annotate(total=Sum(converted_amount(settings.BASE_CURRENCY)))
+        .order_by()
+        .values_list("user_id", "expenses_type", "date", "total")
+    )
+
+    keys = sorted({(user_id, expenses_type) for user_id, expenses_type, _, _ in rows})
+    matrix = np.zeros((len(keys), (end - start).days + 1))
+    if rows:
+        index = {key: i for i, key in enumerate(keys)}
+        row_idx = np.fromiter((index[(u, t)] for u, t, _, _ in rows), dtype=np.intp, count=len(rows))
+        col_idx = np.fromiter(((d - start).days for _, _, d, _ in rows), dtype=np.intp, count=len(rows))
+        values = np.fromiter((float(v or 0) for _, _, _, v in rows), dtype=float, count=len(rows))
+        np.add.at(matrix, (row_idx, col_idx), values)
+    return keys, matrix
+
+
+def user_totals(keys, matrix):
+    """
+    Collapse per-category rows into one all-categories row per user.
+    Returns ``(user_ids, matrix)``.
+    """
+    user_ids = sorted({user_id for user_id, _ in keys})
+    totals = np.zeros((len(user_ids), matrix.shape[1]))
+    if keys:
+        index = {user_id: i for i, user_id in enumerate(user_ids)}
+        np.add.at(totals, np.array([index[user_id] for user_id, _ in keys]), matrix)
+    return user_ids, totals
@@ -0,0 +1,158 @@
+import math
+
+from django.db import connections
+from django.db.models import Aggregate, Count, F, FloatField, Q, Value, Window
+from django.db.models.functions import Ceil, Floor, RowNumber, Trunc
+
+from ExpensesTracker.sharding import ScatterQuerySet
+
+
+# Distribution statistics over the rows of an expenses queryset. ``value``
+# is the per-row expression to rank and summarize (an amount, usually
+# converted to the reporting currency). Only the selected rows leave the
+# database, never the whole range.
+
+
+class PercentileCont(Aggregate):
+    # PostgreSQL ordered-set aggregate, interpolating like the SQLite
+    # fallback below
+    function = "PERCENTILE_CONT"
+    name = "PercentileCont"
+    template = "%(function)s(%(fraction)s) WITHIN GROUP (ORDER BY %(expressions)s)"
+
+    def __init__(self, expression, fraction, **extra):
+        super().__init__(expression, fraction=float(fraction), output_field=FloatField(), **extra)
+
+
+def _grouped(queryset, value, bucket):
+    queryset = queryset.annotate(value=value)
+    group = ["expenses_type"]
+    if bucket:
+        queryset = queryset.annotate(bucket=Trunc("date", bucket))
+        group.insert(0, "bucket")
+    return queryset, group
+
+
+# =========================
+# TOP N
+# =========================
+def top_n(queryset, value, n):
+    """
+    The ``n`` largest rows of every expenses_type, ranked by ``value``
+    with ROW_NUMBER() over a per-category window.
+    """
+    ranked = queryset.annotate(
+        value=value,
+        rank=Window(
+            RowNumber(),
+            partition_by=[F("expenses_type")],
+            order_by=[F("value").desc(), F("id").desc()],
+        ),
+    ).filter(rank__lte=n)
+
+    result = {}
+    for row in ranked.order_by("expenses_type", "rank").values(
+        "id", "date", "expenses_type", "amount", "currency", "note", "value"
+    ):
+        result.setdefault(row["expenses_type"], []).append(row)
+    if isinstance(queryset, ScatterQuerySet):
+        # the top n of every shard: keep the top n of those
+        for rows in result.values():
+            rows.sort(key=lambda row: (row["value"], row["id"]), reverse=True)
+            del rows[n:]
+    return result
+
+
+# =========================
+# PERCENTILES
+# =========================
+def percentiles(queryset, value, fractions, bucket=None):
+    """
+    Continuous percentiles of ``value`` per expenses_type (and per
+    ``bucket`` = "week" / "month" of ``date`` when given). Returns
+    ``[{"bucket", "expenses_type", "count", "percentiles": {fraction: v}}]``.
+    """
+    if isinstance(queryset, ScatterQuerySet):
+        return _percentiles_gathered(queryset, value, fractions, bucket)
+    if connections[queryset.db].vendor == "postgresql":
+        return _percentiles_ordered_set(queryset, value, fractions, bucket)
+    return _percentiles_window(queryset, value, fractions, bucket)
+
+
+def _percentiles_ordered_set(queryset, value, fractions, bucket):
+    queryset, group = _grouped(queryset, value, bucket)
+    rows = queryset.values(*group).annotate(
+        count=Count("id"),
+        **{f"p{i}": PercentileCont(F("value"), fraction) for i, fraction in enumerate(fractions)},
+    ).order_by(*group)
+
+    return [
+        {
+            "bucket": row.get("bucket"),
+            "expenses_type": row["expenses_type"],
+            "count": row["count"],
+            "percentiles": {f: row[f"p{i}"] for i, f in enumerate(fractions)},
+        }
+        for row in rows
+    ]
+
+
+def _percentiles_window(queryset, value, fractions, bucket):
+    # Number the rows of every group in value order and fetch only the
+    # (at most two) rows around each percentile position, then
+    # interpolate between them as percentile_cont does.
+    queryset, group = _grouped(queryset, value, bucket)
+    partition = [F(name) for name in group]
+
+    ranked = queryset.annotate(
+        rn=Window(RowNumber(), partition_by=partition, order_by=[F("value").asc(), F("id").asc()]),
+        n=Window(Count("id"), partition_by=partition),
+    )
+
+    wanted = Q()
+    for fraction in fractions:
+        position = Value(1.0) + Value(float(fraction)) * (F("n") - 1)
+        wanted |= Q(rn=Floor(position)) | Q(rn=Ceil(position))
+
+    groups = {}
+    for row in ranked.filter(wanted).values(*group, "rn", "n", "value"):
+        key = tuple(row[name] for name in group)
+        entry = groups.setdefault(key, {"count": row["n"], "values": {}})
+        entry["values"][row["rn"]] = float(row["value"])
+    return _interpolate(groups, group, fractions)
+
+
+def _percentiles_gathered(queryset, value, fractions, bucket):
+    # Percentiles of different shards cannot be combined: bring every
+    # value of the (bounded) range together and rank them here.
+    queryset, group = _grouped(queryset, value, bucket)
+
+    collected = {}
+    for row in queryset.values(*group, "value").iterator():
+        collected.setdefault(tuple(row[name] for name in group), []).append(float(row["value"]))
+
+    groups = {
+        key: {"count": len(values), "values": dict(enumerate(sorted(values), start=1))}
+        for key, values in collected.items()
+    }
+    return _interpolate(groups, group, fractions)
+
+
+def _interpolate(groups, group, fractions):
+    result = []
+    for key in sorted(groups):
+        entry = groups[key]
+        values = {}
+        for fraction in fractions:
+            position = 1 + fraction * (entry["count"] - 1)
+            low, high = math.floor(position), math.ceil(position)
+            lower = entry["values"][low]
+            values[fraction] = lower + (position - low) * (entry["values"][high] - lower)
+        row = dict(zip(group, key))
+        result.append({
+            "bucket": row.get("bucket"),
+            "expenses_type": row["expenses_type"],
+            "count": entry["count"],
+            "percentiles": values,
+        })
+    return result
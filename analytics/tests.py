@@ -0,0 +1,313 @@
+import io
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from importlib.util import find_spec
+from unittest import skipUnless
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from ExpensesTracker.sharding import on_shard, shard_for
+from expenses.models import expenses
+from login.models import User
+
+from . import offload
+from .anomalies import MAD_SCALE, MEAN_AD_SCALE, detect, flagged, score
+from .models import OffloadWatermark, SpendingAnomaly
+
+# more than one with ExpensesTracker.settings_test
+SHARDS = set(settings.DATABASE_SHARDS)
+
+
+class SpendingAnalyticsShardedTests(TestCase):
+    databases = SHARDS
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(
+            email="staff@x.com", phone="0", password=None, name="Staff", is_staff=True
+        )
+        # users until every shard holds one (at least two)
+        cls.users = []
+        while len(cls.users) < 2 or {shard_for(user.pk) for user in cls.users} != SHARDS:
+            n = len(cls.users) + 1
+            cls.users.append(
+                User.objects.create_user(email=f"u{n}@x.com", phone=str(n), password=None, name="U")
+            )
+        for i, user in enumerate(cls.users):
+            with on_shard(shard_for(user.pk)):
+                expenses.objects.create(user=user, date=date(2026, 3, 10), expenses_type="food", amount=Decimal(10 + i))
+                expenses.objects.create(user=user, date=date(2026, 3, 11), expenses_type="rent", amount=Decimal(100 + i))
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, user, **params):
+        client = APIClient()
+        client.force_authenticate(user)
+        params = {"start_date": "2026-03-01", "end_date": "2026-03-31", "bucket": "none", **params}
+        return client.get("/analytics/spending/", params)
+
+    def test_staff_top_n_across_shards(self):
+        response = self.get(self.staff, top=2)
+
+        self.assertEqual(response.status_code, 200)
+        top = {group["expenses_type"]: group["expenses"] for group in response.data["top"]}
+        count = len(self.users)
+        self.assertEqual([e["amount"] for e in top["food"]], [10.0 + count - 1, 10.0 + count - 2])
+        self.assertEqual([e["amount"] for e in top["rent"]], [100.0 + count - 1, 100.0 + count - 2])
+
+    def test_staff_percentiles_across_shards(self):
+        response = self.get(self.staff, percentiles="50")
+
+        self.assertEqual(response.status_code, 200)
+        counts = {row["expenses_type"]: row["count"] for row in response.data["percentiles"]}
+        self.assertEqual(counts, {"food": len(self.users), "rent": len(self.users)})
+
+    def test_user_sees_own_rows_only(self):
+        user = self.users[-1]
+        response = self.get(user)
+
+        self.assertEqual(response.status_code, 200)
+        amounts = sorted(e["amount"] for group in response.data["top"] for e in group["expenses"])
+        self.assertEqual(amounts, [10.0 + len(self.users) - 1, 100.0 + len(self.users) - 1])
+
+
+# =========================
+# ANOMALIES
+# =========================
+@override_settings(ANOMALY_MIN_ACTIVE_DAYS=4)
+class AnomalyScoreTests(SimpleTestCase):
+    def scores(self, *series):
+        return score(np.array(series, dtype=float), 7)
+
+    def test_robust_score_uses_the_mad(self):
+        scores = self.scores([1, 2, 3, 4, 5, 6, 7, 10])
+
+        self.assertEqual(scores["median"][0, 0], 4)
+        self.assertAlmostEqual(scores["robust"][0, 0], 6 / (MAD_SCALE * 2))
+        self.assertAlmostEqual(scores["z"][0, 0], 6 / np.std([1, 2, 3, 4, 5, 6, 7], ddof=1))
+
+    def test_a_zero_mad_falls_back_to_the_mean_deviation(self):
+        scores = self.scores([10, 12, 10, 12, 10, 12, 10, 50])
+
+        self.assertAlmostEqual(scores["robust"][0, 0], 40 / (MEAN_AD_SCALE * 6 / 7))
+        self.assertTrue(flagged(scores)[0, 0])
+
+    def test_sparse_series_are_judged_on_their_spending_days(self):
+        scores = self.scores([0, 30, 0, 0, 30, 0, 0, 30])
+
+        self.assertEqual(scores["median"][0, 0], 30)
+        self.assertEqual(scores["robust"][0, 0], 0)
+        self.assertFalse(flagged(scores)[0, 0])
+
+    def test_series_are_scored_independently(self):
+        ordinary = [10, 12, 10, 12, 10, 12, 10, 11, 12]
+        spiking = [10, 12, 10, 12, 10, 12, 10, 11, 90]
+        together = flagged(self.scores(ordinary, spiking))
+
+        self.assertEqual(together.tolist(), [[False, False], [False, True]])
+        self.assertEqual(together[1].tolist(), flagged(self.scores(spiking))[0].tolist())
+
+
+@override_settings(ANOMALY_WINDOW_DAYS=7, ANOMALY_MIN_ACTIVE_DAYS=4)
+class AnomalyRefreshTests(TestCase):
+    databases = SHARDS
+    day = date(2026, 3, 20)
+
+    def setUp(self):
+        cache.clear()
+        self.users = [
+            User.objects.create_user(email=f"u{n}@x.com", phone=str(n), password=None, name="U")
+            for n in range(1, 5)
+        ]
+        for i, user in enumerate(self.users):
+            # steady food spend, then a spike for every other user
+            for back in range(1, 8):
+                self.add(user, self.day - timedelta(days=back), 10 + back % 2 * 2)
+            self.add(user, self.day, 200 if i % 2 == 0 else 11)
+
+    def add(self, user, day, amount):
+        with on_shard(shard_for(user.pk)):
+            return expenses.objects.create(user=user, date=day, expenses_type="food", amount=amount)
+
+    def stored(self):
+        return sorted(
+            (row.user_id, row.expenses_type or "total", row.date)
+            for alias in SHARDS
+            for row in SpendingAnomaly.objects.using(alias).all()
+        )
+
+    def run_command(self):
+        call_command("detect_spending_anomalies", date=self.day, batch=1, stdout=io.StringIO())
+
+    def test_a_batch_scores_like_users_one_by_one(self):
+        def fields(anomalies):
+            return sorted((a.user_id, a.expenses_type or "total", a.date, a.amount, a.robust_zscore) for a in anomalies)
+
+        for alias in SHARDS:
+            user_ids = [user.pk for user in self.users if shard_for(user.pk) == alias]
+            with on_shard(alias):
+                batch = detect(user_ids, self.day)
+                one_by_one = [a for user_id in user_ids for a in detect([user_id], self.day)]
+            self.assertEqual(fields(batch), fields(one_by_one))
+
+    def test_spikes_are_flagged_per_category_and_in_total(self):
+        self.run_command()
+
+        self.assertEqual(self.stored(), sorted(
+            (user.pk, expenses_type, self.day)
+            for user in self.users[::2]
+            for expenses_type in ("food", "total")
+        ))
+
+    def test_rerunning_replaces_the_window(self):
+        self.run_command()
+        self.run_command()
+
+        self.assertEqual(len(self.stored()), 4)
+
+    def test_anomalies_of_users_without_spend_left_are_cleared(self):
+        self.run_command()
+        user = self.users[0]
+        with on_shard(shard_for(user.pk)):
+            expenses.objects.filter(user=user, date=self.day).delete()
+
+        self.run_command()
+
+        self.assertEqual({user_id for user_id, _, _ in self.stored()}, {self.users[2].pk})
+
+
+# =========================
+# FORECAST
+# =========================
+class ForecastInvalidationTests(TestCase):
+    databases = SHARDS
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email="u1@x.com", phone="1", password=None, name="U")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.today = date.today()
+        with on_shard(shard_for(self.user.pk)):
+            for back in range(1, 61):
+                expenses.objects.create(
+                    user=self.user, date=self.today - timedelta(days=back), expenses_type="food", amount=10
+                )
+        # fitted and cached
+        self.forecast()
+        self.assertTrue(self.forecast()["cached"])
+
+    def forecast(self):
+        response = self.client.get("/analytics/forecast/")
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def assert_refitted(self, write):
+        before = self.forecast()["year"]["projected_total"]
+
+        write()
+        after = self.forecast()
+
+        self.assertFalse(after["cached"])
+        self.assertNotEqual(after["year"]["projected_total"], before)
+
+    def past_expense(self):
+        with on_shard(shard_for(self.user.pk)):
+            return expenses.objects.get(user=self.user, date=self.today - timedelta(days=1))
+
+    def test_api_writes_refit(self):
+        self.assert_refitted(lambda: self.client.post(
+            "/expenses/add-expenses/", {"expenses_type": "rent", "amount": "900"}, format="json"
+        ))
+        self.assert_refitted(lambda: self.client.delete(f"/expenses/add-expenses/{self.past_expense().pk}/"))
+
+    def test_admin_writes_refit(self):
+        admin = APIClient()
+        admin.force_login(User.objects.create_superuser(email="admin@x.com", phone="0", password=None, name="A"))
+        expense = self.past_expense()
+
+        self.assert_refitted(lambda: admin.post(f"/admin/expenses/expenses/{expense.pk}/change/", {
+            "date": expense.date.isoformat(), "expenses_type": "food", "amount": "500",
+            "currency": "INR", "note": "admin",
+        }))
+
+    def test_generated_recurring_expenses_refit(self):
+        response = self.client.post("/expenses/recurring/", {
+            "expenses_type": "rent", "amount": "500", "frequency": "weekly",
+            "start_date": (self.today - timedelta(days=20)).isoformat(),
+        }, format="json")
+        self.assertEqual(response.status_code, 201, response.data)
+
+        self.assert_refitted(lambda: call_command(
+            "materialize_recurring_expenses", today=self.today, stdout=io.StringIO()
+        ))
+
+
+# =========================
+# WAREHOUSE OFFLOAD
+# =========================
+@skipUnless(find_spec("pyiceberg") and find_spec("pyarrow"), "needs pyiceberg and pyarrow")
+class OffloadTests(TestCase):
+    databases = SHARDS
+
+    def setUp(self):
+        cache.clear()
+        warehouse = tempfile.TemporaryDirectory()
+        self.addCleanup(warehouse.cleanup)
+        settings_override = override_settings(
+            ANALYTICS_WAREHOUSE_DIR=warehouse.name,
+            ANALYTICS_CATALOG_URI=f"sqlite:///{warehouse.name}/catalog.sqlite3",
+            ANALYTICS_OFFLOAD_LAG_SECONDS=0,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.users = [
+            User.objects.create_user(email=f"u{n}@x.com", phone=str(n), password=None, name="U")
+            for n in range(1, 4)
+        ]
+
+    def add(self, day):
+        for user in self.users:
+            with on_shard(shard_for(user.pk)):
+                expenses.objects.create(user=user, date=day, expenses_type="food", amount=1)
+
+    def exported_ids(self):
+        return sorted(offload.read("expenses", columns=["id"]).column("id").to_pylist())
+
+    def hot_ids(self):
+        return sorted(
+            expense_id for alias in SHARDS
+            for expense_id in expenses.objects.using(alias).values_list("id", flat=True)
+        )
+
+    def test_reruns_export_only_new_rows(self):
+        self.add(date(2026, 3, 1))
+
+        self.assertEqual(offload.offload("expenses", batch_size=2), 3)
+        self.assertEqual(offload.offload("expenses"), 0)
+        self.add(date(2026, 4, 1))
+        self.assertEqual(offload.offload("expenses"), 3)
+
+        self.assertEqual(self.exported_ids(), self.hot_ids())
+
+    def test_compaction_drops_batches_exported_twice(self):
+        self.add(date(2026, 3, 1))
+        self.add(date(2026, 3, 2))
+        offload.offload("expenses", batch_size=2)
+        # a crash after the append but before the watermark was saved
+        OffloadWatermark.objects.filter(dataset__startswith="expenses").delete()
+        offload.offload("expenses", batch_size=2)
+        self.assertEqual(len(self.exported_ids()), 12)
+
+        compacted = offload.compact("expenses", min_files=2)
+
+        self.assertEqual([month for month, _ in compacted], [date(2026, 3, 1)])
+        self.assertEqual(self.exported_ids(), self.hot_ids())
+        self.assertEqual(offload.compact("expenses", min_files=2), [])
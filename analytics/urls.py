@@ -0,0 +1,8 @@
+from django.urls import path
+from .views import SpendingAnalyticsAPI, SpendingAnomaliesAPI, SpendingForecastAPI
+
+urlpatterns = [
+    path('spending/', SpendingAnalyticsAPI.as_view(), name='spending-analytics'),
+    path('anomalies/', SpendingAnomaliesAPI.as_view(), name='spending-anomalies'),
+    path('forecast/', SpendingForecastAPI.as_view(), name='spending-forecast'),
+]
@@ -0,0 +1,176 @@
+from datetime import date, timedelta
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from ExpensesTracker import sharding
+from ExpensesTracker.db_routing import ReplicaReadMixin
+from ExpensesTracker.sharding import UserShardMixin
+from expenses.currency import converted_amount, requested_currency
+from expenses.models import expenses
+
+from .forecast import forecast
+from .models import SpendingAnomaly
+from .stats import percentiles, top_n
+
+
+# =========================
+# COMMON HELPER
+# =========================
+def get_user_queryset(request):
+    return sharding.user_queryset(request, expenses)
+
+
+def date_range(request):
+    """
+    ``start_date``/``end_date`` of the request, defaulting to the current
+    month so far and capped at ANALYTICS_MAX_RANGE_DAYS.
+    """
+    today = date.today()
+    start = request.query_params.get("start_date")
+    end = request.query_params.get("end_date")
+    start = date.fromisoformat(start) if start else today.replace(day=1)
+    end = date.fromisoformat(end) if end else today
+    if end < start:
+        raise ValueError("end_date must be on or after start_date")
+    if end - start > timedelta(days=settings.ANALYTICS_MAX_RANGE_DAYS):
+        raise ValueError(f"date range is limited to {settings.ANALYTICS_MAX_RANGE_DAYS} days")
+    return start, end
+
+
+# =========================
+# SPENDING DISTRIBUTION
+# =========================
+class SpendingAnalyticsAPI(UserShardMixin, ReplicaReadMixin, APIView):
+    """
+    Largest expenses per category and spending percentiles (per week or
+    month) over a bounded date range, computed in the database.
+    """
+    permission_classes = [IsAuthenticated]
+    throttle_cost = 10
+
+    BUCKETS = {"week": "week", "month": "month", "none": None}
+
+    def get(self, request):
+        try:
+            start, end = date_range(request)
+            top = min(int(request.query_params.get("top", 10)), 100)
+            fractions = sorted({
+                float(p) / 100
+                for p in request.query_params.get("percentiles", "50,90").split(",")
+            })
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if top < 1 or not all(0 <= f <= 1 for f in fractions):
+            return Response(
+                {"error": "top must be positive and percentiles between 0 and 100"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        bucket = request.query_params.get("bucket", "week")
+        if bucket not in self.BUCKETS:
+            return Response(
+                {"error": f"bucket must be one of {', '.join(self.BUCKETS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        currency = requested_currency(request)
+        value = converted_amount(currency)
+
+        queryset = get_user_queryset(request).filter(date__range=[start, end])
+        if request.query_params.get("expenses_type"):
+            queryset = queryset.filter(expenses_type=request.query_params["expenses_type"])
+
+        largest = [
+            {
+                "expenses_type": expenses_type,
+                "expenses": [
+                    {
+                        "id": row["id"],
+                        "date": row["date"],
+                        "amount": float(row["value"]),
+                        "original_amount": float(row["amount"]),
+                        "original_currency": row["currency"],
+                        "note": row["note"],
+                    }
+                    for row in rows
+                ],
+            }
+            for expenses_type, rows in top_n(queryset, value, top).items()
+        ]
+
+        distribution = [
+            {
+                "bucket": row["bucket"],
+                "expenses_type": row["expenses_type"],
+                "count": row["count"],
+                **{
+                    f"p{fraction * 100:g}": round(result, 2)
+                    for fraction, result in row["percentiles"].items()
+                },
+            }
+            for row in percentiles(queryset, value, fractions, self.BUCKETS[bucket])
+        ]
+
+        return Response({
+            "start_date": start,
+            "end_date": end,
+            "currency": currency,
+            "top": largest,
+            "percentiles": distribution,
+        })
+
+
+# =========================
+# SPENDING ANOMALIES
+# =========================
+class SpendingAnomaliesAPI(UserShardMixin, ReplicaReadMixin, APIView):
+    """
+    Anomalies flagged by the nightly detect_spending_anomalies job.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        end = date.today()
+        try:
+            days = min(int(request.query_params.get("days", 30)), settings.ANALYTICS_MAX_RANGE_DAYS)
+        except ValueError:
+            return Response({"error": "days must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        anomalies = SpendingAnomaly.objects.filter(
+            user=request.user,
+            date__gte=end - timedelta(days=days),
+        ).order_by("-date", "expenses_type")
+
+        return Response({
+            "currency": settings.BASE_CURRENCY,
+            "results": [
+                {
+                    "date": anomaly.date,
+                    "expenses_type": anomaly.expenses_type or "all",
+                    "amount": float(anomaly.amount),
+                    "baseline": float(anomaly.baseline),
+                    "robust_zscore": anomaly.robust_zscore,
+                    "zscore": anomaly.zscore,
+                }
+                for anomaly in anomalies
+            ],
+        })
+
+
+# =========================
+# FORECAST
+# =========================
+class SpendingForecastAPI(UserShardMixin, ReplicaReadMixin, APIView):
+    """
+    Projected month-end and year-end spend per category.
+    """
+    permission_classes = [IsAuthenticated]
+    throttle_cost = 2
+
+    def get(self, request):
+        return Response({"currency": settings.BASE_CURRENCY, **forecast(request.user.id)})
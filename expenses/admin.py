@@ -1,3 +1,147 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.db import router, transaction
+from rest_framework import serializers
 
-# Register your models here.
+from ExpensesTracker import sharding
+from ExpensesTracker.admin_tools import ShardedModelAdmin
+from ExpensesTracker.sharding import on_shard, shard_for
+from analytics.forecast import invalidate_forecast
+
+from . import sync
+from .budgets import apply_expense_change, resync_budgets
+from .currency import base_amount, validate_currency
+from .models import ArchivedExpense, expenses
+from .views import publish_expense_change
+
+
+def _set_type_action(value, label):
+    def action(modeladmin, request, queryset):
+        # the selected rows are on the shard the changelist shows
+        user_ids = set(queryset.values_list("user_id", flat=True).distinct())
+        with transaction.atomic(using=queryset.db):
+            sync.restamp(queryset)
+            updated = queryset.update(expenses_type=value)
+        modeladmin.after_bulk_change(user_ids, queryset.db)
+        modeladmin.message_user(request, f"Moved {updated} expense(s) to {label}.", messages.SUCCESS)
+
+    action.__name__ = f"set_type_{value}"
+    action.short_description = f"Change category to {label}"
+    action.allowed_permissions = ("change",)
+    return action
+
+
+class CurrencyAdminForm(forms.ModelForm):
+    # the same check as the API serializers: amounts in a currency without
+    # rates cannot be converted in reports or budgets
+    def clean_currency(self):
+        try:
+            return validate_currency(self.cleaned_data["currency"])
+        except serializers.ValidationError as exc:
+            raise forms.ValidationError(exc.detail)
+
+
+class SyncedModelAdmin(ShardedModelAdmin):
+    """
+    Admin for rows in the changes feed: edits and deletes are numbered in
+    the owners' change sequences like API writes (see expenses.sync).
+    """
+
+    def get_readonly_fields(self, request, obj=None):
+        # sync_seq is numbered by save_model; a row lives on its owner's
+        # shard, so it cannot be handed to another user
+        fields = (*super().get_readonly_fields(request, obj), "sync_seq")
+        return (*fields, "user") if obj is not None else fields
+
+    def save_model(self, request, obj, form, change):
+        using = router.db_for_write(type(obj), instance=obj)
+        with transaction.atomic(using=using):
+            sync.stamp([obj], using)
+            super().save_model(request, obj, form, change)
+
+    def delete_model(self, request, obj):
+        using = router.db_for_write(type(obj), instance=obj)
+        with transaction.atomic(using=using):
+            sync.bury(type(obj), [(obj.pk, obj.user_id)], using)
+            super().delete_model(request, obj)
+
+    @admin.action(description="Delete selected (single DELETE statement)", permissions=["delete"])
+    def delete_selected_set_based(self, request, queryset):
+        with transaction.atomic(using=queryset.db):
+            sync.bury(queryset.model, queryset.values_list("id", "user_id"), queryset.db)
+            super().delete_selected_set_based(request, queryset)
+
+
+@admin.register(expenses)
+class ExpensesAdmin(SyncedModelAdmin):
+    form = CurrencyAdminForm
+    list_display = ("id", "user", "date", "expenses_type", "amount", "currency", "note")
+    list_select_related = ("user",)
+    list_filter = ("expenses_type", "currency")
+    date_hierarchy = "date"
+    raw_id_fields = ("user",)
+    readonly_fields = ("idempotency_key", "created_at")
+    # an email matches the owner (see ShardedModelAdmin)
+    search_fields = ("=id",)
+    ordering = ("-date", "-id")
+
+    actions = ["delete_selected_set_based"] + [
+        _set_type_action(value, label) for value, label in expenses.EXPENSES_CHOICES
+    ]
+
+    # single-row edits keep the budget counters, event streams and
+    # forecast in step like the API does
+    def save_model(self, request, obj, form, change):
+        with on_shard(shard_for(obj.user_id)), sharding.atomic():
+            old = expenses.objects.filter(pk=obj.pk).first() if change else None
+            super().save_model(request, obj, form, change)
+            changes = [(old.date, old.expenses_type, -base_amount(old))] if old else []
+            changes.append((obj.date, obj.expenses_type, base_amount(obj)))
+            self.apply_changes(obj, "updated" if change else "created", changes)
+        invalidate_forecast(obj.user_id)
+
+    def delete_model(self, request, obj):
+        expense_id, amount = obj.pk, base_amount(obj)
+        with on_shard(shard_for(obj.user_id)), sharding.atomic():
+            super().delete_model(request, obj)
+            self.apply_changes(obj, "deleted", [(obj.date, obj.expenses_type, -amount)], expense_id)
+        invalidate_forecast(obj.user_id)
+
+    @staticmethod
+    def apply_changes(obj, action, changes, expense_id=None):
+        for day, expenses_type, amount in changes:
+            apply_expense_change(obj.user_id, expenses_type, day, amount)
+        publish_expense_change(obj.user_id, expense_id or obj.pk, action, changes)
+
+    def after_bulk_change(self, user_ids, using):
+        # set-based writes skip the per-row bookkeeping done by the API
+        with on_shard(using):
+            resync_budgets(user_ids)
+        invalidate_forecast(*user_ids)
+
+    @admin.action(description="Delete selected (single DELETE statement)", permissions=["delete"])
+    def delete_selected_set_based(self, request, queryset):
+        user_ids = set(queryset.values_list("user_id", flat=True).distinct())
+        super().delete_selected_set_based(request, queryset)
+        self.after_bulk_change(user_ids, queryset.db)
+
+
+@admin.register(ArchivedExpense)
+class ArchivedExpenseAdmin(ShardedModelAdmin):
+    list_display = ("id", "user", "date", "expenses_type", "amount", "currency", "archived_at")
+    list_select_related = ("user",)
+    list_filter = ("expenses_type",)
+    date_hierarchy = "date"
+    search_fields = ("=id",)
+    ordering = ("-date", "-id")
+
+    # archived rows only change through archive_expenses, which keeps
+    # the rollups in step
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -1,6 +1,26 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.models.signals import post_migrate, pre_delete
+
+
+def install_fulltext(sender, using, **kwargs):
+    from django.db import connections, router
+    from ExpensesTracker.fulltext import install
+
+    model = sender.get_model("expenses")
+    if router.allow_migrate_model(using, model):
+        install(connections[using], model._meta.db_table, "note")
 
 
 class ExpensesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'expenses'
+
+    def ready(self):
+        from ExpensesTracker.sharding import delete_user_rows, reserve_id_block
+
+        post_migrate.connect(install_fulltext, sender=self)
+        # every app with per-user tables, hence no sender
+        post_migrate.connect(reserve_id_block, dispatch_uid="reserve_shard_id_block")
+        pre_delete.connect(delete_user_rows, sender=settings.AUTH_USER_MODEL,
+                           dispatch_uid="delete_sharded_user_rows")
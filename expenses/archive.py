@@ -0,0 +1,180 @@
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, DateField, Max, Sum
+from django.db.models.functions import Trunc, TruncMonth
+
+from ExpensesTracker import sharding
+
+from .currency import converted_amount
+from .models import ArchivedExpense, ExpenseRollup, expenses
+
+
+# Expenses dated before the archive cutoff live in ArchivedExpense, with
+# per-month totals in ExpenseRollup, so the hot table and its indexes only
+# hold recent years. Reports read the hot table and add archived data only
+# when their date range starts on or before the last archived day.
+
+_THROUGH_KEY = "expenses-archived-through"
+
+ARCHIVED_FIELDS = [
+    "id", "user_id", "date", "expenses_type", "amount", "currency",
+    "note", "idempotency_key", "created_at",
+]
+
+
+def archive_cutoff(today=None):
+    """
+    First day kept in the hot table: the start of the month
+    EXPENSES_ARCHIVE_AFTER_DAYS ago, so months are archived whole.
+    """
+    today = today or date.today()
+    return (today - timedelta(days=settings.EXPENSES_ARCHIVE_AFTER_DAYS)).replace(day=1)
+
+
+# =========================
+# ARCHIVING
+# =========================
+def refresh_rollups(user_ids, start, end):
+    """
+    Recompute the rollups of ``user_ids`` for the months ``start``..``end``
+    from their archived rows.
+    """
+    rows = (
+        ArchivedExpense.objects.filter(
+            user_id__in=user_ids, date__gte=start.replace(day=1), date__lte=end
+        )
+        .annotate(month=TruncMonth("date"))
+        .values("user_id", "month", "expenses_type", "currency")
+        .annotate(
+            total=Sum("amount"),
+            base_total=Sum(converted_amount(settings.BASE_CURRENCY)),
+            count=Count("id"),
+        )
+        .order_by()
+    )
+    ExpenseRollup.objects.bulk_create(
+        [ExpenseRollup(**row) for row in rows],
+        update_conflicts=True,
+        unique_fields=["user", "month", "expenses_type", "currency"],
+        update_fields=["total", "base_total", "count", "updated_at"],
+    )
+
+
+def archive_batch(cutoff, batch_size):
+    """
+    Move up to ``batch_size`` of the oldest hot expenses dated before
+    ``cutoff`` to the archive and refresh the rollups they fall into, on
+    the current shard. Returns the number of expenses moved.
+    """
+    with sharding.atomic():
+        rows = list(
+            expenses.objects.select_for_update(skip_locked=True)
+            .filter(date__lt=cutoff)
+            .order_by("date", "id")[:batch_size]
+        )
+        if not rows:
+            return 0
+
+        ArchivedExpense.objects.bulk_create([
+            ArchivedExpense(**{field: getattr(row, field) for field in ARCHIVED_FIELDS})
+            for row in rows
+        ])
+        expenses.objects.filter(id__in=[row.id for row in rows]).delete()
+        refresh_rollups({row.user_id for row in rows}, rows[0].date, rows[-1].date)
+
+    invalidate_archived_through()
+    return len(rows)
+
+
+# =========================
+# READING
+# =========================
+def archived_through():
+    """
+    Latest archived date on any shard, or None when nothing has been
+    archived. Cached for EXPENSES_ARCHIVE_CACHE_SECONDS; archive_batch()
+    clears the cached value, which only reaches other processes when the
+    cache is shared.
+    """
+    latest = cache.get(_THROUGH_KEY)
+    if latest is None:
+        dates = [
+            ArchivedExpense.objects.using(alias).aggregate(latest=Max("date"))["latest"]
+            for alias in settings.DATABASE_SHARDS
+        ]
+        # False caches "nothing archived" as well
+        latest = max(filter(None, dates), default=None) or False
+        cache.set(_THROUGH_KEY, latest, timeout=settings.EXPENSES_ARCHIVE_CACHE_SECONDS)
+    return latest or None
+
+
+def invalidate_archived_through():
+    cache.delete(_THROUGH_KEY)
+
+
+def reaches_archive(start):
+    """
+    Whether a date range starting at ``start`` (None: unbounded) can
+    include archived expenses.
+    """
+    latest = archived_through()
+    return latest is not None and (start is None or start <= latest)
+
+
+def _whole_months(start, end):
+    return (start is None or start.day == 1) and (end is None or (end + timedelta(days=1)).day == 1)
+
+
+def archived_totals(archive, rollups, currency, group=(), start=None, end=None):
+    """
+    Archived spend in ``currency`` per ``group`` (names among "month" or
+    "year" and "expenses_type"), as ``{(group values): amount}``.
+    Base-currency totals over whole months come from the rollups; any
+    other request is aggregated from the archived rows.
+    """
+    if currency == settings.BASE_CURRENCY and _whole_months(start, end):
+        queryset, day, value = rollups, "month", Sum("base_total")
+    else:
+        queryset, day, value = archive, "date", Sum(converted_amount(currency))
+
+    if start:
+        queryset = queryset.filter(**{f"{day}__gte": start})
+    if end:
+        queryset = queryset.filter(**{f"{day}__lte": end})
+
+    if not group:
+        return {(): queryset.aggregate(total=value)["total"] or 0}
+
+    fields = []
+    for name in group:
+        if name in ("month", "year"):
+            queryset = queryset.annotate(period=Trunc(day, name, output_field=DateField()))
+            name = "period"
+        fields.append(name)
+
+    rows = queryset.values(*fields).annotate(total=value).order_by()
+    return {tuple(row[name] for name in fields): row["total"] or 0 for row in rows}
+
+
+def add_archived(rows, archived, group):
+    """
+    Grouped hot rows (dicts of ``group`` values and total_amount, sorted
+    by group) with the archived totals merged in, in the same order.
+    Lazy, so the hot rows can be streamed.
+    """
+    pending = sorted(archived.items())
+    index = 0
+    for row in rows:
+        key = tuple(row[name] for name in group)
+        while index < len(pending) and pending[index][0] < key:
+            yield dict(zip(group, pending[index][0]), total_amount=pending[index][1])
+            index += 1
+        total = row["total_amount"] or 0
+        if index < len(pending) and pending[index][0] == key:
+            total += pending[index][1]
+            index += 1
+        yield dict(zip(group, key), total_amount=total)
+    for key, amount in pending[index:]:
+        yield dict(zip(group, key), total_amount=amount)
@@ -0,0 +1,184 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import Sum
+
+from ExpensesTracker import sharding
+
+from .currency import converted_amount
+from .models import Budget, BudgetAlert, BudgetPeriod, BudgetSpend, expenses
+
+
+# =========================
+# PERIODS
+# =========================
+def period_bounds(period, day):
+    if period == BudgetPeriod.YEARLY:
+        return date(day.year, 1, 1), date(day.year, 12, 31)
+    start = day.replace(day=1)
+    if start.month == 12:
+        end = date(start.year + 1, 1, 1)
+    else:
+        end = date(start.year, start.month + 1, 1)
+    return start, end - timedelta(days=1)
+
+
+def period_spend(budget, start, end):
+    # budgets are kept in the base currency
+    return expenses.objects.filter(
+        user_id=budget.user_id,
+        expenses_type=budget.expenses_type,
+        date__range=[start, end],
+    ).aggregate(
+        total=Sum(converted_amount(settings.BASE_CURRENCY))
+    )["total"] or Decimal("0")
+
+
+# =========================
+# COUNTERS
+# =========================
+def _threshold_amount(budget, threshold):
+    return budget.limit_amount * Decimal(threshold) / 100
+
+
+def _update_spend(budget, day, delta):
+    """
+    Add ``delta`` to the budget's counter for the period containing
+    ``day`` and return the alerts for thresholds crossed upwards.
+
+    Call after the expense row itself has been written: a missing
+    counter is seeded from one aggregate that already includes it.
+    """
+    start, end = period_bounds(budget.period, day)
+
+    spend = (
+        BudgetSpend.objects.select_for_update()
+        .filter(budget=budget, period_start=start)
+        .first()
+    )
+    if spend is None:
+        seeded = period_spend(budget, start, end)
+        try:
+            with sharding.atomic():
+                spend = BudgetSpend.objects.create(
+                    budget=budget, period_start=start, spent=seeded - delta
+                )
+        except IntegrityError:
+            spend = BudgetSpend.objects.select_for_update().get(budget=budget, period_start=start)
+
+    old = spend.spent
+    new = old + delta
+    spend.spent = new
+
+    alerts = []
+    for threshold in sorted(budget.alert_thresholds):
+        if threshold <= spend.alerted_threshold:
+            continue
+        if old < _threshold_amount(budget, threshold) <= new:
+            alerts.append(BudgetAlert(
+                user_id=budget.user_id,
+                budget=budget,
+                period_start=start,
+                threshold=threshold,
+                spent=new,
+            ))
+            spend.alerted_threshold = threshold
+
+    # spending went back down (edit/delete): allow the alert to fire again
+    while spend.alerted_threshold and new < _threshold_amount(budget, spend.alerted_threshold):
+        lower = [t for t in budget.alert_thresholds if t < spend.alerted_threshold]
+        spend.alerted_threshold = max(lower) if lower else 0
+
+    spend.save(update_fields=["spent", "alerted_threshold", "updated_at"])
+    return alerts
+
+
+def apply_expense_change(user_id, expenses_type, day, delta):
+    """
+    Keep every budget of ``user_id`` covering ``expenses_type`` in sync
+    with an expense write of ``delta`` on ``day``. Returns the alerts
+    created, for the caller to surface in its response.
+    """
+    if not delta:
+        return []
+
+    alerts = []
+    with sharding.atomic():
+        for budget in Budget.objects.filter(user_id=user_id, expenses_type=expenses_type):
+            alerts.extend(_update_spend(budget, day, Decimal(delta)))
+        BudgetAlert.objects.bulk_create(alerts)
+    return alerts
+
+
+# =========================
+# STATUS
+# =========================
+def budget_status(budgets, today=None):
+    """
+    Current-period status for ``budgets``: one query for all counters.
+    """
+    today = today or date.today()
+    budgets = list(budgets)
+
+    starts = {b.pk: period_bounds(b.period, today)[0] for b in budgets}
+    spends = {
+        (s.budget_id, s.period_start): s.spent
+        for s in BudgetSpend.objects.filter(
+            budget__in=budgets,
+            period_start__in=set(starts.values()),
+        )
+    }
+
+    result = []
+    for budget in budgets:
+        start, end = period_bounds(budget.period, today)
+        # no counter yet means nothing was spent since the budget existed
+        spent = spends.get((budget.pk, start), Decimal("0"))
+        used = float(spent / budget.limit_amount * 100) if budget.limit_amount else 0
+        result.append({
+            "id": budget.pk,
+            "expenses_type": budget.expenses_type,
+            "period": budget.period,
+            "period_start": start,
+            "period_end": end,
+            "limit_amount": float(budget.limit_amount),
+            "spent": float(spent),
+            "remaining": float(budget.limit_amount - spent),
+            "percentage_used": round(used, 2),
+            "status": (
+                "exceeded" if used >= 100
+                else "warning" if used >= min(budget.alert_thresholds or [100])
+                else "ok"
+            ),
+        })
+    return result
+
+
+def seed_current_period(budget, today=None):
+    """
+    Initialise the counter for the current period when a budget is
+    created, so spend from before the budget existed is counted.
+    """
+    start, end = period_bounds(budget.period, today or date.today())
+    spent = period_spend(budget, start, end)
+    BudgetSpend.objects.update_or_create(
+        budget=budget, period_start=start, defaults={"spent": spent}
+    )
+
+
+def resync_budgets(user_ids):
+    """
+    Recompute every stored counter of the budgets of ``user_ids`` from
+    the expenses table, after set-based changes (admin bulk actions) that
+    bypass apply_expense_change.
+    """
+    spends = list(
+        BudgetSpend.objects.filter(budget__user_id__in=list(user_ids)).select_related("budget")
+    )
+    for spend in spends:
+        start, end = period_bounds(spend.budget.period, spend.period_start)
+        spend.spent = period_spend(spend.budget, start, end)
+    BudgetSpend.objects.bulk_update(spends, ["spent"], batch_size=1000)
+    return len(spends)
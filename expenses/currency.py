@@ -0,0 +1,163 @@
+import bisect
+import threading
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import (
+    Case, DecimalField, ExpressionWrapper, F, Func, OuterRef, Subquery, Value, When,
+)
+from django.db.models.functions import Coalesce, Round
+from rest_framework import serializers
+
+from .models import FxRate
+
+
+# Rates are stored as the value of one unit of a currency in
+# settings.BASE_CURRENCY. The rate in force on a day is the latest one on
+# or before it (falling back to the first one after it for days before
+# the loaded history starts), both in SQL and in Python.
+
+AMOUNT_FIELD = DecimalField(max_digits=20, decimal_places=2)
+RATE_FIELD = DecimalField(max_digits=20, decimal_places=10)
+
+
+# =========================
+# IN-DATABASE CONVERSION
+# =========================
+class Divisor(Func):
+    # SQLite stores whole-number decimals as integers, and integer / integer
+    # truncates; PostgreSQL numerics divide exactly as they are.
+    template = "%(expressions)s"
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, template="(%(expressions)s * 1.0)", **extra_context)
+
+
+def rate_expression(currency, day):
+    on_or_before = (
+        FxRate.objects.filter(currency=currency, date__lte=day)
+        .order_by("-date").values("rate")[:1]
+    )
+    after = (
+        FxRate.objects.filter(currency=currency, date__gt=day)
+        .order_by("date").values("rate")[:1]
+    )
+    return Coalesce(Subquery(on_or_before), Subquery(after), output_field=RATE_FIELD)
+
+
+def converted_amount(to_currency, amount="amount", currency="currency", day="date"):
+    """
+    Expression for a row's ``amount`` in ``to_currency`` at the rate of
+    the row's ``day``, for use inside aggregates such as
+    ``Sum(converted_amount("USD"))``. Each rate is an index lookup on
+    (currency, date); rows already in the target currency skip them.
+    """
+    base = settings.BASE_CURRENCY
+
+    to_base = Case(
+        When(**{currency: base}, then=Value(Decimal(1))),
+        default=rate_expression(OuterRef(currency), OuterRef(day)),
+        output_field=RATE_FIELD,
+    )
+    value = F(amount) * to_base
+    if to_currency != base:
+        value = value / Divisor(rate_expression(to_currency, OuterRef(day)), output_field=RATE_FIELD)
+
+    return Case(
+        When(**{currency: to_currency}, then=F(amount)),
+        # each converted row is rounded to cents, like a real conversion
+        default=Round(ExpressionWrapper(value, output_field=AMOUNT_FIELD), 2),
+        output_field=AMOUNT_FIELD,
+    )
+
+
+# =========================
+# IN-PROCESS RATE CACHE
+# =========================
+# Per-process, per-currency (dates, rates) lists for converting single
+# amounts (budget counters, generated rows) without a query. A version
+# counter in the shared cache tells other workers when load_fx_rates ran.
+_VERSION_KEY = "fx-rates-version"
+
+_rates = {}
+_currencies = (None, frozenset())
+_lock = threading.Lock()
+
+
+def invalidate_rates():
+    try:
+        cache.incr(_VERSION_KEY)
+    except ValueError:
+        cache.set(_VERSION_KEY, 1, timeout=None)
+
+
+def _history(currency):
+    version = cache.get(_VERSION_KEY, 0)
+    entry = _rates.get(currency)
+    if entry and entry[0] == version:
+        return entry[1], entry[2]
+
+    rows = list(
+        FxRate.objects.filter(currency=currency)
+        .order_by("date").values_list("date", "rate")
+    )
+    dates = [day for day, _ in rows]
+    rates = [rate for _, rate in rows]
+    with _lock:
+        _rates[currency] = (version, dates, rates)
+    return dates, rates
+
+
+def known_currencies():
+    global _currencies
+    version = cache.get(_VERSION_KEY, 0)
+    if _currencies[0] != version:
+        codes = set(FxRate.objects.values_list("currency", flat=True).distinct())
+        codes.add(settings.BASE_CURRENCY)
+        with _lock:
+            _currencies = (version, frozenset(codes))
+    return _currencies[1]
+
+
+def rate_on(currency, day):
+    if currency == settings.BASE_CURRENCY:
+        return Decimal(1)
+    dates, rates = _history(currency)
+    if not dates:
+        raise ValueError(f"No exchange rates loaded for {currency}")
+    return rates[max(bisect.bisect_right(dates, day) - 1, 0)]
+
+
+def convert(amount, from_currency, to_currency, day):
+    if from_currency == to_currency:
+        return amount
+    value = Decimal(amount) * rate_on(from_currency, day) / rate_on(to_currency, day)
+    return value.quantize(Decimal("0.01"))
+
+
+def base_amount(obj):
+    return convert(obj.amount, obj.currency, settings.BASE_CURRENCY, obj.date)
+
+
+# =========================
+# REQUEST HELPERS
+# =========================
+def validate_currency(value):
+    code = (value or "").upper()
+    if code not in known_currencies():
+        raise serializers.ValidationError(f"No exchange rates loaded for {code or 'empty currency'}")
+    return code
+
+
+def requested_currency(request):
+    """
+    Reporting currency of a read request: ``?currency=`` or the base one.
+    """
+    value = request.query_params.get("currency")
+    if not value:
+        return settings.BASE_CURRENCY
+    try:
+        return validate_currency(value)
+    except serializers.ValidationError as exc:
+        raise serializers.ValidationError({"currency": exc.detail})
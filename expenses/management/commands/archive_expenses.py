@@ -0,0 +1,52 @@
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from ExpensesTracker.sharding import on_shard
+
+from expenses.archive import archive_batch, archive_cutoff
+from expenses.models import expenses
+
+
+class Command(BaseCommand):
+    help = (
+        "Move expenses older than EXPENSES_ARCHIVE_AFTER_DAYS from the hot "
+        "table to the archive table and refresh the monthly rollups. Safe "
+        "to re-run. Schedule monthly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch", type=int, default=5000, help="expenses per transaction")
+        parser.add_argument("--before", type=date.fromisoformat, default=None,
+                            help="archive expenses dated before this day (YYYY-MM-DD) "
+                                 "instead of the configured horizon")
+        parser.add_argument("--vacuum", action="store_true",
+                            help="VACUUM ANALYZE the hot table afterwards (PostgreSQL)")
+
+    def handle(self, *args, **options):
+        cutoff = options["before"] or archive_cutoff()
+        total = 0
+
+        for alias in settings.DATABASE_SHARDS:
+            moved = 0
+            with on_shard(alias):
+                while True:
+                    count = archive_batch(cutoff, options["batch"])
+                    if not count:
+                        break
+                    moved += count
+                    self.stdout.write(f"  {alias}: {moved} expense(s) archived")
+
+            connection = connections[alias]
+            if options["vacuum"] and moved and connection.vendor == "postgresql":
+                # return the freed pages and refresh planner statistics now
+                # rather than whenever autovacuum gets to it
+                with connection.cursor() as cursor:
+                    cursor.execute(f"VACUUM (ANALYZE) {expenses._meta.db_table}")
+            total += moved
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {total} expense(s) dated before {cutoff}"
+        ))
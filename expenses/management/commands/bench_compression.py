@@ -0,0 +1,90 @@
+import csv
+import io
+import random
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ExpensesTracker.benchmarking import format_summary, summarize, time_calls
+from ExpensesTracker.compression import CACHED_LEVELS, ENCODERS, LEVELS, available_encodings
+from ExpensesTracker.streaming import json_array
+from expenses.models import expenses
+
+from .bench_search import WORDS
+
+
+class Command(BaseCommand):
+    help = (
+        "Compress synthetic expense list bodies (JSON as ExpensesAPI sends "
+        "it, and CSV) with every available encoding, whole and streamed in "
+        "chunks, and report CPU time against bytes saved."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=20_000)
+        parser.add_argument("--iterations", type=int, default=10)
+
+    def handle(self, *args, **options):
+        rows = self.rows(options["rows"])
+        chunks = [chunk.encode() for chunk in json_array(rows, settings.STREAMING_BUFFER_SIZE)]
+        bodies = {"json": b"".join(chunks), "csv": self.csv(rows)}
+
+        for kind, body in bodies.items():
+            self.stdout.write(f"{kind}: {len(body)} bytes")
+            for name in available_encodings():
+                for label, level in (("per-response", LEVELS[name]), ("cached", CACHED_LEVELS[name])):
+                    size = len(ENCODERS[name](level).finish(body))
+                    summary = summarize(time_calls(
+                        lambda: ENCODERS[name](level).finish(body), options["iterations"]
+                    ))
+                    self.report(f"  {name} {level} ({label})", summary, len(body), size)
+
+            if kind == "json":
+                # what the middleware does to StreamingHttpResponse bodies
+                for name in available_encodings():
+                    level = LEVELS[name]
+                    size = len(self.stream(name, level, chunks))
+                    summary = summarize(time_calls(
+                        lambda: self.stream(name, level, chunks), options["iterations"]
+                    ))
+                    self.report(f"  {name} {level} (streamed)", summary, len(body), size)
+
+    def report(self, label, summary, original, size):
+        throughput = original / 1e6 / (summary["p50_ms"] / 1000) if summary["p50_ms"] else 0
+        self.stdout.write(
+            f"{format_summary(label, summary)} size={size} "
+            f"ratio={original / size:.1f}x saved={original - size} "
+            f"speed={throughput:.0f}MB/s"
+        )
+
+    def stream(self, name, level, chunks):
+        encoder = ENCODERS[name](level)
+        return b"".join([encoder.chunk(chunk) for chunk in chunks] + [encoder.finish()])
+
+    def rows(self, count):
+        rng = random.Random(42)
+        types = [choice for choice, _ in expenses.EXPENSES_CHOICES]
+        start = date.today() - timedelta(days=3 * 365)
+        return [
+            {
+                "id": index + 1,
+                "date": (start + timedelta(days=rng.randrange(3 * 365))).isoformat(),
+                "expenses_type": rng.choice(types),
+                "amount": f"{rng.randrange(1000, 500000) / 100:.2f}",
+                "currency": settings.BASE_CURRENCY,
+                "note": " ".join(rng.choices(WORDS, k=rng.randint(1, 6))),
+                "idempotency_key": None,
+                "created_at": f"{start.isoformat()}T10:{rng.randrange(60):02d}:00Z",
+                "sync_seq": index + 1,
+                "user": rng.randrange(1, 50),
+            }
+            for index in range(count)
+        ]
+
+    def csv(self, rows):
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+        return buffer.getvalue().encode()
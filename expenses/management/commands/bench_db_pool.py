@@ -0,0 +1,51 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from ExpensesTracker.benchmarking import format_summary, summarize
+from ExpensesTracker.db_pool import pool_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulate concurrent request cycles (checkout, query, release) "
+        "against a database alias and report latency, throughput and pool "
+        "statistics. Run once with DB_POOL=True and once with DB_POOL=False "
+        "to compare."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default")
+        parser.add_argument("--threads", type=int, default=16)
+        parser.add_argument("--requests", type=int, default=100, help="request cycles per thread")
+        parser.add_argument("--sql", default="SELECT 1")
+
+    def handle(self, *args, **options):
+        alias = options["database"]
+        sql = options["sql"]
+
+        def worker(_):
+            samples = []
+            for _ in range(options["requests"]):
+                start = time.perf_counter()
+                with connections[alias].cursor() as cursor:
+                    cursor.execute(sql)
+                    cursor.fetchall()
+                # what Django does on request_finished
+                close_old_connections()
+                samples.append((time.perf_counter() - start) * 1000)
+            connections.close_all()
+            return samples
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["threads"]) as executor:
+            results = list(executor.map(worker, range(options["threads"])))
+        elapsed = time.perf_counter() - started
+
+        samples = [s for thread_samples in results for s in thread_samples]
+        self.stdout.write(format_summary(f"{alias} x{options['threads']} threads", summarize(samples)))
+        self.stdout.write(f"    wall-clock throughput: {round(len(samples) / elapsed, 1)} requests/s")
+        self.stdout.write(json.dumps(pool_stats().get(alias), indent=2, default=str))
@@ -0,0 +1,120 @@
+import random
+import re
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from ExpensesTracker.benchmarking import format_summary, summarize, time_calls
+from expenses.models import expenses
+from expenses.partitions import ensure_partitions
+
+HEAP = "bench_expenses_heap"
+PARTITIONED = "bench_expenses_partitioned"
+
+COLUMNS = (
+    "id bigint NOT NULL, user_id bigint NOT NULL, date date NOT NULL, "
+    "expenses_type varchar(20) NOT NULL, amount numeric(10, 2) NOT NULL"
+)
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Load the same synthetic expenses into a plain and a date-partitioned "
+        "scratch table (PostgreSQL, rolled back) and time year-scoped "
+        "aggregates against both, with the partitions each plan scans."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=2_000_000)
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--years", type=int, default=6)
+        parser.add_argument("--queries", type=int, default=20)
+        parser.add_argument("--interval", choices=["year", "month"],
+                            default=settings.EXPENSES_PARTITION_INTERVAL)
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Range partitioning is PostgreSQL only.")
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        today = date.today()
+        first = date(today.year - options["years"] + 1, 1, 1)
+        last = date(today.year, 12, 31)
+        types = [choice for choice, _ in expenses.EXPENSES_CHOICES]
+
+        self.stdout.write(f"loading {options['rows']} rows ...")
+        with connection.cursor() as cursor:
+            cursor.execute(f"CREATE TABLE {HEAP} ({COLUMNS})")
+            cursor.execute(f"CREATE TABLE {PARTITIONED} ({COLUMNS}) PARTITION BY RANGE (date)")
+            ensure_partitions(connection, first, last, options["interval"], table=PARTITIONED)
+
+            cursor.execute("SELECT setseed(0.42)")
+            cursor.execute(
+                f"INSERT INTO {HEAP} "
+                "SELECT g, 1 + g %% %s, %s::date + (random() * (%s::date - %s::date))::int, "
+                "(%s::varchar[])[1 + g %% %s], round((10 + random() * 4990)::numeric, 2) "
+                "FROM generate_series(1, %s) g",
+                [options["users"], first, last, first, types, len(types), options["rows"]],
+            )
+            cursor.execute(f"INSERT INTO {PARTITIONED} SELECT * FROM {HEAP}")
+            for table in (HEAP, PARTITIONED):
+                # the indexes the expenses table has on these columns
+                cursor.execute(f"CREATE INDEX ON {table} (user_id, date)")
+                cursor.execute(f"CREATE INDEX ON {table} (date)")
+                cursor.execute(f"ANALYZE {table}")
+
+        rng = random.Random(42)
+        year = today.year - 1
+        year_start, next_year = date(year, 1, 1), date(year + 1, 1, 1)
+        month_start, next_month = date(year, 6, 1), date(year, 7, 1)
+
+        queries = [
+            ("one user, this vs last year",
+             "SELECT sum(amount) FILTER (WHERE date >= %s), sum(amount) FILTER (WHERE date < %s) "
+             "FROM {table} WHERE user_id = %s AND date >= %s AND date < %s",
+             lambda: [next_year, next_year, rng.randrange(1, options["users"] + 1), year_start, date(year + 2, 1, 1)]),
+            ("all users, one year by month + category",
+             "SELECT date_trunc('month', date), expenses_type, sum(amount) FROM {table} "
+             "WHERE date >= %s AND date < %s GROUP BY 1, 2",
+             lambda: [year_start, next_year]),
+            ("all users, one year by EXTRACT (baseline)",
+             "SELECT date_trunc('month', date), expenses_type, sum(amount) FROM {table} "
+             "WHERE EXTRACT(year FROM date) = %s GROUP BY 1, 2",
+             lambda: [year]),
+            ("all users, one month total",
+             "SELECT sum(amount) FROM {table} WHERE date >= %s AND date < %s",
+             lambda: [month_start, next_month]),
+        ]
+
+        for label, sql, params in queries:
+            for table in (HEAP, PARTITIONED):
+                query = sql.format(table=table)
+
+                def run_query():
+                    with connection.cursor() as cursor:
+                        cursor.execute(query, params())
+                        cursor.fetchall()
+
+                summary = summarize(time_calls(run_query, options["queries"]))
+                self.stdout.write(
+                    format_summary(f"{'partitioned' if table == PARTITIONED else 'heap'}: {label}", summary)
+                    + f" partitions={self.scanned(query, params())}"
+                )
+
+    def scanned(self, query, params):
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN {query}", params)
+            plan = "\n".join(row[0] for row in cursor.fetchall())
+        return len(set(re.findall(rf"{PARTITIONED}_p\w+", plan)))
@@ -0,0 +1,97 @@
+import random
+import uuid
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from ExpensesTracker import fulltext
+from ExpensesTracker.benchmarking import format_summary, summarize, time_calls
+from expenses.models import expenses
+from login.models import User
+
+WORDS = (
+    "rent landlord deposit grocery vegetables milk bread coffee lunch dinner "
+    "taxi metro bus train flight hotel petrol parking shoes shirt jeans gift "
+    "electricity water internet mobile recharge movie concert netflix spotify "
+    "pharmacy doctor gym books stationery repair laundry salon snacks party"
+).split()
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Load synthetic expenses into a rolled-back transaction and time "
+        "full-text note searches against an icontains scan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=200_000)
+        parser.add_argument("--users", type=int, default=50)
+        parser.add_argument("--queries", type=int, default=30)
+        parser.add_argument("--batch", type=int, default=10_000)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        rng = random.Random(42)
+        tag = uuid.uuid4().hex[:8]
+        users = [
+            User.objects.create_user(
+                email=f"bench-{tag}-{i}@example.com", phone=f"{tag}{i}", password=None, name="bench"
+            )
+            for i in range(options["users"])
+        ]
+        types = [choice for choice, _ in expenses.EXPENSES_CHOICES]
+        start = date.today() - timedelta(days=5 * 365)
+
+        self.stdout.write(f"loading {options['rows']} rows ...")
+        remaining = options["rows"]
+        while remaining:
+            size = min(options["batch"], remaining)
+            expenses.objects.bulk_create(
+                expenses(
+                    user=rng.choice(users),
+                    date=start + timedelta(days=rng.randrange(5 * 365)),
+                    expenses_type=rng.choice(types),
+                    amount=rng.randrange(10, 5000),
+                    note=" ".join(rng.choices(WORDS, k=rng.randint(2, 8)) + [f"ref{rng.randrange(options['rows'])}"]),
+                )
+                for _ in range(size)
+            )
+            remaining -= size
+
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute(f"ANALYZE {expenses._meta.db_table}")
+
+        user = users[0]
+        queries = [
+            ("single term", lambda: fulltext.search(
+                expenses, "note", rng.choice(WORDS), filters={"user_id": user.id})),
+            ("prefix", lambda: fulltext.search(
+                expenses, "note", rng.choice(WORDS)[:3], filters={"user_id": user.id})),
+            ("two terms + date range + category", lambda: fulltext.search(
+                expenses, "note", " ".join(rng.sample(WORDS, 2)),
+                filters={"user_id": user.id, "expenses_type": rng.choice(types)},
+                date_range=(start + timedelta(days=365), start + timedelta(days=730)))),
+            ("all users, single term", lambda: fulltext.search(
+                expenses, "note", rng.choice(WORDS))),
+            ("all users, selective term", lambda: fulltext.search(
+                expenses, "note", f"ref{rng.randrange(options['rows'])}")),
+            ("all users, selective icontains (baseline)", lambda: list(
+                expenses.objects.filter(note__icontains=f"ref{rng.randrange(options['rows'])}")
+                .values_list("id", flat=True)[:50])),
+        ]
+
+        for label, fn in queries:
+            self.stdout.write(format_summary(label, summarize(time_calls(fn, options["queries"]))))
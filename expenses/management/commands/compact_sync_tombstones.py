@@ -0,0 +1,37 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from ExpensesTracker import sharding
+from ExpensesTracker.sharding import on_shard
+
+from expenses.sync import compact
+
+
+class Command(BaseCommand):
+    help = (
+        "Drop changes-feed tombstones older than SYNC_TOMBSTONE_DAYS. "
+        "Clients whose cursor predates a dropped tombstone get 410 and "
+        "sync from the start. Schedule daily."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=None,
+                            help="keep tombstones this many days instead of SYNC_TOMBSTONE_DAYS")
+
+    def handle(self, *args, **options):
+        days = options["days"] if options["days"] is not None else settings.SYNC_TOMBSTONE_DAYS
+        before = timezone.now() - timedelta(days=days)
+        total = 0
+
+        for alias in settings.DATABASE_SHARDS:
+            with on_shard(alias), sharding.atomic():
+                dropped = compact(before)
+            self.stdout.write(f"  {alias}: {dropped} tombstone(s) dropped")
+            total += dropped
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Dropped {total} tombstone(s) older than {days} day(s)"
+        ))
@@ -0,0 +1,47 @@
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from expenses.partitions import ensure_partitions, is_partitioned
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the PostgreSQL partitions of the expenses table for the next "
+        "EXPENSES_PARTITION_AHEAD_DAYS, so new rows never land in the default "
+        "partition. Safe to re-run. Schedule monthly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ahead-days", type=int, default=None,
+                            help="cover this many days from today instead of the setting")
+        parser.add_argument("--interval", choices=["year", "month"], default=None,
+                            help="partition size instead of EXPENSES_PARTITION_INTERVAL")
+
+    def handle(self, *args, **options):
+        today = date.today()
+        ahead = options["ahead_days"]
+        if ahead is None:
+            ahead = settings.EXPENSES_PARTITION_AHEAD_DAYS
+        total = 0
+
+        # every shard holds its own expenses table
+        for alias in settings.DATABASE_SHARDS:
+            connection = connections[alias]
+            if not is_partitioned(connection):
+                self.stdout.write(f"The expenses table is not partitioned on {alias}; nothing to do.")
+                continue
+
+            created = ensure_partitions(
+                connection,
+                today,
+                today + timedelta(days=ahead),
+                options["interval"] or settings.EXPENSES_PARTITION_INTERVAL,
+            )
+            for name in created:
+                self.stdout.write(f"  {alias}: created {name}")
+            total += len(created)
+
+        self.stdout.write(self.style.SUCCESS(f"Created {total} partition(s)"))
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ExpensesTracker import api_schema
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate the OpenAPI schema served at /swagger.json and store it "
+        "in OPENAPI_SCHEMA_FILE, tagged with the code version. Run on "
+        "deploy; servers regenerate a missing or stale file themselves."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", default=None, help="write here instead of OPENAPI_SCHEMA_FILE")
+        parser.add_argument("--if-stale", action="store_true",
+                            help="keep the stored schema when it is already for this code version")
+
+    def handle(self, *args, **options):
+        path = options["output"] or settings.OPENAPI_SCHEMA_FILE
+        if options["if_stale"]:
+            stored = api_schema.read(path)
+            if stored is not None and stored.version == api_schema.code_version():
+                self.stdout.write(f"Schema at {path} is current ({stored.version})")
+                return
+
+        schema = api_schema.generate()
+        api_schema.write(schema, path)
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {len(schema.body)} bytes to {path} (version {schema.version}, ETag {schema.etag})"
+        ))
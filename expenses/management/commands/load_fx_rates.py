@@ -0,0 +1,58 @@
+import csv
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses.currency import invalidate_rates
+from expenses.models import FxRate
+
+
+class Command(BaseCommand):
+    help = (
+        "Load FX rates from CSV files with a date,currency,rate header. "
+        "rate is the value of one unit of currency in BASE_CURRENCY "
+        "(use --inverse for files quoting units of currency per BASE_CURRENCY). "
+        "Existing (currency, date) rows are updated."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("files", nargs="+")
+        parser.add_argument("--inverse", action="store_true")
+        parser.add_argument("--batch", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        rates = {}
+        for path in options["files"]:
+            with open(path, newline="", encoding="utf-8") as fh:
+                for line, row in enumerate(csv.DictReader(fh), start=2):
+                    try:
+                        currency = row["currency"].strip().upper()
+                        day = date.fromisoformat(row["date"].strip())
+                        rate = Decimal(row["rate"].strip())
+                    except (KeyError, ValueError, InvalidOperation, AttributeError):
+                        raise CommandError(f"{path}:{line}: expected date,currency,rate")
+                    if len(currency) != 3 or rate <= 0:
+                        raise CommandError(f"{path}:{line}: invalid currency or rate")
+                    if currency == settings.BASE_CURRENCY:
+                        continue
+                    if options["inverse"]:
+                        rate = 1 / rate
+                    rates[(currency, day)] = rate
+
+        # conversions run inside each shard's queries: every shard gets a copy
+        for alias in settings.DATABASE_SHARDS:
+            FxRate.objects.using(alias).bulk_create(
+                [FxRate(currency=c, date=d, rate=r) for (c, d), r in rates.items()],
+                batch_size=options["batch"],
+                update_conflicts=True,
+                unique_fields=["currency", "date"],
+                update_fields=["rate"],
+            )
+        invalidate_rates()
+
+        currencies = sorted({c for c, _ in rates})
+        self.stdout.write(self.style.SUCCESS(
+            f"Loaded {len(rates)} rate(s) for {', '.join(currencies) or 'no currencies'}"
+        ))
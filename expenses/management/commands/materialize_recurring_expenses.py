@@ -0,0 +1,39 @@
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ExpensesTracker.sharding import on_shard
+
+from expenses.recurring import due_rules, materialize_batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the expenses for every recurring rule that is due, catching "
+        "up on periods missed while the scheduler was down. Safe to re-run. "
+        "Schedule daily."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch", type=int, default=1000, help="rules per transaction")
+        parser.add_argument("--today", type=date.fromisoformat, default=None,
+                            help="materialize as of this date (YYYY-MM-DD)")
+
+    def handle(self, *args, **options):
+        today = options["today"] or date.today()
+        rules_seen = created = 0
+
+        for alias in settings.DATABASE_SHARDS:
+            with on_shard(alias):
+                while True:
+                    rules = due_rules(today, options["batch"])
+                    if not rules:
+                        break
+                    created += materialize_batch(rules, today)
+                    rules_seen += len(rules)
+                    self.stdout.write(f"  {alias}: {rules_seen} rule(s) processed, {created} expense(s) created")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Materialized {created} expense(s) from {rules_seen} rule update(s) as of {today}"
+        ))
@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ExpensesTracker.sharding import misplaced_users, move_users
+from expenses.archive import invalidate_archived_through
+
+
+class Command(BaseCommand):
+    help = (
+        "Move users whose rows sit on another shard than the one shard_for() "
+        "picks for them, e.g. after adding a URL to DATABASE_SHARD_URLS. "
+        "Moved users' data is unavailable until their batch is done, so run "
+        "it before sending traffic to the new layout. Safe to re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch", type=int, default=100, help="users per transaction")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="only report how many users would move where")
+
+    def handle(self, *args, **options):
+        users = rows = 0
+
+        for source in settings.DATABASE_SHARDS:
+            for target, user_ids in misplaced_users(source).items():
+                self.stdout.write(f"{source} -> {target}: {len(user_ids)} user(s)")
+                if options["dry_run"]:
+                    continue
+                for i in range(0, len(user_ids), options["batch"]):
+                    batch = user_ids[i:i + options["batch"]]
+                    rows += move_users(batch, source, target)
+                    users += len(batch)
+                    self.stdout.write(f"  {users} user(s), {rows} row(s) moved")
+
+        # archived rows may have moved between shards
+        invalidate_archived_through()
+        self.stdout.write(self.style.SUCCESS(f"Moved {users} user(s), {rows} row(s)"))
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:46
+
+import expenses.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0006_expenses_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='expenses',
+            name='currency',
+            field=models.CharField(default=expenses.models.default_currency, max_length=3),
+        ),
+        migrations.AddField(
+            model_name='recurringexpense',
+            name='currency',
+            field=models.CharField(default=expenses.models.default_currency, max_length=3),
+        ),
+        migrations.CreateModel(
+            name='FxRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(max_length=3)),
+                ('date', models.DateField()),
+                ('rate', models.DecimalField(decimal_places=10, max_digits=20)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('currency', 'date'), name='expenses_fxrate_unique_day')],
+            },
+        ),
+    ]
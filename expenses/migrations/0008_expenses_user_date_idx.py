@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0007_currencies'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='expenses',
+            index=models.Index(fields=['user', 'date'], name='expenses_user_date_idx'),
+        ),
+    ]
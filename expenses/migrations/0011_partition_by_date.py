@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-19 14:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+from expenses.partitions import partition_table, unpartition_table
+
+
+def partition(apps, schema_editor):
+    # range partitioning is PostgreSQL only; other backends keep one table
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    partition_table(
+        schema_editor,
+        apps.get_model("expenses", "expenses"),
+        settings.EXPENSES_PARTITION_INTERVAL,
+        settings.EXPENSES_PARTITION_AHEAD_DAYS,
+    )
+
+
+def unpartition(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    unpartition_table(schema_editor, apps.get_model("expenses", "expenses"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0010_archive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='expenses',
+            name='idempotency_key',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='expenses',
+            constraint=models.UniqueConstraint(fields=('idempotency_key', 'date'), name='expenses_idempotency_key_date_uniq'),
+        ),
+        migrations.RunPython(partition, unpartition),
+    ]
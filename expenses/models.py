@@ -1,6 +1,13 @@
+from datetime import date
+
 from django.db import models
 from django.conf import settings
 
+
+def default_currency():
+    return settings.BASE_CURRENCY
+
+
 class expenses(models.Model):
 
     EXPENSES_CHOICES = [
@@ -15,16 +22,315 @@ class expenses(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        # users exist on the default database only (see ExpensesTracker.sharding)
+        db_constraint=False,
         related_name="expenses" 
     )
-    date = models.DateField(auto_now_add=True)
+    date = models.DateField(default=date.today)
     expenses_type = models.CharField(choices=EXPENSES_CHOICES)
     amount = models.DecimalField(
         max_digits=10,
         decimal_places=2, null=False
     )
+    # ISO 4217 code of amount
+    currency = models.CharField(max_length=3, default=default_currency)
     note = models.CharField(max_length=150, null=True)
+    # set by generated rows (e.g. recurring:<rule id>:<date>) so re-runs
+    # never insert the same occurrence twice; unique per date, as keys
+    # carry their date and PostgreSQL partitions by it
+    idempotency_key = models.CharField(max_length=64, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # the user's change sequence number of the last write (expenses.sync)
+    sync_seq = models.BigIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # keyset scans of newly inserted rows (analytics offload)
+            models.Index(fields=["created_at", "id"], name="expenses_created_id_idx"),
+            # changes feed: a user's rows written after a cursor
+            models.Index(fields=["user", "sync_seq", "id"], name="expenses_user_sync_idx"),
+            # per-user date-range scans (analytics, reports)
+            models.Index(fields=["user", "date"], name="expenses_user_date_idx"),
+            # admin date_hierarchy and cross-user date ranges
+            models.Index(fields=["date"], name="expenses_date_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["idempotency_key", "date"],
+                name="expenses_idempotency_key_date_uniq",
+            ),
+        ]
+
+    def __str__(self):
+        return self.expenses_type
+
+
+class BudgetPeriod(models.TextChoices):
+    MONTHLY = "monthly", "Monthly"
+    YEARLY = "yearly", "Yearly"
+
+
+def default_alert_thresholds():
+    return [50, 80, 100]
+
+
+class Budget(models.Model):
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        related_name="budgets"
+    )
+    expenses_type = models.CharField(choices=expenses.EXPENSES_CHOICES)
+    period = models.CharField(
+        max_length=10,
+        choices=BudgetPeriod.choices,
+        default=BudgetPeriod.MONTHLY
+    )
+    limit_amount = models.DecimalField(max_digits=12, decimal_places=2)
+    # percentages of limit_amount that raise an alert when crossed
+    alert_thresholds = models.JSONField(default=default_alert_thresholds)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "expenses_type", "period"],
+                name="expenses_budget_unique_period",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.expenses_type} {self.period} {self.limit_amount}"
+
+
+class BudgetSpend(models.Model):
+    """
+    Running spend of one budget in one period, maintained incrementally
+    on every expense write so status reads never aggregate history.
+    """
+
+    budget = models.ForeignKey(
+        Budget,
+        on_delete=models.CASCADE,
+        related_name="spends"
+    )
+    period_start = models.DateField()
+    spent = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    # highest threshold already alerted in this period
+    alerted_threshold = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["budget", "period_start"],
+                name="expenses_budgetspend_unique_period",
+            ),
+        ]
+
+
+class BudgetAlert(models.Model):
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        related_name="budget_alerts"
+    )
+    budget = models.ForeignKey(
+        Budget,
+        on_delete=models.CASCADE,
+        related_name="alerts"
+    )
+    period_start = models.DateField()
+    threshold = models.IntegerField()
+    spent = models.DecimalField(max_digits=14, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "-created_at"], name="expenses_budgetalert_user_idx"),
+        ]
+
+
+class RecurrenceFrequency(models.TextChoices):
+    DAILY = "daily", "Daily"
+    WEEKLY = "weekly", "Weekly"
+    MONTHLY = "monthly", "Monthly"
+    YEARLY = "yearly", "Yearly"
+
+
+class RecurringExpense(models.Model):
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        related_name="recurring_expenses"
+    )
+    expenses_type = models.CharField(choices=expenses.EXPENSES_CHOICES)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    currency = models.CharField(max_length=3, default=default_currency)
+    note = models.CharField(max_length=150, null=True, blank=True)
+
+    frequency = models.CharField(
+        max_length=10,
+        choices=RecurrenceFrequency.choices,
+        default=RecurrenceFrequency.MONTHLY
+    )
+    # every <interval> days/weeks/months/years, e.g. 3 + monthly = quarterly
+    interval = models.PositiveIntegerField(default=1)
+    start_date = models.DateField()
+    end_date = models.DateField(null=True, blank=True)
+
+    next_due_date = models.DateField()
+    is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # scheduler scan: active rules due on or before today
+            models.Index(
+                fields=["next_due_date", "id"],
+                condition=models.Q(is_active=True),
+                name="expenses_recurring_due_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.expenses_type} every {self.interval} {self.frequency}"
+
+
+
+class FxRate(models.Model):
+    """
+    Value of one unit of ``currency`` in settings.BASE_CURRENCY on
+    ``date``. Loaded from files by the load_fx_rates command.
+    """
+
+    currency = models.CharField(max_length=3)
+    date = models.DateField()
+    rate = models.DecimalField(max_digits=20, decimal_places=10)
+
+    class Meta:
+        constraints = [
+            # also the index behind "latest rate on or before <date>"
+            models.UniqueConstraint(
+                fields=["currency", "date"],
+                name="expenses_fxrate_unique_day",
+            ),
+        ]
+
     def __str__(self):
-        return self.expenses_type
\ No newline at end of file
+        return f"{self.currency} {self.date} {self.rate}"
+
+
+class ArchivedExpense(models.Model):
+    """
+    An expense older than the archive horizon, moved out of the hot
+    table by the archive_expenses job with its original id. Read-only;
+    reports union it in only for date ranges that reach back this far.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        related_name="archived_expenses"
+    )
+    date = models.DateField()
+    expenses_type = models.CharField(choices=expenses.EXPENSES_CHOICES)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    currency = models.CharField(max_length=3)
+    note = models.CharField(max_length=150, null=True)
+    idempotency_key = models.CharField(max_length=64, null=True, blank=True)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "date"], name="expenses_archive_user_idx"),
+            models.Index(fields=["date"], name="expenses_archive_date_idx"),
+        ]
+
+    def __str__(self):
+        return self.expenses_type
+
+
+class ExpenseRollup(models.Model):
+    """
+    Archived spend of one user per month, category and currency, so
+    monthly and yearly reports over archived months read one row per
+    group instead of the archived rows.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        related_name="expense_rollups"
+    )
+    # first day of the month
+    month = models.DateField()
+    expenses_type = models.CharField(choices=expenses.EXPENSES_CHOICES)
+    currency = models.CharField(max_length=3)
+    total = models.DecimalField(max_digits=14, decimal_places=2)
+    # total in settings.BASE_CURRENCY, converted row by row when archived
+    base_total = models.DecimalField(max_digits=14, decimal_places=2)
+    count = models.IntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "month", "expenses_type", "currency"],
+                name="expenses_rollup_unique_group",
+            ),
+        ]
+
+
+class SyncCounter(models.Model):
+    """
+    A user's change sequence: the last number handed out to a write of
+    their expenses or lend/return rows.
+    """
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        related_name="sync_counter"
+    )
+    seq = models.BigIntegerField(default=0)
+    # tombstones up to this number were compacted away; older cursors
+    # have to sync from the start
+    compacted_seq = models.BigIntegerField(default=0)
+
+
+class SyncTombstone(models.Model):
+    """
+    A deleted expense or lend/return row, kept so clients syncing from an
+    older cursor learn about the delete.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        related_name="sync_tombstones"
+    )
+    # expenses.sync.KINDS
+    kind = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    sync_seq = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "sync_seq"], name="expenses_tombstone_seq_idx"),
+            # compaction
+            models.Index(fields=["deleted_at"], name="expenses_tombstone_age_idx"),
+        ]
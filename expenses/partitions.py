@@ -0,0 +1,221 @@
+import re
+from datetime import date, timedelta
+
+from django.db import transaction
+
+from ExpensesTracker import fulltext
+
+
+# On PostgreSQL expenses_expenses is partitioned by RANGE (date): one
+# partition per year or month (EXPENSES_PARTITION_INTERVAL) plus a default
+# partition for dates no partition covers yet. Queries filtering date by
+# range (date__range, date__gte/lt, date__year) only scan the partitions
+# they need; EXTRACT-based filters such as date__month scan all of them.
+#
+# PostgreSQL wants the partition key in every unique constraint, so the
+# table's primary key is (id, date) and idempotency keys are unique per
+# date. ids still come from a single sequence.
+
+TABLE = "expenses_expenses"
+
+_BOUND = re.compile(r"FROM \('([\d-]+)'\) TO \('([\d-]+)'\)")
+
+
+# =========================
+# PERIODS
+# =========================
+def period_start(day, interval):
+    if interval == "year":
+        return date(day.year, 1, 1)
+    return day.replace(day=1)
+
+
+def next_period(start, interval):
+    if interval == "year":
+        return date(start.year + 1, 1, 1)
+    return (start + timedelta(days=32)).replace(day=1)
+
+
+def periods(first, last, interval):
+    """
+    ``(start, end)`` bounds (end exclusive) of the periods covering
+    ``first``..``last``.
+    """
+    start = period_start(first, interval)
+    while start <= last:
+        end = next_period(start, interval)
+        yield start, end
+        start = end
+
+
+def partition_name(table, start, interval):
+    suffix = f"{start:%Y}" if interval == "year" else f"{start:%Y_%m}"
+    return f"{table}_p{suffix}"
+
+
+# =========================
+# INTROSPECTION
+# =========================
+def is_partitioned(connection, table=TABLE):
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", [table]
+        )
+        return cursor.fetchone() is not None
+
+
+def partitions(connection, table=TABLE):
+    """
+    ``{name: (start, end)}`` of the partitions of ``table``; the default
+    partition maps to None.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+            "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(%s)",
+            [table],
+        )
+        rows = cursor.fetchall()
+
+    result = {}
+    for name, bound in rows:
+        match = _BOUND.search(bound)
+        result[name] = (
+            (date.fromisoformat(match[1]), date.fromisoformat(match[2])) if match else None
+        )
+    return result
+
+
+# =========================
+# PARTITION MAINTENANCE
+# =========================
+def ensure_partitions(connection, first, last, interval, table=TABLE):
+    """
+    Create the partitions of ``table`` covering ``first``..``last`` that
+    do not exist yet. Rows already in the default partition for a new
+    range are moved into it. Returns the names created.
+    """
+    existing = partitions(connection, table)
+    default = f"{table}_default"
+    taken = [bounds for bounds in existing.values() if bounds]
+    quote = connection.ops.quote_name
+
+    created = []
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        for start, end in periods(first, last, interval):
+            # also skips ranges covered by partitions of another interval
+            if any(start < taken_end and taken_start < end for taken_start, taken_end in taken):
+                continue
+
+            name = partition_name(table, start, interval)
+            # DDL takes no bind parameters: the bounds are inlined as
+            # ISO date literals of date objects, never request input
+            bounds = f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+            if default in existing:
+                # PostgreSQL refuses a new partition while the default one
+                # still holds rows of its range: move them in first
+                cursor.execute(f"CREATE TABLE {quote(name)} (LIKE {quote(table)} INCLUDING DEFAULTS)")
+                cursor.execute(
+                    f"WITH moved AS (DELETE FROM {quote(default)} "
+                    f"WHERE date >= %s AND date < %s RETURNING *) "
+                    f"INSERT INTO {quote(name)} SELECT * FROM moved",
+                    [start, end],
+                )
+                cursor.execute(f"ALTER TABLE {quote(table)} ATTACH PARTITION {quote(name)} {bounds}")
+            else:
+                cursor.execute(f"CREATE TABLE {quote(name)} PARTITION OF {quote(table)} {bounds}")
+            taken.append((start, end))
+            created.append(name)
+    return created
+
+
+# =========================
+# TABLE CONVERSION (MIGRATIONS)
+# =========================
+def partition_table(schema_editor, model, interval, ahead_days):
+    """
+    Rebuild ``model``'s table as a partitioned table with the same rows,
+    indexes and constraints. Copies every row under an exclusive lock, so
+    run it in a maintenance window on large tables.
+    """
+    connection = schema_editor.connection
+    quote = schema_editor.quote_name
+    table = model._meta.db_table
+    old = f"{table}_unpartitioned"
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT min(date), max(date) FROM {quote(table)}")
+        first, last = cursor.fetchone()
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+        cursor.execute(f"SELECT last_value, is_called FROM {cursor.fetchone()[0]}")
+        last_id, is_called = cursor.fetchone()
+
+    today = date.today()
+    first = min(first or today, today)
+    last = max(last or today, today + timedelta(days=ahead_days))
+
+    schema_editor.execute(f"ALTER TABLE {quote(table)} RENAME TO {quote(old)}")
+    schema_editor.execute(
+        f"CREATE TABLE {quote(table)} (LIKE {quote(old)} INCLUDING DEFAULTS) PARTITION BY RANGE (date)"
+    )
+    ensure_partitions(connection, first, last, interval, table)
+    schema_editor.execute(f"CREATE TABLE {quote(table + '_default')} PARTITION OF {quote(table)} DEFAULT")
+
+    schema_editor.execute(f"INSERT INTO {quote(table)} SELECT * FROM {quote(old)}")
+    # frees the old index and sequence names
+    schema_editor.execute(f"DROP TABLE {quote(old)}")
+
+    sequence = f"{table}_id_seq"
+    schema_editor.execute(f"CREATE SEQUENCE {quote(sequence)} OWNED BY {quote(table)}.id")
+    schema_editor.execute("SELECT setval(%s, %s, %s)", [sequence, last_id, is_called])
+    schema_editor.execute(
+        f"ALTER TABLE {quote(table)} ALTER COLUMN id SET DEFAULT nextval('{sequence}')"
+    )
+
+    schema_editor.execute(
+        f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(table + '_pkey')} PRIMARY KEY (id, date)"
+    )
+    _create_indexes_and_constraints(schema_editor, model)
+
+
+def unpartition_table(schema_editor, model):
+    """
+    Reverse of partition_table: back to a single heap with an identity id.
+    """
+    quote = schema_editor.quote_name
+    table = model._meta.db_table
+    copy = f"{table}_partitioned_copy"
+    columns = ", ".join(quote(field.column) for field in model._meta.local_concrete_fields)
+
+    schema_editor.execute(f"CREATE TABLE {quote(copy)} AS SELECT {columns} FROM {quote(table)}")
+    schema_editor.execute(f"DROP TABLE {quote(table)} CASCADE")
+    schema_editor.create_model(model)
+    schema_editor.execute(
+        f"INSERT INTO {quote(table)} ({columns}) OVERRIDING SYSTEM VALUE "
+        f"SELECT {columns} FROM {quote(copy)}"
+    )
+    schema_editor.execute(f"DROP TABLE {quote(copy)}")
+    schema_editor.execute(
+        f"SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+        f"coalesce(max(id), 1), max(id) IS NOT NULL) FROM {quote(table)}",
+        [table],
+    )
+    fulltext.install(schema_editor.connection, table, "note")
+
+
+def _create_indexes_and_constraints(schema_editor, model):
+    # created on the parent, so PostgreSQL adds them to every partition,
+    # present and future, under the names Django expects
+    for statement in schema_editor._model_indexes_sql(model):
+        schema_editor.execute(statement)
+    for constraint in model._meta.constraints:
+        schema_editor.execute(constraint.create_sql(model, schema_editor))
+    for field in model._meta.local_fields:
+        if field.remote_field and field.db_constraint:
+            schema_editor.execute(
+                schema_editor._create_fk_sql(model, field, "_fk_%(to_table)s_%(to_column)s")
+            )
+    fulltext.install(schema_editor.connection, model._meta.db_table, "note")
@@ -0,0 +1,126 @@
+import calendar
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.conf import settings
+
+from ExpensesTracker import sharding
+from analytics.forecast import invalidate_forecast
+
+from . import sync
+from .budgets import apply_expense_change
+from .currency import base_amount
+from .models import Budget, RecurrenceFrequency, RecurringExpense, expenses
+
+
+# =========================
+# OCCURRENCES
+# =========================
+def _add_months(day, months, anchor_day):
+    month_index = day.month - 1 + months
+    year = day.year + month_index // 12
+    month = month_index % 12 + 1
+    # keep the rule's day of month, clamped to short months (31st -> 28th)
+    return date(year, month, min(anchor_day, calendar.monthrange(year, month)[1]))
+
+
+def next_occurrence(rule, current):
+    if rule.frequency == RecurrenceFrequency.DAILY:
+        return current + timedelta(days=rule.interval)
+    if rule.frequency == RecurrenceFrequency.WEEKLY:
+        return current + timedelta(weeks=rule.interval)
+    if rule.frequency == RecurrenceFrequency.YEARLY:
+        return _add_months(current, 12 * rule.interval, rule.start_date.day)
+    return _add_months(current, rule.interval, rule.start_date.day)
+
+
+def due_occurrences(rule, today, limit):
+    """
+    Dates from ``rule.next_due_date`` up to ``today`` (and the rule's end
+    date), at most ``limit`` of them. Returns ``(dates, next_due_date)``.
+    """
+    dates = []
+    current = rule.next_due_date
+    while current <= today and len(dates) < limit:
+        if rule.end_date and current > rule.end_date:
+            break
+        dates.append(current)
+        current = next_occurrence(rule, current)
+    return dates, current
+
+
+def idempotency_key(rule, day):
+    return f"recurring:{rule.pk}:{day.isoformat()}"
+
+
+# =========================
+# MATERIALIZATION
+# =========================
+def materialize_batch(rules, today):
+    """
+    Insert every due occurrence of ``rules`` in bulk and advance their
+    next_due_date. Occurrences carry an idempotency key, so rows that a
+    previous (possibly interrupted) run already inserted are skipped.
+    Returns the number of expenses created.
+    """
+    max_catchup = settings.RECURRING_MAX_CATCHUP
+
+    pending = []
+    for rule in rules:
+        dates, next_due = due_occurrences(rule, today, max_catchup)
+        for day in dates:
+            pending.append(expenses(
+                user_id=rule.user_id,
+                expenses_type=rule.expenses_type,
+                amount=rule.amount,
+                currency=rule.currency,
+                note=rule.note,
+                date=day,
+                idempotency_key=idempotency_key(rule, day),
+            ))
+        rule.next_due_date = next_due
+        if rule.end_date and next_due > rule.end_date:
+            rule.is_active = False
+
+    with sharding.atomic():
+        existing = set(
+            expenses.objects.filter(
+                idempotency_key__in=[e.idempotency_key for e in pending]
+            ).values_list("idempotency_key", flat=True)
+        )
+        new = [e for e in pending if e.idempotency_key not in existing]
+        sync.stamp(new)
+        expenses.objects.bulk_create(new, batch_size=1000, ignore_conflicts=True)
+
+        # budget counters, only for (user, category) pairs that have one
+        budgeted = set(
+            Budget.objects.filter(
+                user_id__in={e.user_id for e in new}
+            ).values_list("user_id", "expenses_type")
+        )
+        deltas = defaultdict(int)
+        for e in new:
+            if (e.user_id, e.expenses_type) in budgeted:
+                deltas[(e.user_id, e.expenses_type, e.date)] += base_amount(e)
+        for (user_id, expenses_type, day), delta in deltas.items():
+            apply_expense_change(user_id, expenses_type, day, delta)
+
+        RecurringExpense.objects.bulk_update(rules, ["next_due_date", "is_active"], batch_size=1000)
+
+    invalidate_forecast(*{e.user_id for e in new})
+    return len(new)
+
+
+def due_rules(today, batch_size):
+    """
+    Next batch of active rules due on or before ``today``, earliest first
+    (a range scan on the partial next_due_date index). Every processed
+    rule moves past ``today`` or at least one step forward, so calling
+    this until it returns nothing drains the backlog without a cursor.
+    """
+    return list(
+        RecurringExpense.objects.filter(
+            is_active=True,
+            next_due_date__lte=today,
+        ).order_by("next_due_date", "id")[:batch_size]
+    )
@@ -1,8 +1,79 @@
 from rest_framework import serializers
-from .models import expenses
 
-class ExpensesSerializer(serializers.ModelSerializer):
+from ExpensesTracker.fieldsets import SparseFieldsMixin
+
+from .currency import validate_currency
+from .models import Budget, RecurringExpense, expenses
+
+class ExpensesSerializer(SparseFieldsMixin, serializers.ModelSerializer):
 
     class Meta:
         model = expenses
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+        # a row stays with its owner (and on the owner's shard)
+        read_only_fields = ['user', 'date', 'idempotency_key', 'sync_seq']
+
+    def validate_currency(self, value):
+        return validate_currency(value)
+
+
+class BudgetSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = Budget
+        fields = ["id", "expenses_type", "period", "limit_amount", "alert_thresholds", "created_at"]
+
+    def validate_limit_amount(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("Limit must be greater than zero")
+        return value
+
+    def validate_alert_thresholds(self, value):
+        if not isinstance(value, list) or not all(
+            isinstance(t, int) and 0 < t <= 1000 for t in value
+        ):
+            raise serializers.ValidationError(
+                "Thresholds must be a list of percentages, e.g. [50, 80, 100]"
+            )
+        return sorted(set(value))
+
+
+class BudgetStatusSerializer(SparseFieldsMixin, serializers.Serializer):
+    """
+    Rows of budgets.budget_status, for ``?fields=`` on the budget list.
+    """
+
+    id = serializers.IntegerField()
+    expenses_type = serializers.CharField()
+    period = serializers.CharField()
+    period_start = serializers.DateField()
+    period_end = serializers.DateField()
+    limit_amount = serializers.FloatField()
+    spent = serializers.FloatField()
+    remaining = serializers.FloatField()
+    percentage_used = serializers.FloatField()
+    status = serializers.CharField()
+
+
+class RecurringExpenseSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+
+    class Meta:
+        model = RecurringExpense
+        fields = [
+            "id", "expenses_type", "amount", "currency", "note", "frequency", "interval",
+            "start_date", "end_date", "next_due_date", "is_active", "created_at",
+        ]
+        read_only_fields = ["next_due_date", "created_at"]
+
+    def validate_currency(self, value):
+        return validate_currency(value)
+
+    def validate(self, attrs):
+        start = attrs.get("start_date", getattr(self.instance, "start_date", None))
+        end = attrs.get("end_date", getattr(self.instance, "end_date", None))
+        if start and end and end < start:
+            raise serializers.ValidationError("end_date must be on or after start_date")
+        if attrs.get("interval", 1) < 1:
+            raise serializers.ValidationError("interval must be at least 1")
+        return attrs
+
@@ -0,0 +1,200 @@
+from heapq import merge
+from itertools import groupby, islice
+from operator import attrgetter, itemgetter
+
+from django.conf import settings
+from django.db.models import Max, Q
+from django.db.models.functions import Greatest
+
+from lendandreturn.models import LendReturn
+from lendandreturn.serializers import LendReturnSerializer
+
+from .models import SyncCounter, SyncTombstone, expenses
+from .serializers import ExpensesSerializer
+
+
+# Changes feed for offline clients. Every write to a user's expenses or
+# lend/return rows takes the next number of the user's SyncCounter into
+# the row's sync_seq, and deletes leave a SyncTombstone numbered the same
+# way, so "what changed since N" is an index range scan on
+# (user, sync_seq) whatever the size of the history.
+#
+# The counter row stays locked until the writing transaction commits:
+# a user's changes commit in sequence order, and a reader that saw the
+# counter at N has every change up to N visible.
+#
+# Rows written before the feed existed have sync_seq 0 and are only
+# returned by a sync from the start. Archiving is not a change: archived
+# expenses stay on the clients that have them, without a tombstone.
+
+# kind: (model, serializer); the order breaks ties between kinds
+KINDS = {
+    "expense": (expenses, ExpensesSerializer),
+    "lend_return": (LendReturn, LendReturnSerializer),
+}
+TOMBSTONE_RANK = len(KINDS)
+# a cursor at a counter value: after every change numbered up to it
+WHOLE = TOMBSTONE_RANK + 1
+
+
+class CursorExpired(Exception):
+    pass
+
+
+def kind_of(model):
+    return next(kind for kind, (kind_model, _) in KINDS.items() if kind_model is model)
+
+
+# =========================
+# WRITING
+# =========================
+def next_seq(user_id, count=1, using=None):
+    """
+    Reserve ``count`` numbers of the user's sequence and return the
+    first. Must run inside the writing transaction, on the user's shard.
+    """
+    counter, _ = (
+        SyncCounter.objects.using(using).select_for_update().get_or_create(user_id=user_id)
+    )
+    counter.seq += count
+    counter.save(using=using, update_fields=["seq"])
+    return counter.seq - count + 1
+
+
+def stamp(rows, using=None):
+    """
+    Number ``rows`` (instances about to be saved) in their users'
+    sequences. Counters are locked in user order, so concurrent
+    multi-user writes cannot deadlock.
+    """
+    for user_id, group in groupby(sorted(rows, key=attrgetter("user_id")), attrgetter("user_id")):
+        group = list(group)
+        first = next_seq(user_id, len(group), using)
+        for offset, row in enumerate(group):
+            row.sync_seq = first + offset
+
+
+def restamp(queryset):
+    """
+    Renumber the rows of ``queryset``, for set-based updates that skip
+    save(). Call in the same transaction as the update.
+    """
+    model = queryset.model
+    rows = [model(id=id, user_id=user_id) for id, user_id in queryset.values_list("id", "user_id")]
+    stamp(rows, queryset.db)
+    model.objects.using(queryset.db).bulk_update(rows, ["sync_seq"], batch_size=1000)
+
+
+def bury(model, rows, using=None):
+    """
+    Leave tombstones for ``rows`` of ``model``, (id, user_id) pairs of
+    rows deleted in the same transaction.
+    """
+    kind = kind_of(model)
+    tombstones = [SyncTombstone(kind=kind, object_id=id, user_id=user_id) for id, user_id in rows]
+    stamp(tombstones, using)
+    SyncTombstone.objects.using(using).bulk_create(tombstones, batch_size=1000)
+
+
+def compact(before):
+    """
+    Drop the current shard's tombstones deleted before ``before``,
+    remembering per user the last number dropped. Returns the number of
+    tombstones dropped.
+    """
+    old = SyncTombstone.objects.filter(deleted_at__lt=before)
+    horizons = old.values("user_id").annotate(last=Max("sync_seq")).order_by()
+    for row in horizons:
+        SyncCounter.objects.filter(user_id=row["user_id"]).update(
+            compacted_seq=Greatest("compacted_seq", row["last"])
+        )
+    deleted, _ = old.delete()
+    return deleted
+
+
+# =========================
+# READING
+# =========================
+def parse_cursor(text):
+    """
+    ``"<seq>"``, or ``"<seq>.<rank>.<id>[.<floor>]"`` between pages, as
+    a (seq, rank, id) key and the tombstone floor. Pages of a sync from
+    the start carry the counter it started at as their floor: tombstones
+    up to it are for rows the client never had. Raises ValueError.
+    """
+    parts = [int(part) for part in text.split(".")]
+    if len(parts) == 1:
+        return (parts[0], WHOLE, 0), -1
+    seq, rank, id, *floor = parts
+    if not 0 <= rank <= TOMBSTONE_RANK or len(floor) > 1:
+        raise ValueError(text)
+    return (seq, rank, id), floor[0] if floor else -1
+
+
+def format_cursor(key, floor):
+    seq, rank, id = key
+    if rank == WHOLE:
+        return str(seq)
+    return f"{seq}.{rank}.{id}" + (f".{floor}" if floor > seq else "")
+
+
+def _after(queryset, key, rank):
+    seq, cursor_rank, id = key
+    if rank > cursor_rank:
+        condition = Q(sync_seq__gte=seq)
+    elif rank < cursor_rank:
+        condition = Q(sync_seq__gt=seq)
+    else:
+        condition = Q(sync_seq__gt=seq) | Q(sync_seq=seq, id__gt=id)
+    return queryset.filter(condition).order_by("sync_seq", "id")
+
+
+def _keyed(rows, rank):
+    return (((row.sync_seq, rank, row.id), row) for row in rows)
+
+
+def changes(user_id, since=None):
+    """
+    The user's changes after the ``since`` cursor (None: every current
+    row), oldest first and at most SYNC_PAGE_SIZE of them, as a response
+    payload with the cursor to pass next. Raises ValueError for a
+    malformed cursor and CursorExpired when tombstones after it have
+    been compacted away.
+    """
+    limit = settings.SYNC_PAGE_SIZE
+    counter = SyncCounter.objects.filter(user_id=user_id).values("seq", "compacted_seq").first()
+    # only changes numbered up to the counter are surely committed
+    high = counter["seq"] if counter else 0
+
+    if since is None:
+        key, floor = (-1, WHOLE, 0), high
+    else:
+        key, floor = parse_cursor(since)
+        if counter and max(key[0], floor) < counter["compacted_seq"]:
+            raise CursorExpired(since)
+
+    streams = []
+    for rank, (model, _) in enumerate(KINDS.values()):
+        rows = _after(model.objects.filter(user_id=user_id, sync_seq__lte=high), key, rank)
+        streams.append(_keyed(rows[:limit + 1], rank))
+    tombstones = _after(
+        SyncTombstone.objects.filter(user_id=user_id, sync_seq__gt=floor, sync_seq__lte=high),
+        key, TOMBSTONE_RANK,
+    )
+    streams.append(_keyed(tombstones[:limit + 1], TOMBSTONE_RANK))
+
+    page = list(islice(merge(*streams, key=itemgetter(0)), limit + 1))
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    kinds = list(KINDS.items())
+    results = []
+    for (_, rank, _), row in page:
+        if rank == TOMBSTONE_RANK:
+            results.append({"kind": row.kind, "op": "delete", "id": row.object_id})
+        else:
+            kind, (_, serializer) = kinds[rank]
+            results.append({"kind": kind, "op": "upsert", "data": serializer(row).data})
+
+    next_key = page[-1][0] if has_more else (max(high, key[0]), WHOLE, 0)
+    return {"results": results, "cursor": format_cursor(next_key, floor), "has_more": has_more}
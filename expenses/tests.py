@@ -1,3 +1,759 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
+from datetime import date
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from ExpensesTracker.sharding import on_shard, shard_for
+from login.models import User
+
+from . import archive, currency
+from .budgets import resync_budgets
+from .currency import converted_amount
+from .partitions import ensure_partitions, is_partitioned, partition_table, partitions, unpartition_table
+from .recurring import materialize_batch
+from .models import ArchivedExpense, BudgetSpend, ExpenseRollup, FxRate, RecurringExpense, expenses
+
+# more than one with ExpensesTracker.settings_test
+SHARDS = set(settings.DATABASE_SHARDS)
+
+
+def make_user(n):
+    return User.objects.create_user(email=f"u{n}@x.com", phone=str(n), password=None, name="U")
+
+
+def sharded_user():
+    # off the default database when there are shards, so the tests
+    # cross databases
+    n = 1
+    while shard_for((user := make_user(n)).pk) == "default" and len(SHARDS) > 1:
+        n += 1
+    return user
+
+
+class APITestCase(TestCase):
+    databases = SHARDS
+
+    def setUp(self):
+        cache.clear()
+        self.user = sharded_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def on_users_shard(self):
+        return on_shard(shard_for(self.user.pk))
+
+    def add_expense(self, amount, expenses_type="food"):
+        response = self.client.post(
+            "/expenses/add-expenses/",
+            {"user": self.user.pk, "expenses_type": expenses_type, "amount": str(amount)},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        return response
+
+    def expense_id(self, amount):
+        with self.on_users_shard():
+            return expenses.objects.get(user=self.user, amount=amount).id
+
+
+# =========================
+# BUDGETS
+# =========================
+class BudgetTests(APITestCase):
+
+    def add_budget(self, limit=100, expenses_type="food", **extra):
+        response = self.client.post(
+            "/expenses/budgets/",
+            {"expenses_type": expenses_type, "limit_amount": str(limit), **extra},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data["data"]
+
+    def status(self, expenses_type="food"):
+        results = self.client.get("/expenses/budgets/").data["results"]
+        return next(row for row in results if row["expenses_type"] == expenses_type)
+
+    def test_new_budget_counts_spend_of_the_current_period(self):
+        self.add_expense(30)
+
+        budget = self.add_budget(limit=100)
+
+        self.assertEqual(budget["spent"], 30.0)
+        self.assertEqual(budget["remaining"], 70.0)
+        self.assertEqual(budget["status"], "ok")
+
+    def test_writes_update_the_counter(self):
+        self.add_budget(limit=100)
+
+        self.add_expense(40)
+        self.add_expense(20)
+        self.add_expense(15, expenses_type="rent")
+        self.assertEqual(self.status()["spent"], 60.0)
+
+        id = self.expense_id(40)
+        self.client.patch(f"/expenses/add-expenses/{id}/", {"amount": "10"}, format="json")
+        self.assertEqual(self.status()["spent"], 30.0)
+
+        self.client.delete(f"/expenses/add-expenses/{self.expense_id(20)}/")
+        self.assertEqual(self.status()["spent"], 10.0)
+
+        # moving an expense out of the category
+        self.client.patch(f"/expenses/add-expenses/{id}/", {"expenses_type": "rent"}, format="json")
+        self.assertEqual(self.status()["spent"], 0.0)
+
+    def test_alerts_fire_once_per_threshold_crossed(self):
+        self.add_budget(limit=100, alert_thresholds=[50, 80, 100])
+
+        first = self.add_expense(55).data["budget_alerts"]
+        second = self.add_expense(10).data["budget_alerts"]
+        third = self.add_expense(40).data["budget_alerts"]
+
+        self.assertEqual([a["threshold"] for a in first], [50])
+        self.assertEqual(second, [])
+        self.assertEqual([a["threshold"] for a in third], [80, 100])
+        self.assertEqual(self.status()["status"], "exceeded")
+
+        alerts = self.client.get("/expenses/budgets/alerts/").data["results"]
+        self.assertEqual(sorted(a["threshold"] for a in alerts), [50, 80, 100])
+
+    def test_alert_fires_again_after_spend_drops_below_it(self):
+        self.add_budget(limit=100, alert_thresholds=[50])
+        self.add_expense(60)
+
+        self.client.delete(f"/expenses/add-expenses/{self.expense_id(60)}/")
+        again = self.add_expense(70).data["budget_alerts"]
+
+        self.assertEqual([a["threshold"] for a in again], [50])
+
+    def test_duplicate_and_invalid_budgets_are_rejected(self):
+        self.add_budget()
+
+        duplicate = self.client.post(
+            "/expenses/budgets/", {"expenses_type": "food", "limit_amount": "50"}, format="json"
+        )
+        invalid = self.client.post(
+            "/expenses/budgets/",
+            {"expenses_type": "rent", "limit_amount": "50", "alert_thresholds": [0, "x"]},
+            format="json",
+        )
+
+        self.assertEqual(duplicate.status_code, 400)
+        self.assertEqual(invalid.status_code, 400)
+
+    def test_resync_recomputes_counters_after_set_based_changes(self):
+        self.add_budget(limit=100)
+        self.add_expense(40)
+
+        with self.on_users_shard():
+            expenses.objects.filter(user=self.user).update(amount=Decimal("90"))
+            self.assertEqual(resync_budgets([self.user.pk]), 1)
+            self.assertEqual(BudgetSpend.objects.get(budget__user=self.user).spent, Decimal("90"))
+
+    def test_yearly_budget_covers_the_year(self):
+        budget = self.add_budget(limit=1000, period="yearly")
+
+        self.assertEqual(budget["period_start"], date(date.today().year, 1, 1))
+        self.assertEqual(budget["period_end"], date(date.today().year, 12, 31))
+
+    def test_fields_trims_the_list(self):
+        self.add_budget(limit=100)
+        self.add_expense(30)
+
+        response = self.client.get("/expenses/budgets/", {"fields": "expenses_type,spent"})
+        unknown = self.client.get("/expenses/budgets/", {"fields": "spent,owner"})
+
+        self.assertEqual(response.data["results"], [{"expenses_type": "food", "spent": 30.0}])
+        self.assertEqual(unknown.status_code, 400)
+
+    def admin_save(self, admin, id=None, amount="10", expenses_type="food"):
+        url = f"/admin/expenses/expenses/{id}/change/" if id else "/admin/expenses/expenses/add/"
+        form = {"date": date.today().isoformat(), "expenses_type": expenses_type,
+                "amount": amount, "currency": "INR", "note": "admin"}
+        if id is None:
+            form["user"] = self.user.pk
+        response = admin.post(url, form)
+        self.assertEqual(response.status_code, 302)
+
+    def test_admin_edits_update_the_counter(self):
+        admin = APIClient()
+        admin.force_login(User.objects.create_superuser(email="admin@x.com", phone="0", password=None, name="A"))
+        self.add_budget(limit=100)
+        self.add_expense(40)
+
+        with mock.patch("expenses.admin.invalidate_forecast") as invalidate:
+            self.admin_save(admin, amount="25")
+            self.assertEqual(self.status()["spent"], 65.0)
+
+            self.admin_save(admin, self.expense_id(40), amount="10")
+            self.assertEqual(self.status()["spent"], 35.0)
+
+            self.admin_save(admin, self.expense_id(10), amount="10", expenses_type="rent")
+            self.assertEqual(self.status()["spent"], 25.0)
+
+            response = admin.post(f"/admin/expenses/expenses/{self.expense_id(25)}/delete/", {"post": "yes"})
+            self.assertEqual(response.status_code, 302)
+            self.assertEqual(self.status()["spent"], 0.0)
+
+        self.assertEqual(invalidate.call_count, 4)
+        invalidate.assert_called_with(self.user.pk)
+
+
+# =========================
+# RECURRING EXPENSES
+# =========================
+class RecurringCatchUpTests(APITestCase):
+
+    def add_rule(self, start_date, frequency="monthly", **extra):
+        response = self.client.post(
+            "/expenses/recurring/",
+            {
+                "expenses_type": "rent", "amount": "500", "frequency": frequency,
+                "start_date": start_date, **extra,
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data["data"]["id"]
+
+    def materialize(self, today, **options):
+        call_command("materialize_recurring_expenses", today=today, stdout=io.StringIO(), **options)
+
+    def dates(self):
+        with self.on_users_shard():
+            return list(
+                expenses.objects.filter(user=self.user).order_by("date").values_list("date", flat=True)
+            )
+
+    def rule(self, id):
+        with self.on_users_shard():
+            return RecurringExpense.objects.get(id=id)
+
+    def test_fields_trims_the_list(self):
+        id = self.add_rule("2026-01-15")
+
+        response = self.client.get("/expenses/recurring/", {"fields": "id,next_due_date"})
+        unknown = self.client.get("/expenses/recurring/", {"fields": "user"})
+
+        self.assertEqual(response.data["results"], [{"id": id, "next_due_date": "2026-01-15"}])
+        self.assertEqual(unknown.status_code, 400)
+
+    def test_missed_periods_are_caught_up(self):
+        id = self.add_rule("2026-01-15")
+
+        self.materialize(date(2026, 4, 20))
+
+        self.assertEqual(self.dates(), [date(2026, m, 15) for m in (1, 2, 3, 4)])
+        self.assertEqual(self.rule(id).next_due_date, date(2026, 5, 15))
+
+    def test_reruns_create_nothing_twice(self):
+        id = self.add_rule("2026-01-15")
+        self.materialize(date(2026, 3, 1))
+
+        # a run interrupted after inserting, before advancing the rule
+        with self.on_users_shard():
+            RecurringExpense.objects.filter(id=id).update(next_due_date=date(2026, 1, 15))
+        self.materialize(date(2026, 3, 1))
+        self.materialize(date(2026, 3, 1))
+
+        self.assertEqual(self.dates(), [date(2026, 1, 15), date(2026, 2, 15)])
+
+    def test_month_end_is_clamped_and_kept(self):
+        self.add_rule("2026-01-31")
+
+        self.materialize(date(2026, 4, 30))
+
+        self.assertEqual(
+            self.dates(), [date(2026, 1, 31), date(2026, 2, 28), date(2026, 3, 31), date(2026, 4, 30)]
+        )
+
+    def test_end_date_deactivates_the_rule(self):
+        id = self.add_rule("2026-03-01", frequency="weekly", end_date="2026-03-20")
+
+        self.materialize(date(2026, 6, 1))
+
+        self.assertEqual(self.dates(), [date(2026, 3, 1), date(2026, 3, 8), date(2026, 3, 15)])
+        self.assertFalse(self.rule(id).is_active)
+
+    @override_settings(RECURRING_MAX_CATCHUP=3)
+    def test_catch_up_is_batched_until_drained(self):
+        id = self.add_rule("2026-01-01", frequency="daily")
+
+        # one batch creates at most RECURRING_MAX_CATCHUP occurrences
+        with self.on_users_shard():
+            self.assertEqual(materialize_batch([self.rule(id)], date(2026, 1, 10)), 3)
+        self.assertEqual(self.rule(id).next_due_date, date(2026, 1, 4))
+
+        # the command keeps going until nothing is due
+        self.materialize(date(2026, 1, 10), batch=1)
+        self.assertEqual(self.dates(), [date(2026, 1, day) for day in range(1, 11)])
+
+    def test_generated_expenses_count_towards_budgets_and_sync(self):
+        today = date.today()
+        self.client.post(
+            "/expenses/budgets/", {"expenses_type": "rent", "limit_amount": "1000"}, format="json"
+        )
+        self.add_rule(today.replace(day=1).isoformat())
+
+        self.materialize(today)
+
+        budget = self.client.get("/expenses/budgets/").data["results"][0]
+        self.assertEqual(budget["spent"], 500.0)
+        with self.on_users_shard():
+            self.assertTrue(all(seq > 0 for seq in expenses.objects.values_list("sync_seq", flat=True)))
+
+
+# =========================
+# CHANGES FEED
+# =========================
+@override_settings(SYNC_PAGE_SIZE=2)
+class ChangesFeedTests(APITestCase):
+
+    def changes(self, since=None):
+        response = self.client.get("/expenses/changes/", {} if since is None else {"since": since})
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def sync(self, since=None):
+        """
+        Every page from ``since`` on: (changes, final cursor, pages).
+        """
+        results, pages = [], 0
+        while True:
+            page = self.changes(since)
+            results += page["results"]
+            since, pages = page["cursor"], pages + 1
+            if not page["has_more"]:
+                return results, since, pages
+
+    def ops(self, results):
+        return [
+            (row["kind"], row["op"], row["id"] if row["op"] == "delete" else float(row["data"]["amount"]))
+            for row in results
+        ]
+
+    def add_lend(self, amount):
+        response = self.client.post(
+            "/lendandreturn/lend-return/add/",
+            {"user": self.user.pk, "person_name": "Bob", "transaction_type": "given",
+             "amount": str(amount), "date": "2026-03-01"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+
+    def test_bootstrap_pages_through_every_row(self):
+        # written before the feed existed
+        with self.on_users_shard():
+            expenses.objects.create(user=self.user, expenses_type="food", amount=1)
+        for amount in (2, 3, 4):
+            self.add_expense(amount)
+        self.add_lend(5)
+
+        results, cursor, pages = self.sync()
+
+        self.assertEqual(pages, 3)
+        self.assertEqual(sorted(self.ops(results)), [
+            ("expense", "upsert", 1.0), ("expense", "upsert", 2.0), ("expense", "upsert", 3.0),
+            ("expense", "upsert", 4.0), ("lend_return", "upsert", 5.0),
+        ])
+        self.assertTrue(cursor.isdigit())
+        self.assertEqual(self.changes(cursor), {"results": [], "cursor": cursor, "has_more": False})
+
+    def test_incremental_sync_returns_only_later_changes(self):
+        self.add_expense(10)
+        self.add_expense(20)
+        _, cursor, _ = self.sync()
+
+        self.add_expense(30)
+        self.client.patch(f"/expenses/add-expenses/{self.expense_id(10)}/", {"amount": "11"}, format="json")
+        deleted = self.expense_id(20)
+        self.client.delete(f"/expenses/add-expenses/{deleted}/")
+        results, _, _ = self.sync(cursor)
+
+        self.assertEqual(self.ops(results), [
+            ("expense", "upsert", 30.0), ("expense", "upsert", 11.0), ("expense", "delete", deleted),
+        ])
+
+    def test_bootstrap_skips_deletes_of_rows_the_client_never_had(self):
+        self.add_expense(10)
+        self.client.delete(f"/expenses/add-expenses/{self.expense_id(10)}/")
+        self.add_expense(20)
+
+        results, _, _ = self.sync()
+
+        self.assertEqual(self.ops(results), [("expense", "upsert", 20.0)])
+
+    def test_compaction_expires_older_cursors(self):
+        self.add_expense(10)
+        _, cursor, _ = self.sync()
+        self.client.delete(f"/expenses/add-expenses/{self.expense_id(10)}/")
+
+        call_command("compact_sync_tombstones", days=0, stdout=io.StringIO())
+
+        self.assertEqual(self.client.get("/expenses/changes/", {"since": cursor}).status_code, 410)
+        results, _, _ = self.sync()
+        self.assertEqual(results, [])
+
+    def test_compaction_does_not_break_a_bootstrap_in_progress(self):
+        for amount in (1, 2, 3):
+            self.add_expense(amount)
+        self.client.delete(f"/expenses/add-expenses/{self.expense_id(3)}/")
+        first = self.changes()
+
+        call_command("compact_sync_tombstones", days=0, stdout=io.StringIO())
+        rest, _, _ = self.sync(first["cursor"])
+
+        self.assertEqual(
+            sorted(self.ops(first["results"] + rest)),
+            [("expense", "upsert", 1.0), ("expense", "upsert", 2.0)],
+        )
+
+    def test_invalid_cursors_are_rejected(self):
+        for since in ("x", "1.9.1", "1.2.3.4.5"):
+            self.assertEqual(self.client.get("/expenses/changes/", {"since": since}).status_code, 400, since)
+
+    def test_users_only_see_their_own_changes(self):
+        self.add_expense(10)
+        other = APIClient()
+        other.force_authenticate(make_user(99))
+
+        self.assertEqual(other.get("/expenses/changes/").data["results"], [])
+
+
+# =========================
+# SEARCH
+# =========================
+class SearchTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        with self.on_users_shard():
+            for day, amount in ((date(2026, 3, 1), 1), (date(2026, 3, 15), 2), (date(2026, 4, 1), 3)):
+                expenses.objects.create(
+                    user=self.user, expenses_type="food", amount=amount, date=day, note="weekly groceries"
+                )
+
+    def search(self, **params):
+        return self.client.get("/expenses/search/", {"q": "groceries", **params})
+
+    def amounts(self, response):
+        self.assertEqual(response.status_code, 200, response.data)
+        return sorted(float(row["amount"]) for row in response.data["results"])
+
+    def test_date_range_is_inclusive(self):
+        response = self.search(start_date="2026-03-15", end_date="2026-04-01")
+
+        self.assertEqual(self.amounts(response), [2.0, 3.0])
+
+    def test_limit_and_offset_page_the_hits(self):
+        first = self.amounts(self.search(limit=2))
+        rest = self.amounts(self.search(limit=2, offset=2))
+
+        self.assertEqual(sorted(first + rest), [1.0, 2.0, 3.0])
+        self.assertEqual(len(rest), 1)
+
+    def test_bad_paging_is_rejected(self):
+        for params in ({"limit": 0}, {"limit": -5}, {"offset": -1}, {"limit": "x"}):
+            self.assertEqual(self.search(**params).status_code, 400, params)
+
+    def test_bad_dates_are_rejected(self):
+        for params in ({"start_date": "2026-13-01"}, {"end_date": "yesterday"}, {"start_date": "1' OR '1'='1"}):
+            response = self.search(**params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertEqual(response.data, {"error": "Invalid date format (YYYY-MM-DD)"})
+
+
+# =========================
+# CURRENCIES
+# =========================
+RATES = """date,currency,rate
+2026-03-01,USD,80
+2026-04-01,USD,90
+2026-03-01,EUR,100
+"""
+
+
+class CurrencyTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        # per-process rate lists follow a version kept in the cleared cache
+        currency._rates.clear()
+        currency._currencies = (None, frozenset())
+        self.load_rates(RATES)
+
+    def load_rates(self, text, *args):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as fh:
+            fh.write(text)
+        self.addCleanup(os.remove, fh.name)
+        out = io.StringIO()
+        call_command("load_fx_rates", fh.name, *args, stdout=out)
+        return out.getvalue()
+
+    def add(self, amount, code, day, expenses_type="food"):
+        with self.on_users_shard():
+            expenses.objects.create(
+                user=self.user, expenses_type=expenses_type, amount=amount, currency=code, date=day
+            )
+
+    def total(self, code):
+        with self.on_users_shard():
+            return expenses.objects.filter(user=self.user).aggregate(total=Sum(converted_amount(code)))["total"]
+
+    def test_rates_are_loaded_on_every_shard(self):
+        for alias in SHARDS:
+            rates = FxRate.objects.using(alias).order_by("currency", "date")
+            self.assertEqual(
+                [(rate.currency, rate.date, rate.rate) for rate in rates],
+                [("EUR", date(2026, 3, 1), 100), ("USD", date(2026, 3, 1), 80), ("USD", date(2026, 4, 1), 90)],
+            )
+
+    def test_reloading_updates_rates(self):
+        output = self.load_rates("date,currency,rate\n2026-03-01,usd,0.0125\n2026-03-01,INR,1\n", "--inverse")
+
+        self.assertIn("Loaded 1 rate(s) for USD", output)
+        for alias in SHARDS:
+            self.assertEqual(FxRate.objects.using(alias).get(currency="USD", date=date(2026, 3, 1)).rate, 80)
+        self.assertEqual(currency.rate_on("USD", date(2026, 3, 20)), 80)
+
+    def test_bad_rows_are_rejected(self):
+        for text in ("date,currency,rate\n2026-03-01,USD,x\n", "date,currency,rate\n2026-03-01,US,1\n",
+                     "day,code\n2026-03-01,USD\n"):
+            with self.assertRaises(CommandError):
+                self.load_rates(text)
+
+    def test_amounts_are_converted_at_the_rate_of_their_day(self):
+        self.add(100, "INR", date(2026, 3, 10))
+        # before the history starts: the first rate
+        self.add(1, "USD", date(2026, 2, 1))
+        self.add(10, "USD", date(2026, 3, 31))
+        self.add(2, "USD", date(2026, 4, 2))
+        self.add(1, "EUR", date(2026, 4, 2))
+
+        self.assertEqual(self.total("INR"), 100 + 80 + 800 + 180 + 100)
+        self.assertEqual(self.total("USD"), Decimal("1.25") + 1 + 10 + 2 + Decimal("1.11"))
+        self.assertEqual(currency.convert(Decimal(2), "USD", "INR", date(2026, 4, 2)), 180)
+
+    def test_charts_report_in_the_requested_currency(self):
+        self.add(900, "INR", date(2026, 4, 5))
+        self.add(1, "USD", date(2026, 4, 5), "rent")
+
+        params = {"start_date": "2026-04-01", "end_date": "2026-04-30"}
+        inr = self.client.get("/expenses/chart/daily/", params).data
+        usd = self.client.get("/expenses/chart/daily/", {**params, "currency": "usd"}).data
+        monthly = self.client.get("/expenses/chart/monthly/", {"currency": "USD"}).data
+
+        self.assertEqual((inr["currency"], dict(zip(*inr["chart"].values()))), ("INR", {"food": 900.0, "rent": 90.0}))
+        self.assertEqual((usd["currency"], dict(zip(*usd["chart"].values()))), ("USD", {"food": 10.0, "rent": 1.0}))
+        self.assertEqual(dict(zip(*monthly["chart"].values())), {"food": 10.0, "rent": 1.0})
+
+    def test_dashboard_reports_in_the_requested_currency(self):
+        self.add(900, "INR", date(2026, 4, 5))
+        self.add(1, "USD", date(2026, 4, 5))
+
+        response = self.client.get("/expenses/dashboard/summary/", {"currency": "USD"})
+
+        self.assertEqual(response.data["currency"], "USD")
+        self.assertEqual(response.data["summary"]["total_expense"], 11.0)
+
+    def test_unknown_currencies_are_rejected(self):
+        for url in ("/expenses/chart/daily/", "/expenses/chart/yearly/", "/expenses/dashboard/summary/"):
+            response = self.client.get(url, {"currency": "XYZ"})
+            self.assertEqual(response.status_code, 400, url)
+            self.assertIn("currency", response.data)
+
+    def test_admin_rejects_unknown_currencies(self):
+        admin = APIClient()
+        admin.force_login(User.objects.create_superuser(email="admin@x.com", phone="0", password=None, name="A"))
+        form = {"user": self.user.pk, "date": "2026-04-05", "expenses_type": "food", "amount": "5", "note": "admin"}
+
+        rejected = admin.post("/admin/expenses/expenses/add/", {**form, "currency": "XYZ"})
+        accepted = admin.post("/admin/expenses/expenses/add/", {**form, "currency": "usd"})
+
+        self.assertEqual(rejected.status_code, 200)
+        self.assertIn("No exchange rates loaded for XYZ", rejected.content.decode())
+        self.assertEqual(accepted.status_code, 302)
+        with self.on_users_shard():
+            self.assertEqual(list(expenses.objects.values_list("currency", flat=True)), ["USD"])
+
+
+# =========================
+# ARCHIVE
+# =========================
+class ArchiveTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        with self.on_users_shard():
+            for day, expenses_type, amount in (
+                (date(2020, 1, 5), "food", 10), (date(2020, 1, 20), "food", 20),
+                (date(2020, 2, 10), "rent", 300), (date(2020, 2, 29), "food", 5),
+                (date(2020, 3, 1), "food", 7), (date(2020, 3, 15), "rent", 300),
+                (date(2021, 6, 1), "food", 1), (date.today(), "food", 2),
+            ):
+                expenses.objects.create(user=self.user, date=day, expenses_type=expenses_type, amount=amount, note="n")
+
+    def archive(self, before=date(2020, 3, 1), **options):
+        call_command("archive_expenses", before=before, stdout=io.StringIO(), **options)
+
+    def get(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        body = b"".join(response.streaming_content) if response.streaming else response.content
+        return json.loads(body)
+
+    def chart(self, url, **params):
+        # label order is not part of the response
+        chart = self.get(url, **params)["chart"]
+        return dict(zip(chart["labels"], chart["values"]))
+
+    def reports(self):
+        daily = {
+            (day["date"], row["expenses_type"]): row["total_amount"]
+            for day in self.get("/expenses/daily/") for row in day["expenses"]
+        }
+        return {
+            "daily": daily,
+            "monthly": self.get("/expenses/monthly/"),
+            "yearly": self.get("/expenses/yearly/"),
+            "chart_days": self.chart("/expenses/chart/daily/", start_date="2020-02-15", end_date="2020-03-10"),
+            "chart_months": self.chart("/expenses/chart/daily/", start_date="2020-02-01", end_date="2020-03-31"),
+            "chart_monthly": self.chart("/expenses/chart/monthly/"),
+            "chart_yearly": self.chart("/expenses/chart/yearly/"),
+            "dashboard": self.get("/expenses/dashboard/summary/"),
+        }
+
+    def test_batches_move_the_oldest_rows_with_their_ids(self):
+        with self.on_users_shard():
+            ids = list(expenses.objects.filter(date__lt=date(2020, 3, 1)).order_by("date").values_list("id", flat=True))
+
+            self.assertEqual(archive.archive_batch(date(2020, 3, 1), 3), 3)
+            self.assertEqual(list(ArchivedExpense.objects.order_by("date").values_list("id", flat=True)), ids[:3])
+            self.assertEqual(archive.archive_batch(date(2020, 3, 1), 3), 1)
+            self.assertEqual(archive.archive_batch(date(2020, 3, 1), 3), 0)
+
+            self.assertEqual(sorted(ArchivedExpense.objects.values_list("id", flat=True)), sorted(ids))
+            self.assertFalse(expenses.objects.filter(date__lt=date(2020, 3, 1)).exists())
+            self.assertEqual(expenses.objects.count(), 4)
+
+    def test_rollups_total_each_month_and_category(self):
+        self.archive(batch=1)
+
+        with self.on_users_shard():
+            rollups = sorted(ExpenseRollup.objects.values_list("month", "expenses_type", "total", "count"))
+        self.assertEqual(rollups, [
+            (date(2020, 1, 1), "food", 30, 2),
+            (date(2020, 2, 1), "food", 5, 1),
+            (date(2020, 2, 1), "rent", 300, 1),
+        ])
+
+    def test_refresh_rollups_recomputes_from_the_archive(self):
+        self.archive()
+        with self.on_users_shard():
+            ArchivedExpense.objects.filter(date=date(2020, 1, 5)).update(amount=40)
+            archive.refresh_rollups([self.user.pk], date(2020, 1, 15), date(2020, 1, 31))
+
+            rollup = ExpenseRollup.objects.get(month=date(2020, 1, 1), expenses_type="food")
+        self.assertEqual((rollup.total, rollup.base_total, rollup.count), (60, 60, 2))
+
+    def test_reports_are_unchanged_by_archiving(self):
+        before = self.reports()
+
+        self.archive()
+
+        self.assertEqual(archive.archived_through(), date(2020, 2, 29))
+        self.assertEqual(self.reports(), before)
+
+    def test_add_archived_merges_in_group_order(self):
+        group = ("month", "expenses_type")
+        hot = [
+            {"month": date(2020, 2, 1), "expenses_type": "food", "total_amount": 1},
+            {"month": date(2020, 3, 1), "expenses_type": "rent", "total_amount": None},
+        ]
+        archived = {
+            (date(2020, 3, 1), "rent"): 4,
+            (date(2020, 1, 1), "food"): 2,
+            (date(2020, 2, 1), "rent"): 3,
+            (date(2020, 4, 1), "food"): 5,
+        }
+
+        merged = [(row["month"].month, row["expenses_type"], row["total_amount"])
+                  for row in archive.add_archived(hot, archived, group)]
+
+        self.assertEqual(merged, [(1, "food", 2), (2, "food", 1), (2, "rent", 3), (3, "rent", 4), (4, "food", 5)])
+
+
+# =========================
+# PARTITIONS
+# =========================
+@skipUnless(connection.vendor == "postgresql", "range partitions are PostgreSQL only")
+class PartitionTests(APITestCase):
+    table = expenses._meta.db_table
+
+    def setUp(self):
+        super().setUp()
+        self.connection = connections[shard_for(self.user.pk)]
+        with self.on_users_shard():
+            for day in (date(2026, 3, 1), date(2099, 6, 1)):
+                expenses.objects.create(user=self.user, date=day, expenses_type="food", amount=1)
+        with self.connection.cursor() as cursor:
+            # the DDL below cannot run with deferred constraint checks pending
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+    def count(self, table, **where):
+        sql = f"SELECT count(*) FROM {self.connection.ops.quote_name(table)}"
+        if where:
+            sql += " WHERE " + " AND ".join(f"{column} = %s" for column in where)
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, list(where.values()))
+            return cursor.fetchone()[0]
+
+    def test_migrated_table_is_partitioned(self):
+        bounds = partitions(self.connection)
+
+        self.assertTrue(is_partitioned(self.connection))
+        self.assertIsNone(bounds[f"{self.table}_default"])
+        self.assertTrue(any(
+            start <= date.today() < end for start, end in filter(None, bounds.values())
+        ))
+
+    def test_ensure_partitions_moves_rows_out_of_the_default(self):
+        self.assertEqual(self.count(f"{self.table}_default", date=date(2099, 6, 1)), 1)
+
+        created = ensure_partitions(self.connection, date(2099, 1, 1), date(2099, 12, 31), "year")
+
+        self.assertEqual(created, [f"{self.table}_p2099"])
+        self.assertEqual(self.count(f"{self.table}_p2099"), 1)
+        self.assertEqual(self.count(f"{self.table}_default", date=date(2099, 6, 1)), 0)
+        self.assertEqual(partitions(self.connection)[created[0]], (date(2099, 1, 1), date(2100, 1, 1)))
+        # covered already, also by a partition of another interval
+        self.assertEqual(ensure_partitions(self.connection, date(2099, 3, 1), date(2099, 12, 31), "month"), [])
+        with self.on_users_shard():
+            self.assertEqual(expenses.objects.filter(user=self.user, date__year=2099).count(), 1)
+
+    def test_unpartition_and_partition_keep_rows_and_ids(self):
+        with self.on_users_shard():
+            ids = set(expenses.objects.values_list("id", flat=True))
+
+        with self.connection.schema_editor() as editor:
+            unpartition_table(editor, expenses)
+        self.assertFalse(is_partitioned(self.connection))
+        with self.on_users_shard():
+            self.assertEqual(set(expenses.objects.values_list("id", flat=True)), ids)
+
+        with self.connection.schema_editor() as editor:
+            partition_table(editor, expenses, "year", 30)
+        self.assertTrue(is_partitioned(self.connection))
+        self.assertEqual(self.count(f"{self.table}_p2099"), 1)
+        with self.on_users_shard():
+            self.assertEqual(set(expenses.objects.values_list("id", flat=True)), ids)
+            added = expenses.objects.create(user=self.user, date=date(2026, 3, 2), expenses_type="food", amount=1)
+        self.assertGreater(added.id, max(ids))
@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import ExpensesAPI,DailyExpensesAPI,MonthlyExpensesAPI,YearlyExpensesAPI,DailyExpenseChartAPI,MonthlyExpenseChartAPI,YearlyExpenseChartAPI,DashboardSummaryAPI,db_test
+from .views import ExpensesAPI,DailyExpensesAPI,MonthlyExpensesAPI,YearlyExpensesAPI,DailyExpenseChartAPI,MonthlyExpenseChartAPI,YearlyExpenseChartAPI,DashboardSummaryAPI,db_test,DBPoolStatsAPI,ExpensesSearchAPI,BudgetsAPI,BudgetDetailAPI,BudgetAlertsAPI,RecurringExpensesAPI,RecurringExpenseDetailAPI,ChangesFeedAPI
 
 urlpatterns = [
     path('add-expenses/', ExpensesAPI.as_view(), name = "add expenses" ),
@@ -15,7 +15,19 @@ urlpatterns = [
 
     path('dashboard/summary/', DashboardSummaryAPI.as_view(), name='dashboard-summary'),
 
+    path('search/', ExpensesSearchAPI.as_view(), name='expenses-search'),
+
+    path('budgets/', BudgetsAPI.as_view(), name='budgets'),
+    path('budgets/<int:id>/', BudgetDetailAPI.as_view(), name='budget-detail'),
+    path('budgets/alerts/', BudgetAlertsAPI.as_view(), name='budget-alerts'),
+
+    path('recurring/', RecurringExpensesAPI.as_view(), name='recurring-expenses'),
+    path('recurring/<int:id>/', RecurringExpenseDetailAPI.as_view(), name='recurring-expense-detail'),
+
+    path('changes/', ChangesFeedAPI.as_view(), name='changes-feed'),
+
     path("db-test/", db_test),
+    path("db-pool-stats/", DBPoolStatsAPI.as_view(), name='db-pool-stats'),
 
 
 ]
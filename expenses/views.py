@@ -1,15 +1,34 @@
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import status
-from rest_framework.permissions import IsAuthenticated
-
-from .models import expenses
-from .serializers import ExpensesSerializer
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+
+from ExpensesTracker.db_pool import pool_stats
+from ExpensesTracker.db_routing import ReplicaReadMixin, pin_to_primary
+from ExpensesTracker.events import publish_to_user
+from ExpensesTracker import fulltext, sharding
+from ExpensesTracker.fieldsets import project, requested_fields
+from ExpensesTracker.sharding import UserShardMixin, on_shard, shard_for
+from ExpensesTracker.streaming import stream_rows, streaming_json_response
+from analytics.forecast import invalidate_forecast
+
+from . import archive, sync
+from .budgets import apply_expense_change, budget_status, seed_current_period
+from .currency import base_amount, converted_amount, requested_currency
+from .models import (
+    ArchivedExpense, Budget, BudgetAlert, BudgetPeriod, ExpenseRollup, RecurringExpense, expenses,
+)
+from .serializers import (
+    BudgetSerializer, BudgetStatusSerializer, ExpensesSerializer, RecurringExpenseSerializer,
+)
 
 from datetime import date, timedelta
 from collections import defaultdict
+from itertools import groupby
+from operator import itemgetter
 
-from django.db.models import Sum
+from django.conf import settings
+from django.db.models import Q, Sum
 from django.db.models.functions import TruncDay, TruncMonth, TruncYear
 
 from django.http import JsonResponse
@@ -27,28 +46,83 @@ def db_test(request):
         return JsonResponse({"db": "error", "error": str(e)}, status=500)
 
 
+class DBPoolStatsAPI(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(pool_stats())
+
+
 # =========================
 # COMMON HELPER
 # =========================
-def get_user_queryset(request):
-    if request.user.is_staff or request.user.is_superuser:
-        return expenses.objects.all()
-    return expenses.objects.filter(user=request.user)
+def get_user_queryset(request, model=expenses):
+    return sharding.user_queryset(request, model)
+
+
+def get_archived_totals(request, currency, group=(), start=None, end=None):
+    return archive.archived_totals(
+        get_user_queryset(request, ArchivedExpense),
+        get_user_queryset(request, ExpenseRollup),
+        currency, group, start, end,
+    )
+
+
+def alerts_payload(alerts):
+    return [
+        {
+            "budget_id": alert.budget_id,
+            "expenses_type": alert.budget.expenses_type,
+            "period": alert.budget.period,
+            "period_start": alert.period_start,
+            "threshold": alert.threshold,
+            "spent": float(alert.spent),
+            "limit_amount": float(alert.budget.limit_amount),
+        }
+        for alert in alerts
+    ]
+
+
+def publish_expense_change(user_id, id, action, changes):
+    """
+    Push the change to the user's event streams: for each (date,
+    expenses_type, amount) in ``changes`` the amount added to that day's
+    bucket, in the base currency, with the day's month and year so the
+    client can update every report it shows.
+    """
+    buckets = defaultdict(int)
+    for day, expenses_type, amount in changes:
+        buckets[day, expenses_type] += amount
+    deltas = [
+        {"date": day, "month": f"{day:%Y-%m}", "year": day.year, "expenses_type": expenses_type, "amount": amount}
+        for (day, expenses_type), amount in sorted(buckets.items())
+        if amount
+    ]
+    publish_to_user(user_id, "expenses", {
+        "action": action,
+        "id": id,
+        "currency": settings.BASE_CURRENCY,
+        "total": sum(delta["amount"] for delta in deltas),
+        "changes": deltas,
+    })
 
 
 # =========================
 # CRUD EXPENSES
 # =========================
-class ExpensesAPI(APIView):
+class ExpensesAPI(UserShardMixin, ReplicaReadMixin, APIView):
     permission_classes = [IsAuthenticated]
+    # the list is every expense of the user, like DailyExpensesAPI
+    throttle_cost = {"GET": 20}
 
     def get(self, request, id=None):
-        queryset = get_user_queryset(request)
+        fields = requested_fields(request, ExpensesSerializer)
+        queryset = project(get_user_queryset(request), ExpensesSerializer, fields)
 
         if id:
             queryset = queryset.filter(id=id)
 
-        serializer = ExpensesSerializer(queryset, many=True)
+        serializer = ExpensesSerializer(queryset, many=True, fields=fields)
         return Response(
             {"results": serializer.data, "count": queryset.count()},
             status=status.HTTP_200_OK
@@ -57,9 +131,25 @@ class ExpensesAPI(APIView):
     def post(self, request):
         serializer = ExpensesSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save(user=request.user)  # 🔐 bind user
+            with sharding.atomic():
+                expense = serializer.save(
+                    user=request.user, sync_seq=sync.next_seq(request.user.pk)
+                )  # 🔐 bind user
+                amount = base_amount(expense)
+                alerts = apply_expense_change(
+                    expense.user_id, expense.expenses_type, expense.date, amount
+                )
+                publish_expense_change(
+                    expense.user_id, expense.id, "created",
+                    [(expense.date, expense.expenses_type, amount)],
+                )
+            invalidate_forecast(expense.user_id)
+            pin_to_primary(request.user)
             return Response(
-                {"message": "Expenses Added Successfully"},
+                {
+                    "message": "Expenses Added Successfully",
+                    "budget_alerts": alerts_payload(alerts),
+                },
                 status=status.HTTP_201_CREATED
             )
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -67,145 +157,215 @@ class ExpensesAPI(APIView):
     def patch(self, request, id):
         queryset = get_user_queryset(request)
         expense = queryset.get(id=id)
+        # budget counters are kept in the base currency
+        old_type, old_amount = expense.expenses_type, base_amount(expense)
 
         serializer = ExpensesSerializer(
             expense, data=request.data, partial=True
         )
         if serializer.is_valid():
-            serializer.save()
-            return Response({"message": "Updated Successfully"})
+            # staff may edit another user's expense, kept on that user's shard
+            with on_shard(shard_for(expense.user_id)), sharding.atomic():
+                expense = serializer.save(sync_seq=sync.next_seq(expense.user_id))
+                new_amount = base_amount(expense)
+                if expense.expenses_type == old_type:
+                    alerts = apply_expense_change(
+                        expense.user_id, old_type, expense.date, new_amount - old_amount
+                    )
+                else:
+                    alerts = apply_expense_change(
+                        expense.user_id, old_type, expense.date, -old_amount
+                    ) + apply_expense_change(
+                        expense.user_id, expense.expenses_type, expense.date, new_amount
+                    )
+                publish_expense_change(expense.user_id, expense.id, "updated", [
+                    (expense.date, old_type, -old_amount),
+                    (expense.date, expense.expenses_type, new_amount),
+                ])
+            invalidate_forecast(expense.user_id)
+            pin_to_primary(request.user)
+            return Response({
+                "message": "Updated Successfully",
+                "budget_alerts": alerts_payload(alerts),
+            })
         return Response(serializer.errors, status=400)
 
     def delete(self, request, id):
         queryset = get_user_queryset(request)
         expense = queryset.get(id=id)
-        expense.delete()
+        expense_id, amount = expense.id, base_amount(expense)
+        with on_shard(shard_for(expense.user_id)), sharding.atomic():
+            expense.delete()
+            sync.bury(expenses, [(expense_id, expense.user_id)])
+            apply_expense_change(
+                expense.user_id, expense.expenses_type, expense.date, -amount
+            )
+            publish_expense_change(
+                expense.user_id, expense_id, "deleted",
+                [(expense.date, expense.expenses_type, -amount)],
+            )
+        invalidate_forecast(expense.user_id)
+        pin_to_primary(request.user)
         return Response({"message": "Deleted Successfully"})
 
 
 # =========================
 # DAILY EXPENSES
 # =========================
-class DailyExpensesAPI(APIView):
+class DailyExpensesAPI(UserShardMixin, ReplicaReadMixin, APIView):
     permission_classes = [IsAuthenticated]
+    throttle_cost = 20
 
     def get(self, request):
-        datas = get_user_queryset(request).order_by("date")
-
-        daily_data = {}
-
-        for expense in datas:
-            date_key = expense.date.strftime("%Y-%m-%d")
-            expense_type = expense.expenses_type
-
-            daily_data.setdefault(date_key, {})
-            daily_data[date_key].setdefault(expense_type, {
-                "expenses_type": expense_type,
-                "total_amount": 0,
-                "amounts": [],
-                "notes": []
-            })
-
-            daily_data[date_key][expense_type]["total_amount"] += float(expense.amount)
-            daily_data[date_key][expense_type]["amounts"].append(float(expense.amount))
-            daily_data[date_key][expense_type]["notes"].append(expense.note)
+        currency = requested_currency(request)
+        fields = ("date", "expenses_type", "note", "converted")
+        datas = get_user_queryset(request).annotate(
+            converted=converted_amount(currency)
+        ).values(*fields)
+        if archive.reaches_archive(None):
+            datas = datas.union(
+                get_user_queryset(request, ArchivedExpense).annotate(
+                    converted=converted_amount(currency)
+                ).values(*fields),
+                all=True,
+            )
 
-        response = [
-            {"date": d, "expenses": list(v.values())}
-            for d, v in daily_data.items()
-        ]
+        # rows arrive date-ordered, so each day is complete when the
+        # next one starts and can be written out right away
+        def days():
+            for day, rows in groupby(stream_rows(datas.order_by("date")), key=itemgetter("date")):
+                day_data = {}
+                for expense in rows:
+                    expense_type = expense["expenses_type"]
+                    day_data.setdefault(expense_type, {
+                        "expenses_type": expense_type,
+                        "total_amount": 0,
+                        "amounts": [],
+                        "notes": []
+                    })
+
+                    day_data[expense_type]["total_amount"] += float(expense["converted"])
+                    day_data[expense_type]["amounts"].append(float(expense["converted"]))
+                    day_data[expense_type]["notes"].append(expense["note"])
+
+                yield {
+                    "date": day.strftime("%Y-%m-%d"),
+                    "expenses": list(day_data.values()),
+                    "currency": currency,
+                }
 
-        return Response(response)
+        return streaming_json_response(days())
 
 
 # =========================
 # MONTHLY EXPENSES
 # =========================
-class MonthlyExpensesAPI(APIView):
+class MonthlyExpensesAPI(UserShardMixin, ReplicaReadMixin, APIView):
     permission_classes = [IsAuthenticated]
+    throttle_cost = 5
 
     def get(self, request):
-        datas = get_user_queryset(request).order_by("date")
-        monthly_data = {}
-
-        for expense in datas:
-            month_key = expense.date.strftime("%Y-%m")
-            expense_type = expense.expenses_type
-
-            monthly_data.setdefault(month_key, {})
-            monthly_data[month_key].setdefault(expense_type, {
-                "expenses_type": expense_type,
-                "total_amount": 0,
-                # "amounts": [],
-                # "notes": []
-            })
-
-            monthly_data[month_key][expense_type]["total_amount"] += float(expense.amount)
-            # monthly_data[month_key][expense_type]["amounts"].append(float(expense.amount))
-            # monthly_data[month_key][expense_type]["notes"].append(expense.note)
+        currency = requested_currency(request)
 
-        response = [
-            {"month": m, "expenses": list(v.values())}
-            for m, v in monthly_data.items()
-        ]
+        # grouped and converted in the database
+        rows = get_user_queryset(request).annotate(
+            month=TruncMonth("date")
+        ).values("month", "expenses_type") \
+         .annotate(total_amount=Sum(converted_amount(currency))) \
+         .order_by("month", "expenses_type")
+        rows = stream_rows(rows)
+        if archive.reaches_archive(None):
+            group = ("month", "expenses_type")
+            rows = archive.add_archived(rows, get_archived_totals(request, currency, group), group)
+
+        def months():
+            for month, month_rows in groupby(rows, key=itemgetter("month")):
+                yield {
+                    "month": month.strftime("%Y-%m"),
+                    "expenses": [
+                        {
+                            "expenses_type": row["expenses_type"],
+                            "total_amount": float(row["total_amount"] or 0),
+                        }
+                        for row in month_rows
+                    ],
+                    "currency": currency,
+                }
 
-        return Response(response)
+        return streaming_json_response(months())
 
 
 # =========================
 # YEARLY EXPENSES
 # =========================
-class YearlyExpensesAPI(APIView):
+class YearlyExpensesAPI(UserShardMixin, ReplicaReadMixin, APIView):
     permission_classes = [IsAuthenticated]
+    throttle_cost = 5
 
     def get(self, request):
-        datas = get_user_queryset(request).order_by("date")
-        yearly_data = {}
-
-        for expense in datas:
-            year_key = expense.date.strftime("%Y")
-            expense_type = expense.expenses_type
-
-            yearly_data.setdefault(year_key, {})
-            yearly_data[year_key].setdefault(expense_type, {
-                "expenses_type": expense_type,
-                "total_amount": 0,
-                # "amounts": [],
-                # "notes": []
-            })
-
-            yearly_data[year_key][expense_type]["total_amount"] += float(expense.amount)
-            # yearly_data[year_key][expense_type]["amounts"].append(float(expense.amount))
-            # yearly_data[year_key][expense_type]["notes"].append(expense.note)
+        currency = requested_currency(request)
 
-        response = [
-            {"year": y, "expenses": list(v.values())}
-            for y, v in yearly_data.items()
-        ]
+        rows = get_user_queryset(request).annotate(
+            year=TruncYear("date")
+        ).values("year", "expenses_type") \
+         .annotate(total_amount=Sum(converted_amount(currency))) \
+         .order_by("year", "expenses_type")
+        rows = stream_rows(rows)
+        if archive.reaches_archive(None):
+            group = ("year", "expenses_type")
+            rows = archive.add_archived(rows, get_archived_totals(request, currency, group), group)
+
+        def years():
+            for year, year_rows in groupby(rows, key=itemgetter("year")):
+                yield {
+                    "year": year.strftime("%Y"),
+                    "expenses": [
+                        {
+                            "expenses_type": row["expenses_type"],
+                            "total_amount": float(row["total_amount"] or 0),
+                        }
+                        for row in year_rows
+                    ],
+                    "currency": currency,
+                }
 
-        return Response(response)
+        return streaming_json_response(years())
 
 
 # =========================
 # CHART APIs (DAILY / MONTHLY / YEARLY)
 # =========================
-class DailyExpenseChartAPI(APIView):
+class DailyExpenseChartAPI(UserShardMixin, ReplicaReadMixin, APIView):
     permission_classes = [IsAuthenticated]
+    throttle_cost = 3
 
     def get(self, request):
         queryset = get_user_queryset(request)
+        currency = requested_currency(request)
 
         start_date = request.query_params.get("start_date")
         end_date = request.query_params.get("end_date")
 
         if start_date and end_date:
+            try:
+                start_date = date.fromisoformat(start_date)
+                end_date = date.fromisoformat(end_date)
+            except ValueError:
+                return Response({"error": "Invalid date format (YYYY-MM-DD)"}, status=400)
             queryset = queryset.filter(date__range=[start_date, end_date])
+        else:
+            start_date = end_date = None
 
         queryset = queryset.values("date", "expenses_type") \
-            .annotate(total_amount=Sum("amount")) \
+            .annotate(total_amount=Sum(converted_amount(currency))) \
             .order_by("date")
 
         chart_totals = defaultdict(float)
+        if archive.reaches_archive(start_date):
+            # archived days all come before the hot ones
+            archived = get_archived_totals(request, currency, ("expenses_type",), start_date, end_date)
+            for (expenses_type,), amount in sorted(archived.items()):
+                chart_totals[expenses_type] += float(amount)
         for item in queryset:
             chart_totals[item["expenses_type"]] += float(item["total_amount"])
 
@@ -213,21 +373,27 @@ class DailyExpenseChartAPI(APIView):
             "chart": {
                 "labels": list(chart_totals.keys()),
                 "values": list(chart_totals.values())
-            }
+            },
+            "currency": currency
         })
 
 
-class MonthlyExpenseChartAPI(APIView):
+class MonthlyExpenseChartAPI(UserShardMixin, ReplicaReadMixin, APIView):
     permission_classes = [IsAuthenticated]
+    throttle_cost = 3
 
     def get(self, request):
         queryset = get_user_queryset(request)
+        currency = requested_currency(request)
 
         queryset = queryset.annotate(
             month=TruncMonth("date")
         ).values("month", "expenses_type") \
-         .annotate(total_amount=Sum("amount")) \
-         .order_by("month")
+         .annotate(total_amount=Sum(converted_amount(currency))) \
+         .order_by("month", "expenses_type")
+        if archive.reaches_archive(None):
+            group = ("month", "expenses_type")
+            queryset = archive.add_archived(queryset, get_archived_totals(request, currency, group), group)
 
         chart_totals = defaultdict(float)
         for item in queryset:
@@ -237,21 +403,27 @@ class MonthlyExpenseChartAPI(APIView):
             "chart": {
                 "labels": list(chart_totals.keys()),
                 "values": list(chart_totals.values())
-            }
+            },
+            "currency": currency
         })
 
 
-class YearlyExpenseChartAPI(APIView):
+class YearlyExpenseChartAPI(UserShardMixin, ReplicaReadMixin, APIView):
     permission_classes = [IsAuthenticated]
+    throttle_cost = 3
 
     def get(self, request):
         queryset = get_user_queryset(request)
+        currency = requested_currency(request)
 
         queryset = queryset.annotate(
             year=TruncYear("date")
         ).values("year", "expenses_type") \
-         .annotate(total_amount=Sum("amount")) \
-         .order_by("year")
+         .annotate(total_amount=Sum(converted_amount(currency))) \
+         .order_by("year", "expenses_type")
+        if archive.reaches_archive(None):
+            group = ("year", "expenses_type")
+            queryset = archive.add_archived(queryset, get_archived_totals(request, currency, group), group)
 
         chart_totals = defaultdict(float)
         for item in queryset:
@@ -261,15 +433,17 @@ class YearlyExpenseChartAPI(APIView):
             "chart": {
                 "labels": list(chart_totals.keys()),
                 "values": list(chart_totals.values())
-            }
+            },
+            "currency": currency
         })
 
 
 # =========================
 # DASHBOARD SUMMARY
 # =========================
-class DashboardSummaryAPI(APIView):
+class DashboardSummaryAPI(UserShardMixin, ReplicaReadMixin, APIView):
     permission_classes = [IsAuthenticated]
+    throttle_cost = 3
 
     def percentage_change(self, current, previous):
         if previous == 0:
@@ -278,55 +452,54 @@ class DashboardSummaryAPI(APIView):
 
     def get(self, request):
         queryset = get_user_queryset(request)
+        currency = requested_currency(request)
 
         today = date.today()
         yesterday = today - timedelta(days=1)
 
-        # =========================
-        # TOTALS
-        # =========================
-        total_expense = queryset.aggregate(
-            total=Sum("amount")
-        )["total"] or 0
-
-        today_expense = queryset.filter(
-            date=today
-        ).aggregate(total=Sum("amount"))["total"] or 0
-
-        yesterday_expense = queryset.filter(
-            date=yesterday
-        ).aggregate(total=Sum("amount"))["total"] or 0
-
-        # =========================
-        # MONTH COMPARISON
-        # =========================
-        this_month_expense = queryset.filter(
-            date__year=today.year,
-            date__month=today.month
-        ).aggregate(total=Sum("amount"))["total"] or 0
-
-        last_month_date = today.replace(day=1) - timedelta(days=1)
-
-        last_month_expense = queryset.filter(
-            date__year=last_month_date.year,
-            date__month=last_month_date.month
-        ).aggregate(total=Sum("amount"))["total"] or 0
+        month_start = today.replace(day=1)
+        last_month_date = month_start - timedelta(days=1)
 
         # =========================
-        # YEAR COMPARISON
+        # TOTALS + MONTH / YEAR COMPARISON
         # =========================
-        this_year_expense = queryset.filter(
-            date__year=today.year
-        ).aggregate(total=Sum("amount"))["total"] or 0
+        periods = {
+            "total": (None, None),
+            "today": (today, today),
+            "yesterday": (yesterday, yesterday),
+            "this_month": (
+                month_start, (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+            ),
+            "last_month": (last_month_date.replace(day=1), last_month_date),
+            "this_year": (date(today.year, 1, 1), date(today.year, 12, 31)),
+            "last_year": (date(today.year - 1, 1, 1), date(today.year - 1, 12, 31)),
+        }
 
-        last_year_expense = queryset.filter(
-            date__year=today.year - 1
-        ).aggregate(total=Sum("amount"))["total"] or 0
+        # a single aggregate, every amount converted inside it
+        amount = converted_amount(currency)
+        totals = queryset.aggregate(**{
+            name: Sum(amount, filter=Q(date__range=[start, end]) if start else None)
+            for name, (start, end) in periods.items()
+        })
+        # plus the archived part of the periods that reach back that far
+        for name, (start, end) in periods.items():
+            if archive.reaches_archive(start):
+                archived = get_archived_totals(request, currency, start=start, end=end)
+                totals[name] = (totals[name] or 0) + archived[()]
+
+        total_expense = totals["total"] or 0
+        today_expense = totals["today"] or 0
+        yesterday_expense = totals["yesterday"] or 0
+        this_month_expense = totals["this_month"] or 0
+        last_month_expense = totals["last_month"] or 0
+        this_year_expense = totals["this_year"] or 0
+        last_year_expense = totals["last_year"] or 0
 
         # =========================
         # RESPONSE
         # =========================
         response = {
+            "currency": currency,
             "summary": {
                 "total_expense": float(total_expense),
                 "today_expense": float(today_expense),
@@ -373,4 +546,227 @@ class DashboardSummaryAPI(APIView):
             }
         }
 
-        return Response(response)
\ No newline at end of file
+        return Response(response)
+
+
+# =========================
+# SEARCH NOTES
+# =========================
+class ExpensesSearchAPI(UserShardMixin, ReplicaReadMixin, APIView):
+    permission_classes = [IsAuthenticated]
+    throttle_cost = 5
+
+    def get(self, request):
+        query = request.query_params.get("q", "")
+        if not fulltext.terms(query):
+            return Response(
+                {"error": "q is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            limit, offset, date_range = fulltext.search_params(request.query_params)
+        except ValueError as error:
+            return Response(
+                {"error": str(error)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        filters = {}
+        if not (request.user.is_staff or request.user.is_superuser):
+            filters["user_id"] = request.user.id
+        if request.query_params.get("expenses_type"):
+            filters["expenses_type"] = request.query_params["expenses_type"]
+
+        hits = fulltext.search_all(
+            expenses, "note", query,
+            databases=sharding.read_databases(request, expenses),
+            filters=filters,
+            date_range=date_range,
+            prefix=request.query_params.get("prefix", "true") != "false",
+            limit=limit,
+            offset=offset,
+        )
+
+        fields = requested_fields(request, ExpensesSerializer)
+        records = fulltext.ranked_objects(
+            project(get_user_queryset(request), ExpensesSerializer, fields), hits
+        )
+        results = ExpensesSerializer(records, many=True, fields=fields).data
+        for row, record in zip(results, records):
+            row["rank"] = record.rank
+
+        return Response(
+            {"results": results, "count": len(results)},
+            status=status.HTTP_200_OK
+        )
+
+
+# =========================
+# BUDGETS
+# =========================
+class BudgetsAPI(UserShardMixin, ReplicaReadMixin, APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        fields = requested_fields(request, BudgetStatusSerializer)
+        budgets = Budget.objects.filter(user=request.user).order_by("expenses_type", "period")
+        serializer = BudgetStatusSerializer(budget_status(budgets), many=True, fields=fields)
+        return Response({"results": serializer.data})
+
+    def post(self, request):
+        serializer = BudgetSerializer(data=request.data)
+        if serializer.is_valid():
+            if Budget.objects.filter(
+                user=request.user,
+                expenses_type=serializer.validated_data["expenses_type"],
+                period=serializer.validated_data.get("period", BudgetPeriod.MONTHLY),
+            ).exists():
+                return Response(
+                    {"error": "A budget for this category and period already exists"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            with sharding.atomic():
+                budget = serializer.save(user=request.user)
+                seed_current_period(budget)
+            pin_to_primary(request.user)
+            return Response(
+                {"message": "Budget created successfully", "data": budget_status([budget])[0]},
+                status=status.HTTP_201_CREATED
+            )
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class BudgetDetailAPI(UserShardMixin, APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get_budget(self, request, id):
+        return Budget.objects.filter(user=request.user, id=id).first()
+
+    def patch(self, request, id):
+        budget = self.get_budget(request, id)
+        if not budget:
+            return Response({"error": "Budget not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        old_scope = (budget.expenses_type, budget.period)
+        serializer = BudgetSerializer(budget, data=request.data, partial=True)
+        if serializer.is_valid():
+            with sharding.atomic():
+                budget = serializer.save()
+                if (budget.expenses_type, budget.period) != old_scope:
+                    # counters belong to the old category/period
+                    budget.spends.all().delete()
+                    seed_current_period(budget)
+            pin_to_primary(request.user)
+            return Response({"message": "Budget updated successfully", "data": budget_status([budget])[0]})
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    def delete(self, request, id):
+        budget = self.get_budget(request, id)
+        if not budget:
+            return Response({"error": "Budget not found"}, status=status.HTTP_404_NOT_FOUND)
+        budget.delete()
+        pin_to_primary(request.user)
+        return Response({"message": "Budget deleted successfully"})
+
+
+class BudgetAlertsAPI(UserShardMixin, ReplicaReadMixin, APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        alerts = (
+            BudgetAlert.objects.filter(user=request.user)
+            .select_related("budget")
+            .order_by("-created_at")[:50]
+        )
+        return Response({"results": alerts_payload(alerts)})
+
+
+# =========================
+# RECURRING EXPENSES
+# =========================
+class RecurringExpensesAPI(UserShardMixin, ReplicaReadMixin, APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        fields = requested_fields(request, RecurringExpenseSerializer)
+        rules = project(
+            RecurringExpense.objects.filter(user=request.user).order_by("next_due_date", "id"),
+            RecurringExpenseSerializer, fields,
+        )
+        serializer = RecurringExpenseSerializer(rules, many=True, fields=fields)
+        return Response({"results": serializer.data})
+
+    def post(self, request):
+        serializer = RecurringExpenseSerializer(data=request.data)
+        if serializer.is_valid():
+            # the scheduler materializes everything from start_date on,
+            # including past dates when the rule starts in the past
+            rule = serializer.save(
+                user=request.user,
+                next_due_date=serializer.validated_data["start_date"],
+            )
+            pin_to_primary(request.user)
+            return Response(
+                {"message": "Recurring expense created successfully", "data": RecurringExpenseSerializer(rule).data},
+                status=status.HTTP_201_CREATED
+            )
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class RecurringExpenseDetailAPI(UserShardMixin, APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get_rule(self, request, id):
+        return RecurringExpense.objects.filter(user=request.user, id=id).first()
+
+    def patch(self, request, id):
+        rule = self.get_rule(request, id)
+        if not rule:
+            return Response({"error": "Recurring expense not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        old_start = rule.start_date
+        serializer = RecurringExpenseSerializer(rule, data=request.data, partial=True)
+        if serializer.is_valid():
+            extra = {}
+            if serializer.validated_data.get("start_date", old_start) != old_start:
+                extra["next_due_date"] = serializer.validated_data["start_date"]
+            rule = serializer.save(**extra)
+            pin_to_primary(request.user)
+            return Response({"message": "Recurring expense updated successfully", "data": RecurringExpenseSerializer(rule).data})
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    def delete(self, request, id):
+        rule = self.get_rule(request, id)
+        if not rule:
+            return Response({"error": "Recurring expense not found"}, status=status.HTTP_404_NOT_FOUND)
+        # expenses already generated by the rule are kept
+        rule.delete()
+        pin_to_primary(request.user)
+        return Response({"message": "Recurring expense deleted successfully"})
+
+
+# =========================
+# CHANGES FEED
+# =========================
+class ChangesFeedAPI(UserShardMixin, ReplicaReadMixin, APIView):
+    """
+    Offline sync: ``?since=<cursor>`` returns the expenses and lend/return
+    rows written and deleted after the cursor, with the next cursor.
+    Without ``since`` every current row is returned.
+    """
+
+    permission_classes = [IsAuthenticated]
+    throttle_cost = 2
+
+    def get(self, request):
+        try:
+            payload = sync.changes(request.user.pk, request.GET.get("since"))
+        except sync.CursorExpired:
+            return Response(
+                {"error": "Cursor too old, sync again without since"},
+                status=status.HTTP_410_GONE
+            )
+        except ValueError:
+            return Response({"error": "Invalid since cursor"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(payload)
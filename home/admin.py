@@ -1,3 +1,15 @@
 from django.contrib import admin
 
-# Register your models here.
+from ExpensesTracker.admin_tools import ScalableModelAdmin
+
+from .models import expenses
+
+
+@admin.register(expenses)
+class ExpensesAdmin(ScalableModelAdmin):
+    list_display = ("id", "date", "expenses_type", "amount", "note")
+    list_filter = ("expenses_type",)
+    date_hierarchy = "date"
+    ordering = ("-date", "-id")
+
+    actions = ["delete_selected_set_based"]
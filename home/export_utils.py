@@ -1,8 +1,29 @@
-import pandas as pd
-from django.http import HttpResponse
+import csv
+from itertools import chain
 
-def export_to_excel(records, filename="export.xlsx"):
-    df = pd.DataFrame(records)
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse, StreamingHttpResponse
+
+
+class Echo:
+    """
+    File-like object whose write() hands the line back, so csv.writer
+    output can be streamed instead of buffered.
+    """
+
+    def write(self, value):
+        return value
+
+
+def export_to_excel(records, filename="export.xlsx", columns=None):
+    # only Excel exports need pandas (and openpyxl), so it is imported here
+    try:
+        import pandas as pd
+    except ImportError as exc:
+        raise ImproperlyConfigured("Excel exports need pandas and openpyxl installed") from exc
+
+    # an xlsx file is a zip archive, written out whole
+    df = pd.DataFrame(list(records), columns=columns)
 
     response = HttpResponse(
         content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
@@ -13,11 +34,20 @@ def export_to_excel(records, filename="export.xlsx"):
     return response
 
 
-def export_to_csv(records, filename="export.csv"):
-    df = pd.DataFrame(records)
+def export_to_csv(records, filename="export.csv", columns=None):
+    records = iter(records)
+    if columns is None:
+        first = next(records, None)
+        columns = list(first) if first else []
+        records = chain([first], records) if first else []
 
-    response = HttpResponse(content_type="text/csv")
-    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    writer = csv.DictWriter(Echo(), fieldnames=columns)
 
-    df.to_csv(response, index=False)
+    def lines():
+        yield writer.writeheader()
+        for record in records:
+            yield writer.writerow(record)
+
+    response = StreamingHttpResponse(lines(), content_type="text/csv")
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
     return response
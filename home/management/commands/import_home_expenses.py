@@ -0,0 +1,121 @@
+from datetime import datetime, time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from ExpensesTracker import sharding
+from ExpensesTracker.sharding import on_shard, shard_for
+from analytics.forecast import invalidate_forecast
+
+from expenses import sync
+from expenses.budgets import resync_budgets
+from expenses.models import ArchivedExpense, expenses
+
+from home.models import expenses as HomeExpense
+
+NOTE_LENGTH = expenses._meta.get_field("note").max_length
+
+
+def created_at(row):
+    # the legacy row's date and time of day: the reports and exports
+    # read an expense's time, and order a day's rows, from created_at
+    return timezone.make_aware(datetime.combine(row.date, row.time or time()))
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the legacy home expenses (one global ledger, no owner) into "
+        "the per-user expenses table of --owner, in the base currency. "
+        "Rows carry a home:<id> idempotency key, so re-runs skip what was "
+        "already copied. Notes longer than the expenses table allows are "
+        "cut and reported. Old rows are moved to the archive by the next "
+        "archive_expenses run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--owner", required=True, help="email of the user the rows are given to")
+        parser.add_argument("--batch", type=int, default=1000, help="rows per transaction")
+        parser.add_argument("--delete", action="store_true",
+                            help="delete legacy rows once they are copied")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            owner = User.objects.get(email=options["owner"])
+        except User.DoesNotExist:
+            raise CommandError(f"No user with email {options['owner']}")
+
+        alias = shard_for(owner.pk)
+        legacy = HomeExpense.objects.using("default").order_by("id")
+        last_id = seen = created = 0
+        truncated = []
+
+        while True:
+            rows = list(legacy.filter(id__gt=last_id)[:options["batch"]])
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            pending = [
+                expenses(
+                    user_id=owner.pk,
+                    date=row.date,
+                    expenses_type=row.expenses_type,
+                    amount=row.amount,
+                    currency=settings.BASE_CURRENCY,
+                    note=row.note[:NOTE_LENGTH] if row.note else row.note,
+                    idempotency_key=f"home:{row.id}",
+                )
+                for row in rows
+            ]
+            # auto_now_add would stamp the import time: set afterwards
+            stamps = {f"home:{row.id}": created_at(row) for row in rows}
+            keys = [e.idempotency_key for e in pending]
+            with on_shard(alias), sharding.atomic():
+                # copies of earlier runs may have been archived since
+                existing = {
+                    key
+                    for model in (expenses, ArchivedExpense)
+                    for key in model.objects.filter(
+                        user_id=owner.pk, idempotency_key__in=keys
+                    ).values_list("idempotency_key", flat=True)
+                }
+                new = [e for e in pending if e.idempotency_key not in existing]
+                sync.stamp(new)
+                expenses.objects.bulk_create(new, batch_size=1000, ignore_conflicts=True)
+                copies = list(
+                    expenses.objects.filter(
+                        user_id=owner.pk, idempotency_key__in=[e.idempotency_key for e in new]
+                    ).only("id", "idempotency_key")
+                )
+                for copy in copies:
+                    copy.created_at = stamps[copy.idempotency_key]
+                expenses.objects.bulk_update(copies, ["created_at"], batch_size=1000)
+            truncated += [
+                row.id for row in rows
+                if row.note and len(row.note) > NOTE_LENGTH and f"home:{row.id}" not in existing
+            ]
+
+            # only once the copies are committed on the owner's shard
+            if options["delete"]:
+                HomeExpense.objects.using("default").filter(id__in=[row.id for row in rows]).delete()
+
+            seen += len(rows)
+            created += len(new)
+            self.stdout.write(f"  {seen} legacy row(s) read, {created} expense(s) created")
+
+        if created:
+            with on_shard(alias), sharding.atomic():
+                resync_budgets([owner.pk])
+            invalidate_forecast(owner.pk)
+
+        if truncated:
+            self.stdout.write(self.style.WARNING(
+                f"{len(truncated)} note(s) cut to {NOTE_LENGTH} characters, legacy id(s): "
+                + ", ".join(map(str, truncated))
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {created} legacy expense(s) for {owner.email} on {alias}"
+        ))
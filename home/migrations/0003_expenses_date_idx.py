@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0002_alter_expenses_amount'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='expenses',
+            index=models.Index(fields=['date'], name='home_expenses_date_idx'),
+        ),
+    ]
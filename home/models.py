@@ -1,7 +1,12 @@
 from django.db import models
 
 class expenses(models.Model):
-    
+    """
+    The legacy global ledger, without an owner. The home URLs now read
+    the per-user expenses tables; rows are moved there by the
+    import_home_expenses command.
+    """
+
     EXPENSES_TYPES =[
         ('rent','Rent'),
         ('travel','Travel'),
@@ -15,7 +20,13 @@ class expenses(models.Model):
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     note = models.CharField(blank=True, null=True)
     time = models.TimeField(auto_now = True)
-    
+
+    class Meta:
+        indexes = [
+            # admin date_hierarchy
+            models.Index(fields=["date"], name="home_expenses_date_idx"),
+        ]
+
     def __str__(self):
         return self.expenses_type
         
\ No newline at end of file
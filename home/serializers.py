@@ -1,10 +0,0 @@
-from rest_framework import serializers
-from .models import expenses
-
-
-class ExpenseSerializer(serializers.ModelSerializer):
-    
-    class Meta:
-        
-        model = expenses
-        fields = "__all__"
\ No newline at end of file
@@ -1,3 +1,182 @@
+import io
+from datetime import date, datetime, time, timezone as dt_timezone
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from ExpensesTracker.sharding import on_shard, shard_for
+from expenses.models import expenses
+from login.models import User
+
+from .models import expenses as HomeExpense
+
+# more than one with ExpensesTracker.settings_test
+SHARDS = set(settings.DATABASE_SHARDS)
+
+
+def make_user(n):
+    return User.objects.create_user(email=f"u{n}@x.com", phone=str(n), password=None, name="U")
+
+
+def legacy(day, expenses_type, amount, at, note=None):
+    row = HomeExpense.objects.create(date=day, expenses_type=expenses_type, amount=Decimal(amount), note=note)
+    # time is auto_now
+    HomeExpense.objects.filter(pk=row.pk).update(time=at)
+    return row
+
+
+# =========================
+# IMPORT
+# =========================
+class ImportHomeExpensesTests(TestCase):
+    databases = SHARDS
+
+    def setUp(self):
+        cache.clear()
+        self.owner = make_user(1)
+        self.rows = [
+            legacy(date(2026, 3, 1), "rent", "500", time(18, 30), "march rent"),
+            legacy(date(2026, 3, 1), "travel", "20", time(8, 15)),
+            legacy(date(2026, 3, 2), "shopping", "75", time(12, 0), "x" * 400),
+        ]
+
+    def run_import(self, *args):
+        out = io.StringIO()
+        call_command("import_home_expenses", "--owner", self.owner.email, *args, stdout=out)
+        return out.getvalue()
+
+    def copies(self):
+        with on_shard(shard_for(self.owner.pk)):
+            return list(expenses.objects.filter(user=self.owner).order_by("date", "created_at", "id"))
+
+    def test_rows_are_copied_with_their_time(self):
+        output = self.run_import()
+
+        copies = self.copies()
+        self.assertEqual([(c.expenses_type, c.amount) for c in copies], [
+            ("travel", Decimal("20.00")), ("rent", Decimal("500.00")), ("shopping", Decimal("75.00")),
+        ])
+        self.assertEqual(
+            [c.created_at for c in copies],
+            [datetime(2026, 3, 1, 8, 15, tzinfo=dt_timezone.utc), datetime(2026, 3, 1, 18, 30, tzinfo=dt_timezone.utc),
+             datetime(2026, 3, 2, 12, 0, tzinfo=dt_timezone.utc)],
+        )
+        self.assertEqual({c.idempotency_key for c in copies}, {f"home:{row.id}" for row in self.rows})
+        self.assertEqual(len(copies[2].note), 150)
+        self.assertIn(f"1 note(s) cut to 150 characters, legacy id(s): {self.rows[2].id}", output)
+
+    def test_rerun_copies_nothing_twice(self):
+        self.run_import()
+        output = self.run_import()
+
+        self.assertEqual(len(self.copies()), 3)
+        self.assertIn("Imported 0 legacy expense(s)", output)
+        self.assertNotIn("cut to", output)
+        self.assertEqual(HomeExpense.objects.count(), 3)
+
+    def test_delete_removes_copied_legacy_rows(self):
+        self.run_import("--delete", "--batch", "2")
+
+        self.assertFalse(HomeExpense.objects.exists())
+        self.assertEqual(len(self.copies()), 3)
+        self.assertIn("Imported 0 legacy expense(s)", self.run_import("--delete"))
+
+    def test_unknown_owner(self):
+        with self.assertRaises(CommandError):
+            call_command("import_home_expenses", "--owner", "nobody@x.com", stdout=io.StringIO())
+
+
+# =========================
+# LEGACY RESPONSES
+# =========================
+class HomeViewsTests(TestCase):
+    databases = SHARDS
+
+    def setUp(self):
+        cache.clear()
+        self.user = make_user(1)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        legacy(date(2026, 3, 1), "rent", "500", time(18, 30), "march rent")
+        legacy(date(2026, 3, 1), "travel", "20", time(8, 15))
+        legacy(date(2026, 4, 2), "shopping", "75", time(12, 0), "shoes")
+        legacy(date(2025, 12, 31), "travel", "5", time(23, 0))
+        call_command("import_home_expenses", "--owner", self.user.email, stdout=io.StringIO())
+
+    def get(self, path, **params):
+        response = self.client.get(f"/home/{path}", params)
+        self.assertEqual(response.status_code, 200, path)
+        return response
+
+    def test_expenses_list_envelope(self):
+        data = self.get("expenses/").data
+
+        self.assertEqual(data["message"], "Expenses fetched successfully")
+        self.assertEqual(len(data["results"]), 4)
+
+    def test_daily(self):
+        single = self.get("daily-expenses/", date="2026-03-01").data
+        self.assertEqual(single["date"], "2026-03-01")
+        self.assertEqual(single["total"], 520.0)
+        self.assertEqual(single["currency"], "INR")
+        self.assertEqual(
+            [(d["type"], d["amount"], d["time"], d["note"]) for d in single["details"]],
+            [("travel", 20.0, "08:15:00", None), ("rent", 500.0, "18:30:00", "march rent")],
+        )
+
+        days = self.get("daily-expenses/", **{"from": "2026-03-01", "to": "2026-04-30"}).data
+        self.assertEqual(list(days), ["2026-03-01", "2026-04-02"])
+        self.assertEqual(days["2026-03-01"], {
+            "rent": 500.0, "food": 0, "travel": 20.0, "shopping": 0, "utilities": 0,
+            "entertainment": 0, "total": 520.0,
+        })
+
+        self.assertEqual(self.get("daily-expenses/", date="2026-05-01").data, {"message": "No expenses found"})
+        self.assertEqual(self.client.get("/home/daily-expenses/", {"date": "2026-13-01"}).status_code, 400)
+
+    def test_monthly(self):
+        month = self.get("monthly-expenses/", month="2026-03").data
+        self.assertEqual(month["total_month_expense"], 520.0)
+        self.assertEqual([item["time"] for item in month["days"][0]["items"]], ["08:15:00", "18:30:00"])
+
+        ranged = self.get("monthly-expenses/", **{"from": "2026-01-01", "to": "2026-12-31"}).data
+        self.assertEqual(ranged["results"], [{"month": "2026-03", "total": 520.0}, {"month": "2026-04", "total": 75.0}])
+
+        summary = self.get("monthly-expenses/").data["results"]
+        self.assertEqual(summary[0], {"month": "2025-12", "total": 5.0, "categories": {"travel": 5.0}})
+
+    def test_yearly(self):
+        years = self.get("yearly/").data
+        self.assertEqual(years, [
+            {"year": "2025", "total": 5.0, "category_wise": {"travel": 5.0}},
+            {"year": "2026", "total": 595.0, "category_wise": {"rent": 500.0, "shopping": 75.0, "travel": 20.0}},
+        ])
+
+        months = self.get("yearly/2026/").data
+        self.assertEqual([(m["month"], m["total"]) for m in months], [("2026-03", 520.0), ("2026-04", 75.0)])
+
+        days = self.get("yearly/2026/3/").data
+        self.assertEqual(days, [{
+            "date": "2026-03-01",
+            "total": 520.0,
+            "details": [
+                {"time": "08:15:00", "expenses_type": "travel", "amount": 20.0, "note": None},
+                {"time": "18:30:00", "expenses_type": "rent", "amount": 500.0, "note": "march rent"},
+            ],
+        }])
+        self.assertEqual(self.client.get("/home/yearly/2026/13/").status_code, 400)
+
+    def test_csv_export(self):
+        response = self.get("export/yearly/", year="2026", type="csv")
 
-# Create your tests here.
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines, [
+            "Date,Time,Type,Amount,Currency,Note",
+            "2026-03-01,08:15:00,travel,20.0,INR,",
+            "2026-03-01,18:30:00,rent,500.0,INR,march rent",
+            "2026-04-02,12:00:00,shopping,75.0,INR,shoes",
+        ])
@@ -1,176 +1,262 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from django.http import HttpResponse
 from rest_framework import status
-from .serializers import ExpenseSerializer
-from .models import expenses
-import pandas as pd
-from datetime import datetime
+from rest_framework.permissions import IsAuthenticated
+
 from django.db.models import Sum
-from django.db.models.functions import TruncMonth, TruncDay, TruncYear
+from django.db.models.functions import TruncMonth, TruncYear
+from django.utils import timezone
+
+from ExpensesTracker.db_routing import ReplicaReadMixin
+from ExpensesTracker.sharding import UserShardMixin
+from ExpensesTracker.streaming import stream_rows
+from expenses import archive
+from expenses import views as expenses_views
+from expenses.currency import converted_amount, requested_currency
+from expenses.models import ArchivedExpense, expenses
+from expenses.views import get_archived_totals, get_user_queryset
+
 from .export_utils import export_to_excel, export_to_csv
+import calendar
+from datetime import date, datetime
+from itertools import chain, groupby
+from operator import itemgetter
+
+
+# The legacy drill-down and export URLs, served from the per-user
+# expenses tables (hot and archived) with the same grouped, indexed
+# queries as the expenses app. The old global home table is only read by
+# the import_home_expenses command.
+
+EXPENSES_TYPES = [value for value, _ in expenses.EXPENSES_CHOICES]
+
+ROW_FIELDS = ("id", "date", "created_at", "expenses_type", "note", "converted")
+
+EXPORT_COLUMNS = ["Date", "Time", "Type", "Amount", "Currency", "Note"]
+
+
+# date ranges instead of __year / __month lookups: EXTRACT(month ...) can
+# use neither the date index nor partition pruning
+def year_bounds(year):
+    return [date(int(year), 1, 1), date(int(year), 12, 31)]
+
+
+def month_bounds(year, month):
+    year, month = int(year), int(month)
+    return [date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])]
+
+
+def parse_range(start, end):
+    """
+    ``start`` / ``end`` query values as dates (None when absent). Raises
+    ValueError.
+    """
+    return (
+        date.fromisoformat(start) if start else None,
+        date.fromisoformat(end) if end else None,
+    )
+
+
+# =========================
+# COMMON HELPERS
+# =========================
+def _in_range(queryset, start, end):
+    if start:
+        queryset = queryset.filter(date__gte=start)
+    if end:
+        queryset = queryset.filter(date__lte=end)
+    return queryset
+
+
+def user_rows(request, currency, start=None, end=None):
+    """
+    The user's expenses dated ``start``..``end`` (None: open) as dicts of
+    ROW_FIELDS, amounts converted to ``currency``, in date order. Archived
+    expenses are included only when the range reaches back to them.
+    """
+    def select(model):
+        return _in_range(get_user_queryset(request, model), start, end) \
+            .annotate(converted=converted_amount(currency)) \
+            .values(*ROW_FIELDS)
+
+    rows = select(expenses)
+    if archive.reaches_archive(start):
+        rows = rows.union(select(ArchivedExpense), all=True)
+    return stream_rows(rows.order_by("date", "created_at", "id"))
+
+
+def day_totals(request, currency, start=None, end=None):
+    """
+    ``{day: {expenses_type: total}}`` in ``currency``, in date order.
+    """
+    def select(model):
+        return _in_range(get_user_queryset(request, model), start, end) \
+            .values("date", "expenses_type") \
+            .annotate(total_amount=Sum(converted_amount(currency))) \
+            .order_by()
+
+    rows = select(expenses)
+    if archive.reaches_archive(start):
+        rows = rows.union(select(ArchivedExpense), all=True)
+
+    days = {}
+    for row in rows.order_by("date"):
+        totals = days.setdefault(row["date"], {})
+        totals[row["expenses_type"]] = totals.get(row["expenses_type"], 0) + float(row["total_amount"] or 0)
+    return days
+
+
+def period_totals(request, currency, period, start=None, end=None):
+    """
+    Rows of ``period`` ("month" or "year"), expenses_type and
+    total_amount in ``currency``, in period order, archived totals
+    merged in.
+    """
+    trunc = {"month": TruncMonth, "year": TruncYear}[period]
+    group = (period, "expenses_type")
+    rows = _in_range(get_user_queryset(request), start, end) \
+        .annotate(**{period: trunc("date")}) \
+        .values(*group) \
+        .annotate(total_amount=Sum(converted_amount(currency))) \
+        .order_by(*group)
+    if archive.reaches_archive(start):
+        rows = archive.add_archived(rows, get_archived_totals(request, currency, group, start, end), group)
+    return rows
+
+
+def by_period(rows, period, label):
+    """
+    ``period_totals`` rows folded into one entry per period with its
+    total and per-type totals.
+    """
+    return [
+        {
+            label: key.strftime("%Y-%m" if period == "month" else "%Y"),
+            "total": sum(totals.values()),
+            "category_wise": totals,
+        }
+        for key, totals in (
+            (key, {row["expenses_type"]: float(row["total_amount"] or 0) for row in group})
+            for key, group in groupby(rows, key=itemgetter(period))
+        )
+    ]
 
-class ExpensesAPI(APIView):
 
-    # 👉 GET ALL EXPENSES
-    def get(self, request):
-        expense = expenses.objects.all().order_by('-id')
-        serializer = ExpenseSerializer(expense, many=True)
-        
-        return Response(
-            {"message": "Expenses fetched successfully", "results": serializer.data},
-            status=status.HTTP_200_OK
-        )
+def row_time(row):
+    return timezone.localtime(row["created_at"]).strftime("%H:%M:%S")
 
-    # 👉 CREATE EXPENSE
-    def post(self, request):
-        serializer = ExpenseSerializer(data=request.data)
 
-        if serializer.is_valid():
-            serializer.save()
-            return Response(
-                {"message": "Expense created successfully", "data": serializer.data},
-                status=status.HTTP_201_CREATED
-            )
+def export_rows(rows, currency):
+    for row in rows:
+        yield {
+            "Date": row["date"].isoformat(),
+            "Time": row_time(row),
+            "Type": row["expenses_type"],
+            "Amount": float(row["converted"]),
+            "Currency": currency,
+            "Note": row["note"],
+        }
 
-        return Response(
-            {"message": "Validation failed", "errors": serializer.errors},
-            status=status.HTTP_400_BAD_REQUEST
-        )
 
-    # 👉 UPDATE EXPENSE PARTIALLY USING ID (PATCH)
-    def patch(self, request, id=None):
-        if not id:
-            return Response(
-                {"message": "Expense ID is required"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+def export(rows, currency, filename, export_type="excel"):
+    records = export_rows(rows, currency)
+    if export_type == "csv":
+        return export_to_csv(records, f"{filename}.csv", EXPORT_COLUMNS)
+    return export_to_excel(records, f"{filename}.xlsx", EXPORT_COLUMNS)
 
-        try:
-            expense = expenses.objects.get(id=id)
-        except expenses.DoesNotExist:
-            return Response(
-                {"message": "Expense not found"},
-                status=status.HTTP_404_NOT_FOUND
-            )
-
-        serializer = ExpenseSerializer(expense, data=request.data, partial=True)
-
-        if serializer.is_valid():
-            serializer.save()
-            return Response(
-                {"message": "Expense updated successfully", "data": serializer.data},
-                status=status.HTTP_206_PARTIAL_CONTENT
-            )
 
+# =========================
+# CRUD EXPENSES
+# =========================
+class ExpensesAPI(expenses_views.ExpensesAPI):
+    """
+    The expenses app's CRUD API under the legacy list envelope.
+    """
+
+    def get(self, request, id=None):
+        response = super().get(request, id)
         return Response(
-            {"message": "Update failed", "errors": serializer.errors},
-            status=status.HTTP_400_BAD_REQUEST
+            {"message": "Expenses fetched successfully", "results": response.data["results"]},
+            status=status.HTTP_200_OK
         )
 
 
-class DailyExpensesAPI(APIView):
+# =========================
+# DAILY
+# =========================
+class DailyExpensesAPI(UserShardMixin, ReplicaReadMixin, APIView):
+    permission_classes = [IsAuthenticated]
+    throttle_cost = 10
 
     def get(self, request):
-
-        # --------- FILTERS ----------
-        date = request.GET.get("date")
-        from_date = request.GET.get("from")
-        to_date = request.GET.get("to")
-
-        queryset = expenses.objects.all().order_by("date", "time")
-
-        # --- SINGLE DATE FILTER ---
-        if date:
-            day_expenses = queryset.filter(date=date)
-            if not day_expenses.exists():
+        currency = requested_currency(request)
+        try:
+            day = date.fromisoformat(request.GET["date"]) if request.GET.get("date") else None
+            start, end = parse_range(request.GET.get("from"), request.GET.get("to"))
+        except ValueError:
+            return Response({"error": "Invalid date format (YYYY-MM-DD)"}, status=400)
+
+        # --- SINGLE DATE ---
+        if day:
+            rows = list(user_rows(request, currency, day, day))
+            if not rows:
                 return Response({"message": "No expenses found"}, status=200)
 
-            result = {
-                "date": date,
-                "total": sum(int(i.amount) for i in day_expenses),
+            return Response({
+                "date": day.isoformat(),
+                "total": sum(float(row["converted"]) for row in rows),
                 "details": [
                     {
-                        "id": exp.id,
-                        "type": exp.expenses_type,
-                        "amount": exp.amount,
-                        "time": exp.time.strftime("%H:%M:%S"),
-                        "note": exp.note
+                        "id": row["id"],
+                        "type": row["expenses_type"],
+                        "amount": float(row["converted"]),
+                        "time": row_time(row),
+                        "note": row["note"],
                     }
-                    for exp in day_expenses
-                ]
-            }
-            return Response(result, status=200)
+                    for row in rows
+                ],
+                "currency": currency,
+            }, status=200)
 
-        # --- DATE RANGE FILTER ---
-        if from_date and to_date:
-            queryset = queryset.filter(date__range=[from_date, to_date])
-
-        # ----------- GROUPED MULTI-DAY RESPONSE -----------
+        # --- ALL DAYS / DATE RANGE, one entry per day ---
         result = {}
-
-        for item in queryset:
-            date_str = str(item.date)
-
-            if date_str not in result:
-                result[date_str] = {
-                    "rent": 0,
-                    "travel": 0,
-                    "shopping": 0,
-                    "utilities": 0,
-                    "entertainment": 0,
-                    "total": 0
-                }
-
-            result[date_str][item.expenses_type] += int(item.amount)
-            result[date_str]["total"] += int(item.amount)
-
+        for day, totals in day_totals(request, currency, start, end).items():
+            result[day.isoformat()] = {
+                **{expenses_type: totals.get(expenses_type, 0) for expenses_type in EXPENSES_TYPES},
+                "total": sum(totals.values()),
+            }
         return Response(result, status=200)
 
 
-class ExportExpensesAPI(APIView):
+class ExportExpensesAPI(UserShardMixin, ReplicaReadMixin, APIView):
+    permission_classes = [IsAuthenticated]
+    throttle_cost = 50
 
     def get(self, request):
+        currency = requested_currency(request)
+        try:
+            start, end = parse_range(request.GET.get("from"), request.GET.get("to"))
+        except ValueError:
+            return Response({"error": "Invalid date format (YYYY-MM-DD)"}, status=400)
 
-        from_date = request.GET.get("from")
-        to_date = request.GET.get("to")
-
-        queryset = expenses.objects.all().order_by("date", "time")
-
-        if from_date and to_date:
-            queryset = queryset.filter(date__range=[from_date, to_date])
-
-        if not queryset.exists():
+        rows = user_rows(request, currency, start, end)
+        first = next(rows, None)
+        if first is None:
             return Response({"message": "No data available to export"}, status=404)
 
-        # Convert to DataFrame
-        data = [
-            {
-                "Date": str(i.date),
-                "Time": i.time.strftime("%H:%M:%S"),
-                "Type": i.expenses_type,
-                "Amount": i.amount,
-                "Note": i.note
-            }
-            for i in queryset
-        ]
+        filename = f"expenses_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        return export(chain([first], rows), currency, filename)
 
-        df = pd.DataFrame(data)
 
-        # Export to Excel
-        file_name = f"expenses_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        response = HttpResponse(
-            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
-        response["Content-Disposition"] = f'attachment; filename="{file_name}"'
-        df.to_excel(response, index=False)
-
-        return response
-    
-    
-class MonthlyExpensesAPI(APIView):
+# =========================
+# MONTHLY
+# =========================
+class MonthlyExpensesAPI(UserShardMixin, ReplicaReadMixin, APIView):
+    permission_classes = [IsAuthenticated]
+    throttle_cost = 10
 
     def get(self, request):
+        currency = requested_currency(request)
         month = request.GET.get("month")       # format YYYY-MM
         start = request.GET.get("from")
         end = request.GET.get("to")
@@ -180,42 +266,37 @@ class MonthlyExpensesAPI(APIView):
         # ----------------------------
         if month:
             try:
-                month_date = datetime.datetime.strptime(month, "%Y-%m").date()
-            except:
+                month_date = datetime.strptime(month, "%Y-%m").date()
+            except ValueError:
                 return Response({"error": "Invalid month format. Use YYYY-MM"}, status=400)
 
-            month_exp = expenses.objects.filter(
-                date__year=month_date.year,
-                date__month=month_date.month
-            ).order_by("date")
-
-            # Group by each day
-            daily_list = {}
-            for exp in month_exp:
-                day_key = exp.date.strftime("%Y-%m-%d")
-                if day_key not in daily_list:
-                    daily_list[day_key] = {
-                        "date": day_key,
-                        "total": 0,
-                        "items": []
-                    }
-
-                daily_list[day_key]["items"].append({
-                    "id": exp.id,
-                    "type": exp.expenses_type,
-                    "amount": float(exp.amount),
-                    "time": exp.time.strftime("%H:%M:%S"),
-                    "note": exp.note,
-                })
-
-                daily_list[day_key]["total"] += float(exp.amount)
-
-            total_month = sum(v["total"] for v in daily_list.values())
+            rows = user_rows(request, currency, *month_bounds(month_date.year, month_date.month))
+            days = [
+                {
+                    "date": day.isoformat(),
+                    "total": sum(item["amount"] for item in items),
+                    "items": items,
+                }
+                for day, items in (
+                    (day, [
+                        {
+                            "id": row["id"],
+                            "type": row["expenses_type"],
+                            "amount": float(row["converted"]),
+                            "time": row_time(row),
+                            "note": row["note"],
+                        }
+                        for row in day_rows
+                    ])
+                    for day, day_rows in groupby(rows, key=itemgetter("date"))
+                )
+            ]
 
             return Response({
                 "month": month,
-                "total_month_expense": total_month,
-                "days": list(daily_list.values())
+                "total_month_expense": sum(day["total"] for day in days),
+                "days": days,
+                "currency": currency,
             })
 
         # ----------------------------
@@ -223,85 +304,51 @@ class MonthlyExpensesAPI(APIView):
         # ----------------------------
         if start and end:
             try:
-                start_date = datetime.datetime.strptime(start, "%Y-%m-%d")
-                end_date = datetime.datetime.strptime(end, "%Y-%m-%d")
-            except:
+                start, end = parse_range(start, end)
+            except ValueError:
                 return Response({"error": "Invalid date format (YYYY-MM-DD)"}, status=400)
 
-            month_data = expenses.objects.filter(
-                date__range=[start_date, end_date]
-            ).annotate(month=TruncMonth("date")).values("month").annotate(
-                total=Sum("amount")
-            ).order_by("month")
-
+            months = by_period(period_totals(request, currency, "month", start, end), "month", "month")
             return Response({
                 "filtered": True,
-                "results": [
-                    {
-                        "month": m["month"].strftime("%Y-%m"),
-                        "total": float(m["total"])
-                    } for m in month_data
-                ]
+                "results": [{"month": m["month"], "total": m["total"]} for m in months],
+                "currency": currency,
             })
 
         # ----------------------------
         # 3️⃣  DEFAULT — SHOW ALL MONTH SUMMARY (WITH CATEGORY TOTALS)
         # ----------------------------
-        all_months = expenses.objects.annotate(
-            month=TruncMonth("date")
-        ).order_by("month")
-
-        summary_dict = {}
-
-        for exp in all_months:
-            month_key = exp.date.strftime("%Y-%m")
-    
-            if month_key not in summary_dict:
-                summary_dict[month_key] = {
-                    "month": month_key,
-                    "total": 0,
-                    "categories": {}
-                }
-    
-            # Add to total
-            summary_dict[month_key]["total"] += float(exp.amount)
-    
-            # Add to category
-            cat = exp.expenses_type
-            summary_dict[month_key]["categories"][cat] = summary_dict[month_key]["categories"].get(cat, 0) + float(exp.amount)
-
-        # Convert dict → list
-        response = list(summary_dict.values())
-
+        months = by_period(period_totals(request, currency, "month"), "month", "month")
         return Response({
             "message": "Monthly summary fetched",
-            "results": response
+            "results": [
+                {"month": m["month"], "total": m["total"], "categories": m["category_wise"]}
+                for m in months
+            ],
+            "currency": currency,
         })
 
-        
-class ExportMonthlyExpensesAPI(APIView):
-    def get(self, request):
-        start = request.GET.get("from")
-        end = request.GET.get("to")
 
-        qs = expenses.objects.all()
+class ExportMonthlyExpensesAPI(UserShardMixin, ReplicaReadMixin, APIView):
+    permission_classes = [IsAuthenticated]
+    throttle_cost = 50
 
-        if start and end:
-            qs = qs.filter(date__range=[start, end])
+    def get(self, request):
+        currency = requested_currency(request)
+        try:
+            start, end = parse_range(request.GET.get("from"), request.GET.get("to"))
+        except ValueError:
+            return Response({"error": "Invalid date format (YYYY-MM-DD)"}, status=400)
 
-        df = pd.DataFrame(list(qs.values()))
+        return export(user_rows(request, currency, start, end), currency, "monthly_expenses")
 
-        response = HttpResponse(content_type='application/ms-excel')
-        response['Content-Disposition'] = 'attachment; filename="monthly_expenses.xlsx"'
-        df.to_excel(response, index=False)
 
-        return response
-    
-    
 # ======================================================
 # 1️⃣ GET ALL YEARLY EXPENSE SUMMARY
 # ======================================================
-class YearlyExpensesAPI(APIView):
+class YearlyExpensesAPI(UserShardMixin, ReplicaReadMixin, APIView):
+    permission_classes = [IsAuthenticated]
+    throttle_cost = 10
 
     def get(self, request):
         """
@@ -313,46 +360,25 @@ class YearlyExpensesAPI(APIView):
                 "category_wise": {
                     "rent": 15000,
                     "travel": 11000,
-                    "shopping": 9000,
-                    "utilities": 8000,
-                    "entertainment": 9000
+                    ...
                 }
             }
         ]
         """
-        yearly_data = (
-            expenses.objects
-            .annotate(year=TruncYear("date"))
-            .values("year")
-            .annotate(total=Sum("amount"))
-            .order_by("year")
+        currency = requested_currency(request)
+        return Response(
+            by_period(period_totals(request, currency, "year"), "year", "year"),
+            status=status.HTTP_200_OK
         )
 
-        final_output = []
-
-        for y in yearly_data:
-            year_str = y["year"].year
-            category_wise = (
-                expenses.objects.filter(date__year=year_str)
-                .values("expenses_type")
-                .annotate(total=Sum("amount"))
-            )
-
-            final_output.append({
-                "year": str(year_str),
-                "total": y["total"],
-                "category_wise": {
-                    item["expenses_type"]: item["total"] for item in category_wise
-                }
-            })
-
-        return Response(final_output, status=status.HTTP_200_OK)
-
 
 # ======================================================
 # 2️⃣ GET SINGLE YEAR → MONTH WISE EXPENSES
 # ======================================================
-class SingleYearExpensesAPI(APIView):
+class SingleYearExpensesAPI(UserShardMixin, ReplicaReadMixin, APIView):
+    permission_classes = [IsAuthenticated]
+    throttle_cost = 5
+
     def get(self, request, year):
         """
         Output:
@@ -360,42 +386,18 @@ class SingleYearExpensesAPI(APIView):
             { "month": "2025-01", "total": 2200, category_wise: {...} }
         ]
         """
-
-        monthly_data = (
-            expenses.objects.filter(date__year=year)
-            .annotate(month=TruncMonth("date"))
-            .values("month")
-            .annotate(total=Sum("amount"))
-            .order_by("month")
-        )
-
-        output = []
-
-        for m in monthly_data:
-            month_str = m["month"].strftime("%Y-%m")
-
-            # get category wise for each month
-            category_wise = (
-                expenses.objects.filter(date__year=year, date__month=m["month"].month)
-                .values("expenses_type")
-                .annotate(total=Sum("amount"))
-            )
-
-            output.append({
-                "month": month_str,
-                "total": m["total"],
-                "category_wise": {
-                    item["expenses_type"]: item["total"] for item in category_wise
-                }
-            })
-
-        return Response(output, status=status.HTTP_200_OK)
+        currency = requested_currency(request)
+        rows = period_totals(request, currency, "month", *year_bounds(year))
+        return Response(by_period(rows, "month", "month"), status=status.HTTP_200_OK)
 
 
 # ======================================================
 # 3️⃣ GET SINGLE YEAR → SINGLE MONTH → DAILY DETAILS
 # ======================================================
-class SingleMonthDailyAPI(APIView):
+class SingleMonthDailyAPI(UserShardMixin, ReplicaReadMixin, APIView):
+    permission_classes = [IsAuthenticated]
+    throttle_cost = 3
+
     def get(self, request, year, month):
         """
         Output:
@@ -404,30 +406,31 @@ class SingleMonthDailyAPI(APIView):
                 "date": "2025-01-03",
                 "total": 300,
                 "details": [
-                    { "time": "14:10", "type": "shopping", "amount": 200, ... }
+                    { "time": "14:10:00", "expenses_type": "shopping", "amount": 200, ... }
                 ]
             }
         ]
         """
+        if not 1 <= month <= 12:
+            return Response({"error": "Invalid month"}, status=400)
 
-        daily = (
-            expenses.objects.filter(date__year=year, date__month=month)
-            .values("date")
-            .annotate(total=Sum("amount"))
-            .order_by("date")
-        )
-
+        currency = requested_currency(request)
         output = []
-
-        for d in daily:
-            details = expenses.objects.filter(date=d["date"]).values(
-                "time", "expenses_type", "amount", "note"
-            )
-
+        # one query for the whole month, split by day
+        for day, rows in groupby(user_rows(request, currency, *month_bounds(year, month)), key=itemgetter("date")):
+            details = [
+                {
+                    "time": row_time(row),
+                    "expenses_type": row["expenses_type"],
+                    "amount": float(row["converted"]),
+                    "note": row["note"],
+                }
+                for row in rows
+            ]
             output.append({
-                "date": d["date"].strftime("%Y-%m-%d"),
-                "total": d["total"],
-                "details": list(details)
+                "date": day.strftime("%Y-%m-%d"),
+                "total": sum(detail["amount"] for detail in details),
+                "details": details,
             })
 
         return Response(output, status=status.HTTP_200_OK)
@@ -436,14 +439,19 @@ class SingleMonthDailyAPI(APIView):
 # ======================================================
 # 4️⃣ EXPORT YEARLY + DATE RANGE EXPORT
 # ======================================================
-class ExportYearlyExpensesAPI(APIView):
+class ExportYearlyExpensesAPI(UserShardMixin, ReplicaReadMixin, APIView):
+    permission_classes = [IsAuthenticated]
+    throttle_cost = 50
 
     def get(self, request):
         """
         /export/yearly/?type=excel
         /export/yearly/?year=2025&type=csv
         /export/yearly/?start=2025-01-01&end=2025-01-31&type=excel
+
+        Old years are read from the archive as well.
         """
+        currency = requested_currency(request)
         export_type = request.GET.get("type", "excel")
         year = request.GET.get("year")
         start = request.GET.get("start")
@@ -451,21 +459,22 @@ class ExportYearlyExpensesAPI(APIView):
 
         # ---- export all ----
         if not year and not start:
-            records = expenses.objects.all().values()
-            return export_to_excel(records, "all_years.xlsx") if export_type == "excel" \
-                   else export_to_csv(records, "all_years.csv")
+            return export(user_rows(request, currency), currency, "all_years", export_type)
 
         # ---- export year wise ----
         if year:
-            records = expenses.objects.filter(date__year=year).values()
-            return export_to_excel(records, f"{year}.xlsx") if export_type == "excel" \
-                   else export_to_csv(records, f"{year}.csv")
+            if not year.isdigit():
+                return Response({"error": "Invalid year"}, status=400)
+            rows = user_rows(request, currency, *year_bounds(year))
+            return export(rows, currency, year, export_type)
 
         # ---- export date range ----
         if start and end:
-            records = expenses.objects.filter(date__range=[start, end]).values()
-            filename = f"{start}_to_{end}"
-            return export_to_excel(records, f"{filename}.xlsx") if export_type == "excel" \
-                   else export_to_csv(records, f"{filename}.csv")
+            try:
+                start, end = parse_range(start, end)
+            except ValueError:
+                return Response({"error": "Invalid date format (YYYY-MM-DD)"}, status=400)
+            rows = user_rows(request, currency, start, end)
+            return export(rows, currency, f"{start}_to_{end}", export_type)
 
-        return Response({"error": "Invalid parameters"}, status=400)
\ No newline at end of file
+        return Response({"error": "Invalid parameters"}, status=400)
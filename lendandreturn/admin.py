@@ -1,3 +1,29 @@
 from django.contrib import admin
 
-# Register your models here.
+from ExpensesTracker.sharding import on_shard, shard_for
+from expenses.admin import CurrencyAdminForm, SyncedModelAdmin
+
+from .counterparties import resolve_counterparty
+from .models import LendReturn
+
+
+@admin.register(LendReturn)
+class LendReturnAdmin(SyncedModelAdmin):
+    form = CurrencyAdminForm
+    list_display = ("id", "user", "counterparty", "person_name", "transaction_type", "amount", "currency", "date")
+    list_select_related = ("user", "counterparty")
+    list_filter = ("transaction_type", "currency")
+    date_hierarchy = "date"
+    raw_id_fields = ("user",)
+    # resolved from person_name on save, like the API does
+    readonly_fields = ("counterparty", "created_at")
+    # an email matches the owner (see ShardedModelAdmin)
+    search_fields = ("=id",)
+    ordering = ("-date", "-id")
+
+    actions = ["delete_selected_set_based"]
+
+    def save_model(self, request, obj, form, change):
+        with on_shard(shard_for(obj.user_id)):
+            obj.counterparty = resolve_counterparty(obj.user, obj.person_name)
+            super().save_model(request, obj, form, change)
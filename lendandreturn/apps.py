@@ -1,6 +1,19 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def install_fulltext(sender, using, **kwargs):
+    from django.db import connections, router
+    from ExpensesTracker.fulltext import install
+
+    model = sender.get_model("LendReturn")
+    if router.allow_migrate_model(using, model):
+        install(connections[using], model._meta.db_table, "note")
 
 
 class LendandreturnConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'lendandreturn'
+
+    def ready(self):
+        post_migrate.connect(install_fulltext, sender=self)
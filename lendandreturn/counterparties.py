@@ -0,0 +1,142 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.db import IntegrityError
+from sortedcontainers import SortedList
+
+from ExpensesTracker import sharding
+from expenses import sync
+
+from .models import Counterparty, CounterpartyAlias, LendReturn, normalize_name
+
+
+# =========================
+# RESOLUTION
+# =========================
+def find_counterparty(user, name):
+    alias = (
+        CounterpartyAlias.objects
+        .filter(user=user, normalized_alias=normalize_name(name))
+        .select_related("counterparty")
+        .first()
+    )
+    return alias.counterparty if alias else None
+
+
+def resolve_counterparty(user, name):
+    """
+    Return the counterparty ``name`` refers to for ``user``, creating it
+    (with the name as its first alias) when the spelling is new.
+    """
+    counterparty = find_counterparty(user, name)
+    if counterparty:
+        return counterparty
+
+    key = normalize_name(name)
+    try:
+        with sharding.atomic():
+            counterparty = Counterparty.objects.create(
+                user=user, name=" ".join(name.split()), normalized_key=key
+            )
+            CounterpartyAlias.objects.create(
+                user=user, counterparty=counterparty,
+                alias=counterparty.name, normalized_alias=key
+            )
+    except IntegrityError:
+        # a concurrent request created it first
+        return find_counterparty(user, name)
+
+    invalidate_index(user.pk)
+    return counterparty
+
+
+def merge_counterparties(target, sources):
+    """
+    Fold ``sources`` into ``target``: their aliases and transactions move
+    over, so every old spelling resolves to the target from now on.
+    """
+    source_ids = [c.pk for c in sources if c.pk != target.pk]
+    with sharding.atomic():
+        CounterpartyAlias.objects.filter(counterparty_id__in=source_ids).update(counterparty=target)
+        moved = LendReturn.objects.filter(counterparty_id__in=source_ids)
+        sync.restamp(moved)
+        moved.update(counterparty=target)
+        Counterparty.objects.filter(pk__in=source_ids).delete()
+    invalidate_index(target.user_id)
+
+
+# =========================
+# AUTOCOMPLETE INDEX
+# =========================
+# Per-process, per-user SortedList of (normalized alias, counterparty id,
+# display name). Prefix lookups are a bisect plus a short slice. A version
+# counter in the shared cache tells other workers when to rebuild; a
+# counter that is missing (or was evicted) restarts from the clock, so no
+# index built before can match it.
+MAX_INDEXED_USERS = 1000
+
+_indexes = OrderedDict()
+_lock = threading.Lock()
+
+
+def _version_key(user_id):
+    return f"counterparty-index:{user_id}"
+
+
+def invalidate_index(user_id):
+    try:
+        cache.incr(_version_key(user_id))
+    except ValueError:
+        cache.add(_version_key(user_id), time.time_ns(), timeout=None)
+
+
+def _index_version(user_id):
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        cache.add(_version_key(user_id), time.time_ns(), timeout=None)
+        version = cache.get(_version_key(user_id))
+    return version
+
+
+def _build_index(user_id):
+    rows = (
+        CounterpartyAlias.objects
+        .filter(user_id=user_id)
+        .values_list("normalized_alias", "counterparty_id", "counterparty__name")
+    )
+    return SortedList(rows)
+
+
+def get_index(user_id):
+    version = _index_version(user_id)
+    with _lock:
+        entry = _indexes.get(user_id)
+        if entry and entry[0] == version:
+            _indexes.move_to_end(user_id)
+            return entry[1]
+
+    index = _build_index(user_id)
+    with _lock:
+        _indexes[user_id] = (version, index)
+        _indexes.move_to_end(user_id)
+        while len(_indexes) > MAX_INDEXED_USERS:
+            _indexes.popitem(last=False)
+    return index
+
+
+def autocomplete(user_id, prefix, limit=10):
+    prefix = normalize_name(prefix)
+    index = get_index(user_id)
+
+    results = []
+    seen = set()
+    for key, counterparty_id, name in index.irange((prefix,), (prefix + "\uffff",)):
+        if counterparty_id in seen:
+            continue
+        seen.add(counterparty_id)
+        results.append({"id": counterparty_id, "name": name, "matched": key})
+        if len(results) >= limit:
+            break
+    return results
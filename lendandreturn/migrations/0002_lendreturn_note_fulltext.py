@@ -0,0 +1,16 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:35
+
+from django.db import migrations
+
+from ExpensesTracker.fulltext import install_operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lendandreturn', '0001_initial'),
+    ]
+
+    operations = [
+        install_operation('lendandreturn_lendreturn', 'note'),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_counterparties(apps, schema_editor):
+    LendReturn = apps.get_model('lendandreturn', 'LendReturn')
+    Counterparty = apps.get_model('lendandreturn', 'Counterparty')
+    CounterpartyAlias = apps.get_model('lendandreturn', 'CounterpartyAlias')
+    # the database being migrated, not the router's pick (shards)
+    db = schema_editor.connection.alias
+
+    created = {}
+    pairs = LendReturn.objects.using(db).values_list('user_id', 'person_name').distinct().order_by()
+    for user_id, person_name in pairs.iterator():
+        display = ' '.join(person_name.split())
+        key = display.casefold()
+
+        counterparty = created.get((user_id, key))
+        if counterparty is None:
+            counterparty = Counterparty.objects.using(db).create(
+                user_id=user_id, name=display, normalized_key=key
+            )
+            CounterpartyAlias.objects.using(db).create(
+                user_id=user_id, counterparty=counterparty,
+                alias=display, normalized_alias=key
+            )
+            created[(user_id, key)] = counterparty
+
+        LendReturn.objects.using(db).filter(
+            user_id=user_id, person_name=person_name
+        ).update(counterparty=counterparty)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lendandreturn', '0002_lendreturn_note_fulltext'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CounterpartyAlias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('alias', models.CharField(max_length=100)),
+                ('normalized_alias', models.CharField(max_length=100)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Counterparty',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('normalized_key', models.CharField(max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='counterparties', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='lendreturn',
+            name='counterparty',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='transactions', to='lendandreturn.counterparty'),
+        ),
+        migrations.AddIndex(
+            model_name='lendreturn',
+            index=models.Index(fields=['counterparty', 'date'], name='lendandreturn_cp_date_idx'),
+        ),
+        migrations.AddField(
+            model_name='counterpartyalias',
+            name='counterparty',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aliases', to='lendandreturn.counterparty'),
+        ),
+        migrations.AddField(
+            model_name='counterpartyalias',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='counterparty_aliases', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='counterparty',
+            constraint=models.UniqueConstraint(fields=('user', 'normalized_key'), name='lendandreturn_counterparty_unique_key'),
+        ),
+        migrations.AddConstraint(
+            model_name='counterpartyalias',
+            constraint=models.UniqueConstraint(fields=('user', 'normalized_alias'), name='lendandreturn_alias_unique_key'),
+        ),
+        migrations.RunPython(backfill_counterparties, migrations.RunPython.noop),
+    ]
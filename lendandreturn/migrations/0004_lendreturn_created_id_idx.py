@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lendandreturn', '0003_counterparty'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lendreturn',
+            index=models.Index(fields=['created_at', 'id'], name='lendandreturn_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:46
+
+import expenses.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lendandreturn', '0004_lendreturn_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lendreturn',
+            name='currency',
+            field=models.CharField(default=expenses.models.default_currency, max_length=3),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-19 14:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lendandreturn', '0007_user_fk_across_shards'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lendreturn',
+            name='sync_seq',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='lendreturn',
+            index=models.Index(fields=['user', 'sync_seq', 'id'], name='lendandreturn_user_sync_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+from django.db import migrations
+
+
+def link_missing_counterparties(apps, schema_editor):
+    # Rows saved without a counterparty (admin edits, or databases where
+    # 0003 ran before it used the migrated database) are linked to the
+    # counterparty their name resolves to, created when new.
+    LendReturn = apps.get_model('lendandreturn', 'LendReturn')
+    Counterparty = apps.get_model('lendandreturn', 'Counterparty')
+    CounterpartyAlias = apps.get_model('lendandreturn', 'CounterpartyAlias')
+    db = schema_editor.connection.alias
+
+    missing = LendReturn.objects.using(db).filter(counterparty__isnull=True)
+    pairs = missing.values_list('user_id', 'person_name').distinct().order_by()
+    for user_id, person_name in pairs.iterator():
+        display = ' '.join(person_name.split())
+        key = display.casefold()
+
+        alias = CounterpartyAlias.objects.using(db).filter(user_id=user_id, normalized_alias=key).first()
+        counterparty = (
+            alias.counterparty if alias
+            else Counterparty.objects.using(db).filter(user_id=user_id, normalized_key=key).first()
+        )
+        if counterparty is None:
+            counterparty = Counterparty.objects.using(db).create(
+                user_id=user_id, name=display, normalized_key=key
+            )
+        if alias is None:
+            CounterpartyAlias.objects.using(db).get_or_create(
+                user_id=user_id, normalized_alias=key,
+                defaults={'counterparty': counterparty, 'alias': display},
+            )
+
+        missing.filter(user_id=user_id, person_name=person_name).update(counterparty=counterparty)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lendandreturn', '0008_lendreturn_sync_seq'),
+    ]
+
+    operations = [
+        migrations.RunPython(link_missing_counterparties, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.conf import settings
 
+from expenses.models import default_currency
+
 
 class TransactionType(models.TextChoices):
     GIVEN = "given", "Money Given"
@@ -9,26 +11,118 @@ class TransactionType(models.TextChoices):
     RETURNED = "returned", "Money Returned"
 
 
+def normalize_name(name):
+    # "  Ravi   K " and "ravi k" are the same person
+    return " ".join((name or "").split()).casefold()
+
+
+class Counterparty(models.Model):
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        # users exist on the default database only (see ExpensesTracker.sharding)
+        db_constraint=False,
+        related_name="counterparties"
+    )
+
+    name = models.CharField(max_length=100)
+    normalized_key = models.CharField(max_length=100)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "normalized_key"],
+                name="lendandreturn_counterparty_unique_key",
+            ),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class CounterpartyAlias(models.Model):
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_constraint=False,
+        related_name="counterparty_aliases"
+    )
+
+    counterparty = models.ForeignKey(
+        Counterparty,
+        on_delete=models.CASCADE,
+        related_name="aliases"
+    )
+
+    alias = models.CharField(max_length=100)
+    normalized_alias = models.CharField(max_length=100)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "normalized_alias"],
+                name="lendandreturn_alias_unique_key",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.alias} -> {self.counterparty_id}"
+
+
 class LendReturn(models.Model):
 
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        db_constraint=False,
         related_name="lend_returns"
     )
 
     person_name = models.CharField(max_length=100)
 
+    counterparty = models.ForeignKey(
+        Counterparty,
+        on_delete=models.PROTECT,
+        related_name="transactions",
+        null=True,
+        blank=True
+    )
+
     transaction_type = models.CharField(
         max_length=20,
         choices=TransactionType.choices
     )
 
     amount = models.DecimalField(max_digits=10, decimal_places=2)
+    # ISO 4217 code of amount
+    currency = models.CharField(max_length=3, default=default_currency)
     date = models.DateField()
     note = models.TextField(blank=True, null=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
+    # the user's change sequence number of the last write (expenses.sync)
+    sync_seq = models.BigIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["counterparty", "date"],
+                name="lendandreturn_cp_date_idx",
+            ),
+            # keyset scans of newly inserted rows (analytics offload)
+            models.Index(
+                fields=["created_at", "id"],
+                name="lendandreturn_created_id_idx",
+            ),
+            # admin date_hierarchy and cross-user date ranges
+            models.Index(fields=["date"], name="lendandreturn_date_idx"),
+            # changes feed: a user's rows written after a cursor
+            models.Index(fields=["user", "sync_seq", "id"], name="lendandreturn_user_sync_idx"),
+        ]
 
     def __str__(self):
-        return f"{self.person_name} - {self.transaction_type} - ₹{self.amount}"
+        return f"{self.person_name} - {self.transaction_type} - {self.amount} {self.currency}"
@@ -1,8 +1,17 @@
 from rest_framework import serializers
+
+from ExpensesTracker.fieldsets import SparseFieldsMixin
+from expenses.currency import validate_currency
+
 from .models import LendReturn
 
 
-class LendReturnSerializer(serializers.ModelSerializer):
+class LendReturnSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = LendReturn
         fields = "__all__"
+        # a row stays with its owner (and on the owner's shard)
+        read_only_fields = ["user", "counterparty", "sync_seq"]
+
+    def validate_currency(self, value):
+        return validate_currency(value)
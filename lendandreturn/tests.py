@@ -1,3 +1,248 @@
+from datetime import date
+from importlib import import_module
+from types import SimpleNamespace
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from ExpensesTracker.sharding import on_shard, shard_for
+from login.models import User
+
+from .counterparties import _version_key, autocomplete, invalidate_index
+from .models import Counterparty, CounterpartyAlias, LendReturn
+
+# more than one with ExpensesTracker.settings_test
+SHARDS = set(settings.DATABASE_SHARDS)
+
+
+def make_user(n):
+    return User.objects.create_user(email=f"u{n}@x.com", phone=str(n), password=None, name="U")
+
+
+def run_migration(name, function, alias):
+    module = import_module(f"lendandreturn.migrations.{name}")
+    getattr(module, function)(apps, SimpleNamespace(connection=connections[alias]))
+
+
+# =========================
+# MIGRATIONS
+# =========================
+class CounterpartyMigrationTests(TestCase):
+    databases = SHARDS
+
+    def setUp(self):
+        cache.clear()
+
+    def add_rows(self, user, names):
+        with on_shard(shard_for(user.pk)):
+            for name in names:
+                LendReturn.objects.create(
+                    user=user, person_name=name, transaction_type="given", amount=1, date=date(2026, 3, 1)
+                )
+
+    def test_backfill_merges_spellings_of_one_name(self):
+        users = [make_user(n) for n in range(1, 6)]
+        for user in users:
+            self.add_rows(user, ["Ravi", "ravi ", "Ravi  ", "Ravi K"])
+
+        for alias in SHARDS:
+            run_migration("0003_counterparty", "backfill_counterparties", alias)
+
+        for user in users:
+            with on_shard(shard_for(user.pk)):
+                self.assertEqual(
+                    dict(Counterparty.objects.filter(user=user).values_list("normalized_key", "name")),
+                    {"ravi": "Ravi", "ravi k": "Ravi K"},
+                )
+                linked = dict(LendReturn.objects.filter(user=user).values_list("person_name", "counterparty"))
+                self.assertEqual(linked["Ravi"], linked["ravi "])
+                self.assertNotEqual(linked["Ravi"], linked["Ravi K"])
+
+    def test_unlinked_rows_are_linked_on_their_own_database(self):
+        users = [make_user(n) for n in range(1, 6)]
+        for user in users:
+            self.add_rows(user, ["Ravi", "ravi ", "Ravi K"])
+
+        for alias in SHARDS:
+            run_migration("0009_link_missing_counterparties", "link_missing_counterparties", alias)
+        # a second run finds nothing left to link
+        for alias in SHARDS:
+            run_migration("0009_link_missing_counterparties", "link_missing_counterparties", alias)
+
+        for user in users:
+            with on_shard(shard_for(user.pk)):
+                linked = dict(LendReturn.objects.filter(user=user).values_list("person_name", "counterparty"))
+                self.assertEqual(linked["Ravi"], linked["ravi "])
+                self.assertNotEqual(linked["Ravi"], linked["Ravi K"])
+                self.assertEqual(
+                    set(Counterparty.objects.filter(user=user).values_list("normalized_key", flat=True)),
+                    {"ravi", "ravi k"},
+                )
+
+
+# =========================
+# COUNTERPARTIES
+# =========================
+class CounterpartyTests(TestCase):
+    databases = SHARDS
+
+    def setUp(self):
+        cache.clear()
+        self.user = make_user(1)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add(self, person_name, amount=10, transaction_type="given"):
+        response = self.client.post(
+            "/lendandreturn/lend-return/add/",
+            {"person_name": person_name, "transaction_type": transaction_type,
+             "amount": str(amount), "date": "2026-03-01"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+
+    def suggest(self, q):
+        response = self.client.get("/lendandreturn/lend-return/counterparties/autocomplete/", {"q": q})
+        return [row["name"] for row in response.data["results"]]
+
+    def summary(self):
+        response = self.client.get("/lendandreturn/lend-return/summary/given-received/")
+        return {row["person_name"]: row["given"] for row in response.data}
+
+    def counterparty(self, name):
+        with on_shard(shard_for(self.user.pk)):
+            return Counterparty.objects.get(user=self.user, normalized_key=name.casefold())
+
+    def test_spellings_resolve_to_one_counterparty(self):
+        self.add("Ravi Kumar")
+        self.add("  ravi   KUMAR ", amount=5)
+        self.add("Rahul")
+
+        self.assertEqual(self.summary(), {"Ravi Kumar": 15.0, "Rahul": 10.0})
+
+    def test_autocomplete_matches_prefixes(self):
+        self.add("Ravi Kumar")
+        self.add("Rahul")
+        self.add("Sita")
+
+        self.assertEqual(sorted(self.suggest("ra")), ["Rahul", "Ravi Kumar"])
+        self.assertEqual(self.suggest("RAV"), ["Ravi Kumar"])
+        self.assertEqual(self.suggest("x"), [])
+
+        # a new name shows up without waiting for the index
+        self.add("Ramesh")
+        self.assertEqual(sorted(self.suggest("ra")), ["Rahul", "Ramesh", "Ravi Kumar"])
+
+    def matched(self, prefix):
+        with on_shard(shard_for(self.user.pk)):
+            return [row["matched"] for row in autocomplete(self.user.pk, prefix)]
+
+    def test_an_evicted_index_version_rebuilds(self):
+        self.add("Ravi")
+        cache.delete(_version_key(self.user.pk))
+        self.assertEqual(self.matched("r"), ["ravi"])
+
+        with on_shard(shard_for(self.user.pk)):
+            CounterpartyAlias.objects.create(
+                user=self.user, counterparty=self.counterparty("Ravi"), alias="Rav", normalized_alias="rav"
+            )
+        invalidate_index(self.user.pk)
+        # evicted before this process looks again
+        cache.delete(_version_key(self.user.pk))
+
+        self.assertEqual(self.matched("r"), ["rav"])
+
+    def test_merge_folds_names_and_history(self):
+        self.add("Ravi Kumar")
+        self.add("R. Kumar", amount=5)
+        target, source = self.counterparty("Ravi Kumar"), self.counterparty("R. Kumar")
+
+        response = self.client.post(
+            f"/lendandreturn/lend-return/counterparties/{target.id}/merge/",
+            {"merge_ids": [source.id]}, format="json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.summary(), {"Ravi Kumar": 15.0})
+        # the old spelling now resolves to the target
+        self.add("r. kumar", amount=1)
+        self.assertEqual(self.summary(), {"Ravi Kumar": 16.0})
+        self.assertEqual(self.suggest("r."), ["Ravi Kumar"])
+        history = self.client.get("/lendandreturn/lend-return/person/R. Kumar/")
+        self.assertEqual(len(history.data["history"]), 3)
+
+    def test_merge_rejects_other_users_counterparties(self):
+        self.add("Ravi")
+        other = APIClient()
+        other.force_authenticate(make_user(2))
+
+        response = other.post(
+            f"/lendandreturn/lend-return/counterparties/{self.counterparty('Ravi').id}/merge/",
+            {"merge_ids": [1]}, format="json",
+        )
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_admin_rows_get_a_counterparty(self):
+        self.add("Ravi Kumar")
+        admin = APIClient()
+        admin.force_login(User.objects.create_superuser(email="admin@x.com", password=None, phone="0"))
+
+        response = admin.post("/admin/lendandreturn/lendreturn/add/", {
+            "user": self.user.pk, "person_name": "ravi kumar", "transaction_type": "given",
+            "amount": "7", "currency": "INR", "date": "2026-03-02", "note": "admin",
+        })
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.summary(), {"Ravi Kumar": 17.0})
+        history = self.client.get("/lendandreturn/lend-return/person/Ravi Kumar/")
+        self.assertEqual(len(history.data["history"]), 2)
+
+    def test_admin_rejects_unknown_currencies(self):
+        admin = APIClient()
+        admin.force_login(User.objects.create_superuser(email="admin@x.com", password=None, phone="0"))
+
+        response = admin.post("/admin/lendandreturn/lendreturn/add/", {
+            "user": self.user.pk, "person_name": "Ravi", "transaction_type": "given",
+            "amount": "7", "currency": "XYZ", "date": "2026-03-02", "note": "admin",
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("No exchange rates loaded for XYZ", response.content.decode())
+        self.assertEqual(self.summary(), {})
+
+
+# =========================
+# SEARCH
+# =========================
+class LendReturnSearchTests(TestCase):
+    databases = SHARDS
+
+    def setUp(self):
+        cache.clear()
+        self.user = make_user(1)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        with on_shard(shard_for(self.user.pk)):
+            for day, amount in ((date(2026, 3, 1), 1), (date(2026, 4, 1), 2)):
+                LendReturn.objects.create(
+                    user=self.user, person_name="Ravi", transaction_type="given",
+                    amount=amount, date=day, note="cab fare",
+                )
+
+    def search(self, **params):
+        return self.client.get("/lendandreturn/lend-return/search/", {"q": "cab", **params})
+
+    def test_date_range_filters_hits(self):
+        response = self.search(start_date="2026-04-01")
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual([row["amount"] for row in response.data["results"]], ["2.00"])
 
-# Create your tests here.
+    def test_bad_paging_and_dates_are_rejected(self):
+        for params in ({"limit": 0}, {"offset": -1}, {"end_date": "2026-02-30"}, {"start_date": "x"}):
+            self.assertEqual(self.search(**params).status_code, 400, params)
@@ -4,7 +4,10 @@ from .views import (
     GivenReceivedSummaryAPI,
     BorrowedReturnedSummaryAPI,
     PersonFullHistoryAPI,
-    LendReturnTotalsAPI
+    LendReturnTotalsAPI,
+    LendReturnSearchAPI,
+    CounterpartyAutocompleteAPI,
+    CounterpartyMergeAPI,
 )
 
 urlpatterns = [
@@ -24,4 +27,13 @@ urlpatterns = [
         LendReturnTotalsAPI.as_view(),
         name="lend-return-totals"
     ),
+
+    path("lend-return/search/",
+         LendReturnSearchAPI.as_view()),
+
+    path("lend-return/counterparties/autocomplete/",
+         CounterpartyAutocompleteAPI.as_view()),
+
+    path("lend-return/counterparties/<int:id>/merge/",
+         CounterpartyMergeAPI.as_view()),
 ]
@@ -3,9 +3,24 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 
-from django.db.models import Sum
-
-from .models import LendReturn, TransactionType
+from django.conf import settings
+from django.db.models import Q, Sum
+
+from ExpensesTracker.db_routing import ReplicaReadMixin, pin_to_primary
+from ExpensesTracker.events import publish_to_user
+from ExpensesTracker import fulltext, sharding
+from ExpensesTracker.fieldsets import project, requested_fields
+from ExpensesTracker.sharding import UserShardMixin
+from expenses import sync
+from expenses.currency import base_amount, converted_amount, requested_currency
+
+from .counterparties import (
+    autocomplete,
+    find_counterparty,
+    merge_counterparties,
+    resolve_counterparty,
+)
+from .models import Counterparty, LendReturn, TransactionType
 from .serializers import LendReturnSerializer
 
 
@@ -13,21 +28,39 @@ from .serializers import LendReturnSerializer
 # COMMON HELPER
 # =========================
 def get_user_queryset(request):
-    if request.user.is_staff or request.user.is_superuser:
-        return LendReturn.objects.all()
-    return LendReturn.objects.filter(user=request.user)
+    return sharding.user_queryset(request, LendReturn)
 
 
 # =========================
 # CREATE TRANSACTION
 # =========================
-class LendReturnCreateAPI(APIView):
+class LendReturnCreateAPI(UserShardMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
         serializer = LendReturnSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save(user=request.user)  # 🔐 bind user
+            counterparty = resolve_counterparty(
+                request.user, serializer.validated_data["person_name"]
+            )
+            with sharding.atomic():
+                lend = serializer.save(
+                    user=request.user,
+                    counterparty=counterparty,
+                    sync_seq=sync.next_seq(request.user.pk),
+                )  # 🔐 bind user
+            pin_to_primary(request.user)
+            # the new row as a delta on the given/received totals
+            publish_to_user(lend.user_id, "lend_return", {
+                "action": "created",
+                "id": lend.id,
+                "counterparty_id": counterparty.id,
+                "person_name": counterparty.name,
+                "transaction_type": lend.transaction_type,
+                "date": lend.date,
+                "currency": settings.BASE_CURRENCY,
+                "amount": base_amount(lend),
+            })
             return Response(
                 {"message": "Transaction added successfully"},
                 status=status.HTTP_201_CREATED
@@ -38,39 +71,38 @@ class LendReturnCreateAPI(APIView):
 # =========================
 # GIVEN / RECEIVED SUMMARY
 # =========================
-class GivenReceivedSummaryAPI(APIView):
+class GivenReceivedSummaryAPI(UserShardMixin, ReplicaReadMixin, APIView):
     permission_classes = [IsAuthenticated]
+    throttle_cost = 3
 
     def get(self, request):
         qs = get_user_queryset(request)
+        currency = requested_currency(request)
+        amount = converted_amount(currency)
+
+        # one grouped query over normalized counterparties
+        persons = qs.values(
+            "counterparty_id", "counterparty__name"
+        ).annotate(
+            given=Sum(amount, filter=Q(transaction_type=TransactionType.GIVEN)),
+            received=Sum(amount, filter=Q(transaction_type=TransactionType.RECEIVED)),
+        ).order_by("counterparty__name")
 
-        persons = qs.values_list("person_name", flat=True).distinct()
         result = []
 
         for person in persons:
-            records = qs.filter(
-                person_name=person,
-                transaction_type__in=[
-                    TransactionType.GIVEN,
-                    TransactionType.RECEIVED
-                ]
-            )
-
-            given = records.filter(
-                transaction_type=TransactionType.GIVEN
-            ).aggregate(total=Sum("amount"))["total"] or 0
-
-            received = records.filter(
-                transaction_type=TransactionType.RECEIVED
-            ).aggregate(total=Sum("amount"))["total"] or 0
+            given = person["given"] or 0
+            received = person["received"] or 0
 
             balance = float(given) - float(received)
 
             result.append({
-                "person_name": person,
+                "person_name": person["counterparty__name"],
+                "counterparty_id": person["counterparty_id"],
                 "given": float(given),
                 "received": float(received),
                 "balance": balance,
+                "currency": currency,
                 "status": (
                     "you will get"
                     if balance > 0 else
@@ -86,39 +118,37 @@ class GivenReceivedSummaryAPI(APIView):
 # =========================
 # BORROWED / RETURNED SUMMARY
 # =========================
-class BorrowedReturnedSummaryAPI(APIView):
+class BorrowedReturnedSummaryAPI(UserShardMixin, ReplicaReadMixin, APIView):
     permission_classes = [IsAuthenticated]
+    throttle_cost = 3
 
     def get(self, request):
         qs = get_user_queryset(request)
+        currency = requested_currency(request)
+        amount = converted_amount(currency)
+
+        persons = qs.values(
+            "counterparty_id", "counterparty__name"
+        ).annotate(
+            borrowed=Sum(amount, filter=Q(transaction_type=TransactionType.BORROWED)),
+            returned=Sum(amount, filter=Q(transaction_type=TransactionType.RETURNED)),
+        ).order_by("counterparty__name")
 
-        persons = qs.values_list("person_name", flat=True).distinct()
         result = []
 
         for person in persons:
-            records = qs.filter(
-                person_name=person,
-                transaction_type__in=[
-                    TransactionType.BORROWED,
-                    TransactionType.RETURNED
-                ]
-            )
-
-            borrowed = records.filter(
-                transaction_type=TransactionType.BORROWED
-            ).aggregate(total=Sum("amount"))["total"] or 0
-
-            returned = records.filter(
-                transaction_type=TransactionType.RETURNED
-            ).aggregate(total=Sum("amount"))["total"] or 0
+            borrowed = person["borrowed"] or 0
+            returned = person["returned"] or 0
 
             balance = float(returned) - float(borrowed)
 
             result.append({
-                "person_name": person,
+                "person_name": person["counterparty__name"],
+                "counterparty_id": person["counterparty_id"],
                 "borrowed": float(borrowed),
                 "returned": float(returned),
                 "balance": balance,
+                "currency": currency,
                 "status": (
                     "you need to pay"
                     if balance < 0 else
@@ -134,32 +164,42 @@ class BorrowedReturnedSummaryAPI(APIView):
 # =========================
 # PERSON FULL HISTORY
 # =========================
-class PersonFullHistoryAPI(APIView):
+class PersonFullHistoryAPI(UserShardMixin, ReplicaReadMixin, APIView):
     permission_classes = [IsAuthenticated]
+    throttle_cost = 3
 
     def get(self, request, person_name):
-        qs = get_user_queryset(request)
-
-        records = qs.filter(
-            person_name=person_name
-        ).order_by("date")
-
-        serializer = LendReturnSerializer(records, many=True)
+        fields = requested_fields(request, LendReturnSerializer)
+        # the totals below read every row's type
+        qs = project(get_user_queryset(request), LendReturnSerializer, fields, "transaction_type")
+        currency = requested_currency(request)
+
+        counterparty = find_counterparty(request.user, person_name)
+        if counterparty:
+            person_name = counterparty.name
+            records = qs.filter(counterparty=counterparty)
+        else:
+            # staff looking up another user's spelling
+            records = qs.filter(person_name=person_name)
+        records = records.annotate(converted=converted_amount(currency)).order_by("date")
+
+        serializer = LendReturnSerializer(records, many=True, fields=fields)
 
         given = received = borrowed = returned = 0
 
         for r in records:
             if r.transaction_type == TransactionType.GIVEN:
-                given += float(r.amount)
+                given += float(r.converted)
             elif r.transaction_type == TransactionType.RECEIVED:
-                received += float(r.amount)
+                received += float(r.converted)
             elif r.transaction_type == TransactionType.BORROWED:
-                borrowed += float(r.amount)
+                borrowed += float(r.converted)
             elif r.transaction_type == TransactionType.RETURNED:
-                returned += float(r.amount)
+                returned += float(r.converted)
 
         response = {
             "person_name": person_name,
+            "currency": currency,
             "lend_summary": {
                 "given": given,
                 "received": received,
@@ -179,27 +219,27 @@ class PersonFullHistoryAPI(APIView):
 # =========================
 # TOTALS DASHBOARD
 # =========================
-class LendReturnTotalsAPI(APIView):
+class LendReturnTotalsAPI(UserShardMixin, ReplicaReadMixin, APIView):
     permission_classes = [IsAuthenticated]
+    throttle_cost = 2
 
     def get(self, request):
         qs = get_user_queryset(request)
 
-        total_given = qs.filter(
-            transaction_type=TransactionType.GIVEN
-        ).aggregate(total=Sum("amount"))["total"] or 0
-
-        total_received = qs.filter(
-            transaction_type=TransactionType.RECEIVED
-        ).aggregate(total=Sum("amount"))["total"] or 0
-
-        total_borrowed = qs.filter(
-            transaction_type=TransactionType.BORROWED
-        ).aggregate(total=Sum("amount"))["total"] or 0
-
-        total_returned = qs.filter(
-            transaction_type=TransactionType.RETURNED
-        ).aggregate(total=Sum("amount"))["total"] or 0
+        currency = requested_currency(request)
+        amount = converted_amount(currency)
+
+        # one pass over the user's rows instead of one query per type
+        totals = qs.aggregate(
+            given=Sum(amount, filter=Q(transaction_type=TransactionType.GIVEN)),
+            received=Sum(amount, filter=Q(transaction_type=TransactionType.RECEIVED)),
+            borrowed=Sum(amount, filter=Q(transaction_type=TransactionType.BORROWED)),
+            returned=Sum(amount, filter=Q(transaction_type=TransactionType.RETURNED)),
+        )
+        total_given = totals["given"] or 0
+        total_received = totals["received"] or 0
+        total_borrowed = totals["borrowed"] or 0
+        total_returned = totals["returned"] or 0
 
         return Response({
             "totals": {
@@ -207,5 +247,101 @@ class LendReturnTotalsAPI(APIView):
                 "received": float(total_received),
                 "borrowed": float(total_borrowed),
                 "returned": float(total_returned)
-            }
+            },
+            "currency": currency
         })
+
+
+# =========================
+# SEARCH NOTES
+# =========================
+class LendReturnSearchAPI(UserShardMixin, ReplicaReadMixin, APIView):
+    permission_classes = [IsAuthenticated]
+    throttle_cost = 5
+
+    def get(self, request):
+        query = request.query_params.get("q", "")
+        if not fulltext.terms(query):
+            return Response(
+                {"error": "q is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            limit, offset, date_range = fulltext.search_params(request.query_params)
+        except ValueError as error:
+            return Response(
+                {"error": str(error)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        filters = {}
+        if not (request.user.is_staff or request.user.is_superuser):
+            filters["user_id"] = request.user.id
+        if request.query_params.get("transaction_type"):
+            filters["transaction_type"] = request.query_params["transaction_type"]
+
+        hits = fulltext.search_all(
+            LendReturn, "note", query,
+            databases=sharding.read_databases(request, LendReturn),
+            filters=filters,
+            date_range=date_range,
+            prefix=request.query_params.get("prefix", "true") != "false",
+            limit=limit,
+            offset=offset,
+        )
+
+        fields = requested_fields(request, LendReturnSerializer)
+        records = fulltext.ranked_objects(
+            project(get_user_queryset(request), LendReturnSerializer, fields), hits
+        )
+        results = LendReturnSerializer(records, many=True, fields=fields).data
+        for row, record in zip(results, records):
+            row["rank"] = record.rank
+
+        return Response({"results": results, "count": len(results)})
+
+
+# =========================
+# COUNTERPARTIES
+# =========================
+class CounterpartyAutocompleteAPI(UserShardMixin, APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            limit = min(int(request.query_params.get("limit", 10)), 50)
+        except ValueError:
+            limit = 10
+
+        return Response({
+            "results": autocomplete(
+                request.user.id, request.query_params.get("q", ""), limit
+            )
+        })
+
+
+class CounterpartyMergeAPI(UserShardMixin, APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, id):
+        counterparties = Counterparty.objects.filter(user=request.user)
+
+        try:
+            target = counterparties.get(id=id)
+        except Counterparty.DoesNotExist:
+            return Response(
+                {"error": "Counterparty not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        sources = list(counterparties.filter(id__in=request.data.get("merge_ids", [])))
+        if not sources:
+            return Response(
+                {"error": "merge_ids must list counterparties to merge"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        merge_counterparties(target, sources)
+        pin_to_primary(request.user)
+        return Response({"message": "Counterparties merged successfully"})
@@ -1,3 +1,48 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.utils import timezone
 
-# Register your models here.
+from ExpensesTracker.admin_tools import ScalableModelAdmin
+
+from .models import OTP, User
+
+
+@admin.register(User)
+class UserAdmin(ScalableModelAdmin):
+    list_display = ("id", "email", "phone", "name", "is_active", "is_staff", "created_at")
+    list_filter = ("is_active", "is_staff", "is_superuser")
+    # exact matches only, so lookups use the unique indexes
+    search_fields = ("=email", "=phone")
+    fields = ("name", "email", "phone", "is_active", "is_staff", "is_superuser", "groups", "user_permissions", "last_login", "created_at")
+    readonly_fields = ("last_login", "created_at")
+    filter_horizontal = ("groups", "user_permissions")
+    ordering = ("-id",)
+
+    actions = ["activate", "deactivate"]
+
+    @admin.action(description="Activate selected users", permissions=["change"])
+    def activate(self, request, queryset):
+        updated = queryset.update(is_active=True)
+        self.message_user(request, f"Activated {updated} user(s).", messages.SUCCESS)
+
+    @admin.action(description="Deactivate selected users", permissions=["change"])
+    def deactivate(self, request, queryset):
+        updated = queryset.exclude(pk=request.user.pk).update(is_active=False)
+        self.message_user(request, f"Deactivated {updated} user(s).", messages.SUCCESS)
+
+
+@admin.register(OTP)
+class OTPAdmin(ScalableModelAdmin):
+    list_display = ("id", "user", "created_at", "expires_at", "is_verified")
+    list_select_related = ("user",)
+    list_filter = ("is_verified",)
+    date_hierarchy = "expires_at"
+    raw_id_fields = ("user",)
+    exclude = ("code",)
+    ordering = ("-expires_at",)
+
+    actions = ["expire", "delete_selected_set_based"]
+
+    @admin.action(description="Expire selected codes", permissions=["change"])
+    def expire(self, request, queryset):
+        updated = queryset.update(expires_at=timezone.now())
+        self.message_user(request, f"Expired {updated} code(s).", messages.SUCCESS)
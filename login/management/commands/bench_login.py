@@ -0,0 +1,74 @@
+import random
+import uuid
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIRequestFactory
+
+from ExpensesTracker.benchmarking import format_summary, summarize, time_calls
+from login.models import User
+from login.views import LoginAPI
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure how many login attempts per second one worker sustains "
+        "with and without the token-bucket throttles. Runs inside a "
+        "rolled-back transaction against the configured database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--hash-samples", type=int, default=10)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        factory = APIRequestFactory()
+        view = LoginAPI.as_view()
+        email = f"bench-{uuid.uuid4().hex[:12]}@example.com"
+        victim = User.objects.create_user(
+            email=email, phone=uuid.uuid4().hex[:15], password="correct-horse", name="bench"
+        )
+
+        # raw PBKDF2 cost: the ceiling for an unthrottled worker
+        samples = time_calls(lambda: victim.check_password("wrong"), options["hash_samples"])
+        self.stdout.write(format_summary("check_password (unthrottled)", summarize(samples)))
+
+        def attack(ip_for_request):
+            statuses = Counter()
+
+            def call():
+                request = factory.post(
+                    "/auth/login/",
+                    {"identifier": email, "password": "wrong"},
+                    format="json",
+                    REMOTE_ADDR=ip_for_request(),
+                )
+                statuses[view(request).status_code] += 1
+
+            return time_calls(call, options["requests"]), statuses
+
+        # single source hammering one account
+        ip = f"10.{random.randint(0, 255)}.{random.randint(0, 255)}.{random.randint(1, 254)}"
+        samples, statuses = attack(lambda: ip)
+        self.stdout.write(format_summary("LoginAPI, one IP", summarize(samples)))
+        self.stdout.write(f"    statuses: {dict(statuses)}")
+
+        # distributed attack on the same account
+        samples, statuses = attack(
+            lambda: f"10.{random.randint(0, 255)}.{random.randint(0, 255)}.{random.randint(1, 254)}"
+        )
+        self.stdout.write(format_summary("LoginAPI, rotating IPs", summarize(samples)))
+        self.stdout.write(f"    statuses: {dict(statuses)}")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from login.otp_store import get_otp_store
+
+
+class Command(BaseCommand):
+    help = "Delete expired OTP codes. Schedule periodically (e.g. every 10 minutes)."
+
+    def handle(self, *args, **options):
+        deleted = get_otp_store().purge()
+        self.stdout.write(self.style.SUCCESS(f"Purged {deleted} expired OTP(s)"))
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:31
+
+from datetime import timedelta
+
+import login.models
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_expires_at(apps, schema_editor):
+    # existing codes keep the old fixed five minute window
+    OTP = apps.get_model('login', 'OTP')
+    db = schema_editor.connection.alias
+    OTP.objects.using(db).update(expires_at=F('created_at') + timedelta(seconds=300))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('login', '0002_alter_user_email_alter_user_phone'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='otp',
+            name='expires_at',
+            field=models.DateTimeField(default=login.models.otp_expiry),
+        ),
+        migrations.RunPython(backfill_expires_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='otp',
+            index=models.Index(fields=['user', 'code', 'is_verified', 'expires_at'], name='login_otp_verify_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='otp',
+            index=models.Index(fields=['expires_at'], name='login_otp_expires_idx'),
+        ),
+    ]
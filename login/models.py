@@ -1,4 +1,5 @@
 import random
+from datetime import timedelta
 from django.db import models
 from django.conf import settings
 from django.utils import timezone
@@ -26,14 +27,30 @@ class User(AbstractBaseUser, PermissionsMixin):
         return self.email or self.phone
 
 
+def otp_expiry():
+    return timezone.now() + timedelta(seconds=settings.OTP_TTL_SECONDS)
+
+
 class OTP(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     code = models.CharField(max_length=6)
     created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(default=otp_expiry)
     is_verified = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # verify path: user + code among live, unverified codes
+            models.Index(
+                fields=["user", "code", "is_verified", "expires_at"],
+                name="login_otp_verify_idx",
+            ),
+            # purge path: range scan over expired rows
+            models.Index(fields=["expires_at"], name="login_otp_expires_idx"),
+        ]
+
     def is_expired(self):
-        return (timezone.now() - self.created_at).seconds > 300
+        return self.expires_at <= timezone.now()
 
     @staticmethod
     def generate():
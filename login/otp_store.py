@@ -0,0 +1,114 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import OTP
+
+
+# =========================
+# DATABASE STORE
+# =========================
+class DatabaseOTPStore:
+    """
+    Keeps at most one live code per user in the OTP table.
+
+    Issuing a code deletes every older code for the user, so the verify
+    path is a single lookup on the (user, code, is_verified, expires_at)
+    index and the table only grows with active users.
+    """
+
+    def issue(self, user):
+        code = OTP.generate()
+        with transaction.atomic():
+            OTP.objects.filter(user=user).delete()
+            OTP.objects.create(user=user, code=code)
+        return code
+
+    def verify(self, user, code):
+        # extend the window so the verified code can still be used to
+        # reset the password
+        updated = OTP.objects.filter(
+            user=user,
+            code=code,
+            is_verified=False,
+            expires_at__gt=timezone.now(),
+        ).update(
+            is_verified=True,
+            expires_at=timezone.now() + timedelta(seconds=settings.OTP_TTL_SECONDS),
+        )
+        return updated > 0
+
+    def consume_verification(self, user):
+        deleted, _ = OTP.objects.filter(
+            user=user,
+            is_verified=True,
+            expires_at__gt=timezone.now(),
+        ).delete()
+        return deleted > 0
+
+    def purge(self):
+        deleted, _ = OTP.objects.filter(expires_at__lte=timezone.now()).delete()
+        return deleted
+
+
+# =========================
+# CACHE STORE
+# =========================
+class CacheOTPStore:
+    """
+    Keeps codes in the configured cache with a native TTL, so no OTP rows
+    are written at all and expiry needs no purge.
+
+    A code and its verification live under separate keys and each is
+    claimed by deleting it: cache.delete() reports whether the key was
+    there, so of two concurrent requests only one can use a code or a
+    verification.
+    """
+
+    def __init__(self, alias=None):
+        self.cache = caches[alias or settings.OTP_CACHE_ALIAS]
+
+    def _key(self, user):
+        return f"otp:{user.pk}"
+
+    def _verified_key(self, user):
+        return f"otp:{user.pk}:verified"
+
+    def issue(self, user):
+        code = OTP.generate()
+        self.cache.delete(self._verified_key(user))
+        self.cache.set(self._key(user), {"code": code}, timeout=settings.OTP_TTL_SECONDS)
+        return code
+
+    def verify(self, user, code):
+        entry = self.cache.get(self._key(user))
+        if not entry or entry["code"] != code:
+            return False
+        if not self.cache.delete(self._key(user)):
+            return False
+        # the verification gets a fresh window to reset the password in
+        self.cache.set(self._verified_key(user), True, timeout=settings.OTP_TTL_SECONDS)
+        return True
+
+    def consume_verification(self, user):
+        # get() first: locmem's delete() reports expired keys as present
+        if not self.cache.get(self._verified_key(user)):
+            return False
+        return self.cache.delete(self._verified_key(user))
+
+    def purge(self):
+        return 0
+
+
+_store = None
+
+
+def get_otp_store():
+    global _store
+    if _store is None:
+        _store = import_string(settings.OTP_STORE)()
+    return _store
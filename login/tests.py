@@ -1,3 +1,172 @@
-from django.test import TestCase
+import io
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import otp_store
+from .models import OTP, User
+
+
+class IdentifierThrottleTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_non_object_bodies_are_rejected_not_crashed(self):
+        for body in (["x"], "x", 1, None):
+            response = self.client.post("/auth/login/", body, format="json")
+            self.assertEqual(response.status_code, 400, body)
+
+    def test_attempts_on_one_identifier_are_limited(self):
+        statuses = [
+            self.client.post(
+                "/auth/login/", {"identifier": "Victim@x.com ", "password": "wrong"}, format="json",
+                REMOTE_ADDR=f"10.0.0.{n}",
+            ).status_code
+            for n in range(1, 40)
+        ]
+
+        self.assertIn(429, statuses)
+
+
+# =========================
+# OTP
+# =========================
+class OTPStoreTestsMixin:
+    store_path = None
+
+    def setUp(self):
+        cache.clear()
+        settings_override = override_settings(OTP_STORE=self.store_path)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        otp_store._store = None
+        self.addCleanup(setattr, otp_store, "_store", None)
+        self.store = otp_store.get_otp_store()
+        self.user = User.objects.create_user(email="u1@x.com", phone="1", password="old-pass", name="U")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def verify(self, code):
+        return self.client.post("/auth/verify-otp/", {"identifier": "u1@x.com", "otp": code}, format="json")
+
+    def reset(self, password="new-pass"):
+        return self.client.post(
+            "/auth/reset-password/", {"identifier": "u1@x.com", "new_password": password}, format="json"
+        )
+
+    def test_a_code_verifies_once(self):
+        code = self.store.issue(self.user)
+
+        self.assertEqual(self.verify(code).status_code, 200)
+        self.assertEqual(self.verify(code).status_code, 400)
+
+    def test_a_wrong_code_does_not_verify(self):
+        code = self.store.issue(self.user)
+
+        self.assertEqual(self.verify("000000" if code != "000000" else "111111").status_code, 400)
+        self.assertEqual(self.verify(code).status_code, 200)
+
+    def test_a_new_code_replaces_the_old_one(self):
+        old = self.store.issue(self.user)
+        new = self.store.issue(self.user)
+
+        if old != new:
+            self.assertFalse(self.store.verify(self.user, old))
+        self.assertTrue(self.store.verify(self.user, new))
+
+    def test_reset_needs_a_verified_code(self):
+        self.store.issue(self.user)
+
+        self.assertEqual(self.reset().status_code, 403)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("old-pass"))
+
+    def test_a_verification_resets_the_password_once(self):
+        self.verify(self.store.issue(self.user))
+
+        self.assertEqual(self.reset().status_code, 200)
+        self.assertEqual(self.reset("other-pass").status_code, 403)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("new-pass"))
+
+
+class DatabaseOTPStoreTests(OTPStoreTestsMixin, TestCase):
+    store_path = "login.otp_store.DatabaseOTPStore"
+
+    def test_an_expired_code_does_not_verify(self):
+        code = self.store.issue(self.user)
+        OTP.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(self.verify(code).status_code, 400)
+
+    def test_an_expired_verification_does_not_reset(self):
+        self.verify(self.store.issue(self.user))
+        OTP.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(self.reset().status_code, 403)
+
+    def test_purge_deletes_only_expired_codes(self):
+        other = User.objects.create_user(email="u2@x.com", phone="2", password=None, name="U")
+        self.store.issue(self.user)
+        self.store.issue(other)
+        OTP.objects.filter(user=other).update(expires_at=timezone.now() - timedelta(seconds=1))
+        out = io.StringIO()
+
+        call_command("purge_otps", stdout=out)
+
+        self.assertIn("Purged 1 expired OTP(s)", out.getvalue())
+        self.assertEqual(list(OTP.objects.values_list("user", flat=True)), [self.user.pk])
+
+
+class CacheOTPStoreTests(OTPStoreTestsMixin, TestCase):
+    store_path = "login.otp_store.CacheOTPStore"
+
+    def test_no_rows_are_written(self):
+        self.verify(self.store.issue(self.user))
+
+        self.assertFalse(OTP.objects.exists())
+
+    def test_an_expired_code_does_not_verify(self):
+        with override_settings(OTP_TTL_SECONDS=0):
+            code = self.store.issue(self.user)
+
+        self.assertEqual(self.verify(code).status_code, 400)
+
+    def test_an_expired_verification_does_not_reset(self):
+        code = self.store.issue(self.user)
+        with override_settings(OTP_TTL_SECONDS=0):
+            self.assertTrue(self.store.verify(self.user, code))
+
+        self.assertEqual(self.reset().status_code, 403)
+
+    def test_only_one_concurrent_verify_wins(self):
+        code = self.store.issue(self.user)
+        first = self.store.verify(self.user, code)
+        # the second request read the code before the first claimed it
+        stale = {"code": code, "is_verified": False}
+        with mock.patch.object(self.store.cache, "get", return_value=stale):
+            second = self.store.verify(self.user, code)
+
+        self.assertEqual((first, second), (True, False))
+
+    def test_only_one_concurrent_reset_wins(self):
+        self.verify(self.store.issue(self.user))
+        stale = {"code": "", "is_verified": True}
+        with mock.patch.object(self.store.cache, "get", return_value=stale):
+            results = [self.store.consume_verification(self.user) for _ in range(2)]
+
+        self.assertEqual(results, [True, False])
+
+    def test_purge_has_nothing_to_do(self):
+        out = io.StringIO()
+
+        call_command("purge_otps", stdout=out)
+
+        self.assertIn("Purged 0 expired OTP(s)", out.getvalue())
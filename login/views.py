@@ -5,7 +5,12 @@ from rest_framework.permissions import AllowAny
 from django.contrib.auth import get_user_model
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from .models import OTP
+from ExpensesTracker.throttling import (
+    IPTokenBucketThrottle,
+    IdentifierTokenBucketThrottle,
+)
+
+from .otp_store import get_otp_store
 from .serializers import (
     OTPVerifySerializer,
     RegisterSerializer,
@@ -40,6 +45,8 @@ class RegisterAPI(APIView):
 class LoginAPI(APIView):
 
     permission_classes = [AllowAny]
+    throttle_classes = [IPTokenBucketThrottle, IdentifierTokenBucketThrottle]
+    throttle_scope = "login"
 
     def post(self, request):
         serializer = LoginSerializer(data=request.data)
@@ -90,6 +97,9 @@ class LoginAPI(APIView):
 # ======================
 class SendOTPAPI(APIView):
 
+    throttle_classes = [IPTokenBucketThrottle, IdentifierTokenBucketThrottle]
+    throttle_scope = "otp"
+
     def post(self, request):
         identifier = request.data.get("identifier")
 
@@ -110,8 +120,7 @@ class SendOTPAPI(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        otp_code = OTP.generate()
-        OTP.objects.create(user=user, code=otp_code)
+        otp_code = get_otp_store().issue(user)
 
         if user.email:
             send_email_otp(user.email, otp_code)
@@ -129,6 +138,9 @@ class SendOTPAPI(APIView):
 # ======================
 class VerifyOTPAPI(APIView):
 
+    throttle_classes = [IPTokenBucketThrottle, IdentifierTokenBucketThrottle]
+    throttle_scope = "otp"
+
     def post(self, request):
         serializer = OTPVerifySerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -147,21 +159,12 @@ class VerifyOTPAPI(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        otp = OTP.objects.filter(
-            user=user,
-            code=code,
-            is_verified=False
-        ).last()
-
-        if not otp or otp.is_expired():
+        if not get_otp_store().verify(user, code):
             return Response(
                 {"error": "Invalid or expired OTP"},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        otp.is_verified = True
-        otp.save()
-
         return Response(
             {"message": "OTP verified successfully"},
             status=status.HTTP_200_OK
@@ -194,12 +197,7 @@ class ResetPasswordAPI(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        verified_otp = OTP.objects.filter(
-            user=user,
-            is_verified=True
-        ).exists()
-
-        if not verified_otp:
+        if not get_otp_store().consume_verification(user):
             return Response(
                 {"error": "OTP verification required"},
                 status=status.HTTP_403_FORBIDDEN